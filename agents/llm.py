@@ -0,0 +1,585 @@
+# -*- coding: utf-8 -*-
+"""
+LLM 客户端注册表 — 进程级复用 ChatOpenAI 实例
+- 按 (模型, temperature, 工具集) 缓存已配置的客户端，工具 schema 只绑定一次
+- 所有实例共享一个 httpx 连接池（keep-alive 到方舟端点），录制/回放模式下经 ReplayTransport；
+  异步连接池绑定事件循环，在事件循环中获取的客户端按循环分别注册（多次 asyncio.run / 每个任务新建循环均可用）
+- 线程安全（双检锁），并行研究分支直接共享同一实例
+- 可选响应缓存：temperature=0 且节点开关打开时，按 (模型参数 + 绑定工具, prompt) 缓存完整回复（含 tool_calls）
+- 按节点的生成预算（max_tokens / stop，见 LLM_NODE_BUDGETS）；invoke_until 流式生成并在结论解析出来后提前停止
+- 按节点统计端点返回的 prompt token 用量，区分命中服务端前缀缓存的部分（llm_usage_stats）
+- 每次调用与重试写入运行 trace（utils/trace.py）
+- invoke_llm / invoke_until：按节点超时 + 抖动退避重试 + 端点熔断 + 运行 deadline（SDK 自带重试关闭）
+- openai / langchain_openai 在首次创建客户端时才导入（冷启动耗时见 utils/startup.py）
+- ainvoke_llm / ainvoke_until：异步版本（异步图路径使用），约束相同，超时由 asyncio 取消实现；
+  调用被取消时归还半开探测名额（python -m agents.llm：回归检查）
+"""
+import asyncio
+import contextvars
+import hashlib
+import random
+import threading
+import time
+import weakref
+from collections import defaultdict
+
+import httpx
+from langchain_core.caches import BaseCache
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration
+
+from config.settings import (
+    LLM_API_KEY, LLM_BASE_URL, LLM_MODEL_NAME,
+    LLM_MAX_CONNECTIONS, LLM_MAX_KEEPALIVE, LLM_TIMEOUT, HTTP_CONNECT_TIMEOUT,
+    LLM_CACHE_ENABLED, LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL, LLM_CACHE_NODES,
+    LLM_NODE_BUDGETS, LLM_STREAM_USAGE,
+    LLM_NODE_TIMEOUTS, LLM_CALL_RETRIES, LLM_RETRY_BACKOFF, LLM_RETRY_BACKOFF_MAX,
+    LLM_BREAKER_THRESHOLD, LLM_BREAKER_COOLDOWN, LLM_MIN_CALL_TIME, LLM_JSON_MODE,
+)
+from tools.cache import DiskCache
+from tools.ratelimit import LLM_RATE_LIMITER, parse_retry_after
+from tools.replay import replay_enabled, wrap_async_transport, wrap_transport
+from utils import trace
+from utils.startup import lazy_import
+
+_CLIENTS = {}
+_LOOP_CLIENTS = weakref.WeakKeyDictionary()         # 事件循环 → {key: 客户端}（实例持有该循环的异步连接池）
+_LOCK = threading.Lock()
+_HTTP_CLIENT = None
+_ASYNC_HTTP_CLIENTS = weakref.WeakKeyDictionary()   # 事件循环 → httpx.AsyncClient
+_HTTP_LOCK = threading.Lock()
+# 当前调用尝试的超时（秒），由 invoke_llm / invoke_until 设置；None 时使用客户端默认的 LLM_TIMEOUT
+_CALL_TIMEOUT = contextvars.ContextVar("llm_call_timeout", default=None)
+
+
+def _apply_call_timeout(request: httpx.Request) -> None:
+    """httpx 请求钩子：把本次尝试的超时写入请求（覆盖 SDK 构造请求时带入的默认超时）"""
+    timeout = _CALL_TIMEOUT.get()
+    if timeout is not None:
+        request.extensions["timeout"] = httpx.Timeout(
+            timeout, connect=min(HTTP_CONNECT_TIMEOUT, timeout),
+        ).as_dict()
+
+
+def _http_client() -> httpx.Client:
+    """所有 ChatOpenAI 实例共享的同步 httpx 客户端"""
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is None:
+        with _HTTP_LOCK:
+            if _HTTP_CLIENT is None:
+                # 显式传入 transport 时 Client 的 limits 参数不生效，连接上限设在 transport 上
+                transport = httpx.HTTPTransport(limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_KEEPALIVE,
+                ))
+                _HTTP_CLIENT = httpx.Client(
+                    timeout=httpx.Timeout(LLM_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+                    transport=wrap_transport(transport),
+                    event_hooks={"request": [_apply_call_timeout]},
+                )
+    return _HTTP_CLIENT
+
+
+def _async_http_client(loop) -> httpx.AsyncClient:
+    """事件循环 loop 中所有 ChatOpenAI 实例共享的异步 httpx 客户端（连接绑定到创建它的事件循环）。
+    单次尝试的超时由 _acall 的 asyncio 取消实现，不需要请求钩子。"""
+    client = _ASYNC_HTTP_CLIENTS.get(loop)
+    if client is None or client.is_closed:
+        with _HTTP_LOCK:
+            client = _ASYNC_HTTP_CLIENTS.get(loop)
+            if client is None or client.is_closed:
+                transport = httpx.AsyncHTTPTransport(limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_KEEPALIVE,
+                ))
+                client = _ASYNC_HTTP_CLIENTS[loop] = httpx.AsyncClient(
+                    timeout=httpx.Timeout(LLM_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+                    transport=wrap_async_transport(transport),
+                )
+    return client
+
+
+async def aclose_llm_clients() -> None:
+    """关闭当前事件循环的异步连接池并移除该循环注册的客户端（服务退出时调用）"""
+    loop = asyncio.get_running_loop()
+    with _LOCK:
+        _LOOP_CLIENTS.pop(loop, None)
+    with _HTTP_LOCK:
+        client = _ASYNC_HTTP_CLIENTS.pop(loop, None)
+    if client is not None:
+        await client.aclose()
+
+
+# ==================== 响应缓存 ====================
+
+_RESPONSE_STORE = DiskCache(LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES)
+
+
+class LLMResponseCache(BaseCache):
+    """LangChain 缓存接口的 SQLite 实现，每个节点一个 namespace（命中统计按节点区分）。
+    llm_string 由 LangChain 生成，已包含模型名、temperature 等参数以及本次绑定的 tools。"""
+
+    def __init__(self, node: str):
+        self._node = node
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        digest = hashlib.sha256(llm_string.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(prompt.encode("utf-8"))
+        return digest.hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str):
+        value = _RESPONSE_STORE.get(self._node, self._key(prompt, llm_string))
+        if value is None:
+            return None
+        return [ChatGeneration(message=m) for m in messages_from_dict(value)]
+
+    def update(self, prompt: str, llm_string: str, return_val) -> None:
+        if not all(isinstance(g, ChatGeneration) for g in return_val):
+            return
+        value = [message_to_dict(g.message) for g in return_val]
+        _RESPONSE_STORE.set(self._node, self._key(prompt, llm_string), value, ttl=LLM_CACHE_TTL)
+
+    def clear(self, **kwargs) -> None:
+        _RESPONSE_STORE.clear(self._node)
+
+
+def _cache_namespace(node: str, temperature: float):
+    """返回该调用应使用的缓存 namespace；不缓存时返回 None"""
+    if not node or temperature != 0 or not LLM_CACHE_ENABLED or replay_enabled():
+        return None
+    return node if LLM_CACHE_NODES.get(node) else None
+
+
+def llm_cache_stats() -> dict:
+    """{node: {hit, miss, negative_hit, store, evict}}"""
+    return _RESPONSE_STORE.stats()
+
+
+# ==================== 用量统计（服务端前缀缓存） ====================
+
+_USAGE = defaultdict(lambda: defaultdict(int))
+_USAGE_LOCK = threading.Lock()
+
+
+class _UsageRecorder(BaseCallbackHandler):
+    """记录每次调用端点返回的 token 用量；本地响应缓存命中不计入，提前停止的流没有用量只计次数。
+    同时把每次调用（起止时间、token、缓存、prompt/回复字符数）写入运行 trace。"""
+    run_inline = True
+
+    def __init__(self, node: str):
+        self._node = node
+        self._starts = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        prompt_chars = sum(len(m.content) for batch in messages for m in batch if isinstance(m.content, str))
+        self._starts[run_id] = (time.time(), prompt_chars)
+
+    def _trace(self, run_id, **attrs) -> None:
+        start, prompt_chars = self._starts.pop(run_id, (None, 0))
+        if start is not None:
+            trace.record_span("llm", self._node, start, time.time(), prompt_chars=prompt_chars, **attrs)
+
+    def _add(self, **counts) -> None:
+        with _USAGE_LOCK:
+            stats = _USAGE[self._node]
+            for k, v in counts.items():
+                stats[k] += v
+
+    def on_llm_end(self, response, *, run_id=None, **kwargs) -> None:
+        for gens in response.generations:
+            for gen in gens:
+                msg = getattr(gen, "message", None)
+                usage = getattr(msg, "usage_metadata", None)
+                completion_chars = len(msg.content) if isinstance(getattr(msg, "content", None), str) else 0
+                if usage and usage.get("total_cost") == 0:
+                    # 本地响应缓存命中（LangChain 将其 total_cost 置 0）
+                    self._trace(run_id, cache="local", completion_chars=completion_chars)
+                    continue
+                if not usage:
+                    self._add(calls=1, no_usage=1)
+                    self._trace(run_id, completion_chars=completion_chars)
+                    continue
+                cached = (usage.get("input_token_details") or {}).get("cache_read")
+                if cached is None:  # DeepSeek 原生字段
+                    cached = (msg.response_metadata.get("token_usage") or {}).get("prompt_cache_hit_tokens", 0)
+                counts = dict(
+                    prompt_tokens=usage.get("input_tokens", 0),
+                    cached_tokens=cached or 0,
+                    completion_tokens=usage.get("output_tokens", 0),
+                )
+                self._add(calls=1, **counts)
+                self._trace(run_id, completion_chars=completion_chars, **counts)
+
+    def on_llm_error(self, error, *, run_id=None, **kwargs) -> None:
+        if isinstance(error, GeneratorExit):
+            self._add(calls=1, early_stop=1)
+            self._trace(run_id, early_stop=True)
+        else:
+            self._trace(run_id, error=f"{type(error).__name__}: {error}"[:300])
+
+
+def llm_usage_stats() -> dict:
+    """{node: {calls, prompt_tokens, cached_tokens, cache_ratio, completion_tokens, no_usage, early_stop}}"""
+    with _USAGE_LOCK:
+        result = {node: dict(stats) for node, stats in _USAGE.items()}
+    for stats in result.values():
+        prompt = stats.get("prompt_tokens", 0)
+        stats["cache_ratio"] = stats.get("cached_tokens", 0) / prompt if prompt else 0.0
+    return result
+
+
+# ==================== 注册表 ====================
+
+def _build(temperature: float, tools: tuple, cache_ns: str, budget_node: str, node: str, json_mode: bool, loop):
+    ChatOpenAI = lazy_import("langchain_openai").ChatOpenAI
+    budget = LLM_NODE_BUDGETS.get(budget_node, {})
+    extra_body = {}
+    if budget.get("max_tokens"):
+        # max_tokens 字段会被序列化为 max_completion_tokens，部分兼容端点不识别，按原字段名透传
+        extra_body["max_tokens"] = budget["max_tokens"]
+    if json_mode and LLM_JSON_MODE:
+        extra_body["response_format"] = {"type": "json_object"}
+    llm = ChatOpenAI(
+        model=LLM_MODEL_NAME,
+        api_key=LLM_API_KEY,
+        base_url=LLM_BASE_URL,
+        temperature=temperature,
+        rate_limiter=LLM_RATE_LIMITER,
+        http_client=_http_client(),
+        # 事件循环外（同步路径）创建的实例不做异步调用，不建异步连接池
+        http_async_client=_async_http_client(loop) if loop is not None else None,
+        # 显式 False：不缓存的实例也不受全局 set_llm_cache 影响
+        cache=LLMResponseCache(cache_ns) if cache_ns else False,
+        stop=budget.get("stop"),
+        extra_body=extra_body or None,
+        # 流式调用也在最后一个 chunk 返回用量（含缓存命中 token）
+        stream_usage=LLM_STREAM_USAGE,
+        # 重试由 invoke_llm / invoke_until 负责（受 deadline 与熔断约束）
+        max_retries=0,
+        callbacks=[_UsageRecorder(node or "other")],
+    )
+    return llm.bind_tools(list(tools)) if tools else llm
+
+
+def get_llm(temperature: float = 0.2, tools: list = None, node: str = None, json_mode: bool = False):
+    """返回共享的 LLM 客户端；传入 tools 时返回已绑定工具的 Runnable。
+    node 为调用节点名，用于响应缓存的开关（见 LLM_CACHE_NODES）、生成预算与用量统计。
+    json_mode=True 时请求 JSON 对象输出（response_format=json_object，LLM_JSON_MODE 关闭时仅靠 prompt 约束）。
+    实例无状态，可在多线程间并发 invoke；在事件循环中调用时返回该循环专属的实例（异步连接池不能跨循环复用）。"""
+    tools = tuple(tools or ())
+    cache_ns = _cache_namespace(node, temperature)
+    budget_node = node if node in LLM_NODE_BUDGETS else None
+    key = (LLM_MODEL_NAME, float(temperature), tuple(t.name for t in tools), cache_ns, budget_node, node, json_mode)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    registry = _CLIENTS if loop is None else _LOOP_CLIENTS.get(loop)
+    if registry is None:
+        with _LOCK:
+            # 客户端引用着所属循环，弱引用不会自动释放：新循环注册时清理已关闭循环的实例与连接池
+            for closed in [l for l in _LOOP_CLIENTS if l.is_closed()]:
+                del _LOOP_CLIENTS[closed]
+            with _HTTP_LOCK:
+                for closed in [l for l in _ASYNC_HTTP_CLIENTS if l.is_closed()]:
+                    del _ASYNC_HTTP_CLIENTS[closed]
+            registry = _LOOP_CLIENTS.setdefault(loop, {})
+    client = registry.get(key)
+    if client is None:
+        with _LOCK:
+            client = registry.get(key)
+            if client is None:
+                client = registry[key] = _build(temperature, tools, cache_ns, budget_node, node, json_mode, loop)
+    return client
+
+
+# ==================== 熔断 ====================
+
+class LLMUnavailable(RuntimeError):
+    """LLM 调用放弃：熔断中 / deadline 不足 / 重试耗尽。调用节点据此走降级路径。"""
+
+
+def _caller():
+    """当前调用方标识：事件循环中为当前任务，否则为当前线程"""
+    try:
+        return asyncio.current_task()
+    except RuntimeError:
+        return threading.current_thread()
+
+
+class CircuitBreaker:
+    """端点熔断器：连续 threshold 次可重试错误后打开，cooldown 秒内快速失败；
+    冷却结束后放行一个探测请求（半开），成功则关闭，失败则重新计时；
+    探测被取消（剪枝 / 检查作废）时由 release_probe 归还名额，不计成功或失败。"""
+
+    def __init__(self, name: str, threshold: int, cooldown: float):
+        self.name = name
+        self._threshold = threshold
+        self._cooldown = cooldown
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._probe_owner = None        # 持有探测名额的调用方（asyncio 任务或线程）
+        self._lock = threading.Lock()
+        self._stats = {"opened": 0, "rejected": 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half_open" if self._probing else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if not self._probing and time.monotonic() - self._opened_at >= self._cooldown:
+                self._probing = True        # 只放行一个探测请求
+                self._probe_owner = _caller()
+                return True
+            self._stats["rejected"] += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                print(f"[CircuitBreaker] {self.name} 探测成功，恢复")
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+            self._probe_owner = None
+
+    def release_probe(self) -> None:
+        """当前调用方持有的探测名额作废（调用被取消）：保持打开状态，下一个调用方可重新探测"""
+        with self._lock:
+            if self._probing and self._probe_owner is _caller():
+                self._probing = False
+                self._probe_owner = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or (self._opened_at is None and self._failures >= self._threshold):
+                if self._opened_at is None:
+                    self._stats["opened"] += 1
+                    print(f"[CircuitBreaker] {self.name} 连续失败 {self._failures} 次，熔断 {self._cooldown:.0f}s")
+                self._opened_at = time.monotonic()
+                self._probing = False
+                self._probe_owner = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "failures": self._failures}
+
+
+LLM_BREAKER = CircuitBreaker("llm", LLM_BREAKER_THRESHOLD, LLM_BREAKER_COOLDOWN)
+
+_RETRYABLE = None
+
+
+def _retryable_errors() -> tuple:
+    """超时 / 连接错误 / 429 / 5xx 可重试并计入熔断；其余错误（400、鉴权等）直接抛出"""
+    global _RETRYABLE
+    if _RETRYABLE is None:
+        openai = lazy_import("openai")
+        _RETRYABLE = (
+            openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError,
+            openai.InternalServerError, httpx.TimeoutException, httpx.TransportError, TimeoutError,
+        )
+    return _RETRYABLE
+
+
+# ==================== 调用包装：超时 / 重试 / deadline ====================
+
+def remaining_time(deadline: float = None) -> float:
+    """距 deadline（time.time() 时间戳）的剩余秒数；未设置 deadline 时为无穷大"""
+    return deadline - time.time() if deadline else float("inf")
+
+
+def _backoff(attempt: int, error: Exception) -> float:
+    """full jitter 退避；429 带 Retry-After 时以其为下限"""
+    delay = random.uniform(0, min(LLM_RETRY_BACKOFF_MAX, LLM_RETRY_BACKOFF * 2 ** attempt))
+    response = getattr(error, "response", None)
+    retry_after = parse_retry_after(response.headers.get("Retry-After")) if response is not None else None
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, LLM_RETRY_BACKOFF_MAX))
+    return delay
+
+
+def _attempt_timeout(node: str, deadline: float, attempt: int, last_error: Exception) -> float:
+    """本次尝试的超时（节点超时与 deadline 剩余时间取小）；deadline 不足或熔断中时抛出 LLMUnavailable"""
+    left = remaining_time(deadline)
+    if left < LLM_MIN_CALL_TIME:
+        trace.record("llm_giveup", node, reason="deadline", attempt=attempt)
+        raise LLMUnavailable(f"{node}: 运行剩余时间不足（{max(left, 0):.1f}s）") from last_error
+    if not LLM_BREAKER.allow():
+        trace.record("llm_giveup", node, reason="circuit_open", attempt=attempt)
+        raise LLMUnavailable(f"{node}: LLM 端点熔断中") from last_error
+    return min(LLM_NODE_TIMEOUTS.get(node, LLM_NODE_TIMEOUTS["default"]), left)
+
+
+def _retry_delay(node: str, deadline: float, attempt: int, last_error: Exception):
+    """失败后的退避秒数；剩余时间不够退避后再试时返回 None（下一轮开头按 deadline 放弃，不再空等）"""
+    delay = _backoff(attempt, last_error)
+    print(f"[LLM] {node} 第 {attempt + 1} 次调用失败（{type(last_error).__name__}），{delay:.1f}s 后重试")
+    trace.record("llm_retry", node, attempt=attempt + 1, error=type(last_error).__name__, delay=round(delay, 2))
+    if remaining_time(deadline) - delay < LLM_MIN_CALL_TIME:
+        return None
+    return delay
+
+
+def _give_up(node: str, last_error: Exception) -> LLMUnavailable:
+    trace.record("llm_giveup", node, reason="retries", error=type(last_error).__name__)
+    return LLMUnavailable(f"{node}: 重试 {LLM_CALL_RETRIES} 次后仍失败: {last_error}")
+
+
+def _call(node: str, deadline: float, attempt_fn):
+    """按 node 的超时执行 attempt_fn(超时秒数)，可重试错误按抖动退避重试，
+    受熔断器与 deadline 约束；放弃时抛出 LLMUnavailable。"""
+    node = node or "other"
+    retryable = _retryable_errors()
+    last_error = None
+    for attempt in range(LLM_CALL_RETRIES + 1):
+        timeout = _attempt_timeout(node, deadline, attempt, last_error)
+        token = _CALL_TIMEOUT.set(timeout)
+        try:
+            result = attempt_fn(timeout)
+        except retryable as e:
+            LLM_BREAKER.record_failure()
+            last_error = e
+        except Exception:
+            LLM_BREAKER.record_success()    # 端点有响应（如 400），不计入熔断，也结束半开探测
+            raise
+        else:
+            LLM_BREAKER.record_success()
+            return result
+        finally:
+            _CALL_TIMEOUT.reset(token)
+
+        if attempt == LLM_CALL_RETRIES:
+            break
+        delay = _retry_delay(node, deadline, attempt, last_error)
+        if delay is not None:
+            time.sleep(delay)
+    raise _give_up(node, last_error) from last_error
+
+
+async def _acall(node: str, deadline: float, attempt_fn):
+    """_call 的异步版本：attempt_fn(超时秒数) 返回协程，超时时取消（连接随之关闭）"""
+    node = node or "other"
+    retryable = _retryable_errors()
+    last_error = None
+    for attempt in range(LLM_CALL_RETRIES + 1):
+        timeout = _attempt_timeout(node, deadline, attempt, last_error)
+        try:
+            result = await asyncio.wait_for(attempt_fn(timeout), timeout)
+        except asyncio.CancelledError:
+            LLM_BREAKER.release_probe()     # 被取消的尝试不反映端点状态，但不能一直占着半开探测名额
+            raise
+        except retryable as e:
+            LLM_BREAKER.record_failure()
+            last_error = e
+        except Exception:
+            LLM_BREAKER.record_success()
+            raise
+        else:
+            LLM_BREAKER.record_success()
+            return result
+
+        if attempt == LLM_CALL_RETRIES:
+            break
+        delay = _retry_delay(node, deadline, attempt, last_error)
+        if delay is not None:
+            await asyncio.sleep(delay)
+    raise _give_up(node, last_error) from last_error
+
+
+def invoke_llm(llm, messages: list, node: str = None, deadline: float = None):
+    """llm.invoke 的统一包装：节点超时、抖动退避重试、熔断、运行 deadline。返回 AIMessage。"""
+    return _call(node, deadline, lambda timeout: llm.invoke(messages))
+
+
+async def ainvoke_llm(llm, messages: list, node: str = None, deadline: float = None):
+    """invoke_llm 的异步版本（llm.ainvoke）"""
+    return await _acall(node, deadline, lambda timeout: llm.ainvoke(messages))
+
+
+# ==================== 流式生成 + 提前停止 ====================
+
+def invoke_until(llm, messages: list, done, node: str = None, deadline: float = None) -> str:
+    """流式生成，每收到完整的一行就调用 done(已生成文本)；返回 True 时立即停止生成
+    （关闭流即断开连接，服务端不再继续生成）。返回生成的文本。
+    与 invoke_llm 相同的超时 / 重试 / 熔断 / deadline 约束；流式时超时同时限制整段生成的总时长。
+
+    挂载了响应缓存的实例改用 invoke：LangChain 的流式路径不读写缓存。"""
+    if getattr(llm, "cache", None):
+        return invoke_llm(llm, messages, node, deadline).content
+    return _call(node, deadline, lambda timeout: _stream_until(llm, messages, done, time.monotonic() + timeout))
+
+
+def _stream_until(llm, messages: list, done, stop_at: float) -> str:
+    parts = []
+    stream = llm.stream(messages)
+    try:
+        for chunk in stream:
+            text = chunk.content
+            if not text:
+                continue
+            parts.append(text)
+            if "\n" in text and done("".join(parts)):
+                break
+            if time.monotonic() > stop_at:
+                raise TimeoutError("流式生成超过节点超时")
+    finally:
+        stream.close()
+    return "".join(parts)
+
+
+async def ainvoke_until(llm, messages: list, done, node: str = None, deadline: float = None) -> str:
+    """invoke_until 的异步版本：流式生成，done 返回 True 时关闭流；超时由 _acall 取消整段生成"""
+    if getattr(llm, "cache", None):
+        return (await ainvoke_llm(llm, messages, node, deadline)).content
+    return await _acall(node, deadline, lambda timeout: _astream_until(llm, messages, done))
+
+
+async def _astream_until(llm, messages: list, done) -> str:
+    parts = []
+    stream = llm.astream(messages)
+    try:
+        async for chunk in stream:
+            text = chunk.content
+            if not text:
+                continue
+            parts.append(text)
+            if "\n" in text and done("".join(parts)):
+                break
+    finally:
+        await stream.aclose()
+    return "".join(parts)
+
+
+async def _breaker_cancel_check() -> bool:
+    """回归检查：熔断打开、冷却结束后，半开探测调用被取消，下一个调用方应能重新探测"""
+    global LLM_BREAKER
+    saved, LLM_BREAKER = LLM_BREAKER, CircuitBreaker("check", threshold=1, cooldown=0.05)
+    try:
+        LLM_BREAKER.record_failure()
+        await asyncio.sleep(0.06)
+        probe = asyncio.ensure_future(_acall("check", None, lambda timeout: asyncio.sleep(10)))
+        await asyncio.sleep(0.01)
+        assert LLM_BREAKER.state == "half_open"
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+        return LLM_BREAKER.allow()
+    finally:
+        LLM_BREAKER = saved
+
+
+if __name__ == "__main__":
+    ok = asyncio.run(_breaker_cancel_check())
+    print(f"[CircuitBreaker] 探测被取消后重新放行: {'是' if ok else '否'}")
+    assert ok, "被取消的探测没有归还半开名额，熔断器无法恢复"
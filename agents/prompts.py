@@ -6,23 +6,15 @@
 - 研究分支(并行) → 思维链(CoT)：搜索 + 反思 + 百科验证 + 证据提取
 - 全局验证 → 思维图(GoT)：推理链完整性评估（取代刚性覆盖率）
 - 全局总结 → 思维链(CoT)：线性推理
+布局（服务端前缀缓存友好）：
+- X_SYSTEM：静态指令，作为 system 消息，同一节点的每次调用逐字节相同，可命中端点的 prompt 前缀缓存
+- X_PROMPT：本次调用的变量（问题、证据、搜索结果），作为紧随其后的 user 消息
 """
 
 
 # ==================== 1. 问题拆分和规划（思维树 ToT + 奥卡姆剃刀） ====================
 
-DECOMPOSE_PLAN_PROMPT = """你是一位问题分析大师。你的核心策略是：先用自身知识推理形成候选假设，再设计针对性的验证搜索。搜索的目的是验证和补充，而非从零发现。
-
-原始问题：{question}
-
-已有证据池：
-{existing_evidence}
-
-已完成的子问题（无需重复）：
-{completed_questions}
-
-已尝试过的搜索方向及结果摘要（避免重复类似查询）：
-{failed_queries}
+_DECOMPOSE_PLAN_GUIDE = """你是一位问题分析大师。你的核心策略是：先用自身知识推理形成候选假设，再设计针对性的验证搜索。搜索的目的是验证和补充，而非从零发现。
 
 ## 第一步：知识推理（最关键！在设计任何搜索之前必须完成）
 
@@ -74,7 +66,9 @@ DECOMPOSE_PLAN_PROMPT = """你是一位问题分析大师。你的核心策略
 4. 禁止在子问题中使用 Markdown 格式符号
 5. 禁止生成依赖其他子问题结果的子问题
 6. 禁止在子问题中使用长描述性语句来代替你已知的实体名称
+"""
 
+DECOMPOSE_PLAN_SYSTEM = _DECOMPOSE_PLAN_GUIDE + """
 输出格式：
 
 ## 知识推理
@@ -88,14 +82,33 @@ DECOMPOSE_PLAN_PROMPT = """你是一位问题分析大师。你的核心策略
    重要性：高/中/低
 2. ..."""
 
+# 结构化输出模式：指令与上面相同，只替换输出格式（JSON 比 Markdown 短，且解析无歧义）
+DECOMPOSE_PLAN_JSON_FORMAT = """{
+  "reasoning": "知识推理：候选假设（实体、置信度、依据）；推理链；待验证的关键事实。简洁，不超过300字",
+  "sub_questions": [
+    {"question": "具体实体名 + 待验证属性", "goal": "验证哪个假设 / 探索哪个替代 / 填补哪个缺口", "priority": "高/中/低"}
+  ]
+}"""
 
-# ==================== 2a. 研究分支 — 搜索工具选择（Function Calling） ====================
+DECOMPOSE_PLAN_JSON_SYSTEM = _DECOMPOSE_PLAN_GUIDE + """
+输出格式：只输出一个 JSON 对象（sub_questions 为 2-4 项），不要输出 JSON 以外的任何文字或代码块标记：
+""" + DECOMPOSE_PLAN_JSON_FORMAT
 
-RESEARCH_SEARCH_PROMPT = """你是一位搜索查询构造专家。你的核心职责是将研究问题翻译为搜索引擎能高效匹配的查询。
+DECOMPOSE_PLAN_PROMPT = """原始问题：{question}
 
-研究问题：{sub_question}
-搜索目的：{purpose}
-原始问题背景：{original_question}
+已有证据池：
+{existing_evidence}
+
+已完成的子问题（无需重复）：
+{completed_questions}
+
+已尝试过的搜索方向及结果摘要（避免重复类似查询）：
+{failed_queries}"""
+
+
+# ==================== 2a. 研究分支 — 搜索工具选择（Function Calling） ====================
+
+RESEARCH_SEARCH_SYSTEM = """你是一位搜索查询构造专家。你的核心职责是将研究问题翻译为搜索引擎能高效匹配的查询。
 
 ## 核心原则
 搜索引擎是基于倒排索引的关键词匹配系统，不具备语义推理能力。你的角色是**查询翻译器**——在语义理解（LLM的能力）和关键词匹配（搜索引擎的能力）之间架起桥梁。
@@ -125,6 +138,10 @@ RESEARCH_SEARCH_PROMPT = """你是一位搜索查询构造专家。你的核心
 
 完成以上推理后，直接调用搜索工具执行查询。"""
 
+RESEARCH_SEARCH_PROMPT = """研究问题：{sub_question}
+搜索目的：{purpose}
+原始问题背景：{original_question}"""
+
 
 # ==================== 2b. 研究分支 — 搜索反思（思维链 CoT） ====================
 
@@ -188,12 +205,7 @@ RESEARCH_REFLECT_PROMPT = """你是一位信息筛选专家。使用思维链(Co
 
 # ==================== 3. 研究分支 — 证据提取（思维链 CoT） ====================
 
-RESEARCH_EVIDENCE_PROMPT = """你是一位证据总结专家。将搜索反思的结果浓缩为一条陈述性证据语句。
-
-研究问题：{sub_question}
-反思结果：
-{reflection}
-{baike_supplement}
+RESEARCH_EVIDENCE_SYSTEM = """你是一位证据总结专家。将搜索反思的结果浓缩为一条陈述性证据语句。
 
 要求：
 1. 将所有有用信息浓缩为一句陈述性语句
@@ -214,18 +226,15 @@ RESEARCH_EVIDENCE_PROMPT = """你是一位证据总结专家。将搜索反思
 证据陈述：（一句话，包含所有具体实体名称，推测部分必须标注）
 可靠性：（high / medium / low）"""
 
+RESEARCH_EVIDENCE_PROMPT = """研究问题：{sub_question}
+反思结果：
+{reflection}
+{baike_supplement}"""
 
-# ==================== 4. 全局验证（思维图 GoT — 推理链评估） ====================
-
-GLOBAL_VERIFY_PROMPT = """你是一位推理验证专家。使用思维图(GoT)方法，评估推理链的完整性。
-
-原始问题：{question}
 
-所有子问题及状态：
-{sub_questions_summary}
+# ==================== 4. 全局验证（思维图 GoT — 推理链评估） ====================
 
-证据池：
-{all_evidence}
+_GLOBAL_VERIFY_GUIDE = """你是一位推理验证专家。使用思维图(GoT)方法，评估推理链的完整性。
 
 ## 任务：评估推理链是否足以回答原始问题
 
@@ -280,7 +289,9 @@ GLOBAL_VERIFY_PROMPT = """你是一位推理验证专家。使用思维图(GoT)
 ### 4. 缺口分析与剪枝建议（仅当不充分时）
 - **有价值的方向**：哪些已发现实体值得深入追查？
 - **应剪枝的方向**：哪些搜索方向已证明无效，不应再浪费资源？
+"""
 
+GLOBAL_VERIFY_SYSTEM = _GLOBAL_VERIFY_GUIDE + """
 输出格式：
 
 ## 证据关系图
@@ -299,20 +310,32 @@ GLOBAL_VERIFY_PROMPT = """你是一位推理验证专家。使用思维图(GoT)
 充分性：（充分/不充分）
 当前最佳答案：（即使不充分也给出最佳猜测）
 缺口说明：（仅当不充分时，说明缺什么）
-剪枝建议：（哪些方向应该放弃）
-"""
+剪枝建议：（哪些方向应该放弃）"""
 
-# ==================== 5. 全局总结（思维链 CoT） ====================
+# 结构化输出模式：证据关系图、缺口说明与剪枝建议不参与解析，不再输出；best_answer 放在最后
+GLOBAL_VERIFY_JSON_FORMAT = """{
+  "reasoning_chain": "从证据到答案的推理过程，每一步引用证据编号（如 E10），无法支撑的步骤标记为“证据缺口”",
+  "condition_check": "原始问题的每个明确条件对当前候选答案的核查，每条一行：条件 ✓/✗/?",
+  "assumption_audit": "仅列出可翻转的解读性假设；无矛盾写“无矛盾，跳过”",
+  "sufficient": true,
+  "best_answer": "当前最佳答案（即使不充分也给出最佳猜测）"
+}"""
 
-GLOBAL_SUMMARY_PROMPT = """你是一位最终推理专家。根据所有验证过的证据，使用思维链(CoT)推导最终答案。
+GLOBAL_VERIFY_JSON_SYSTEM = _GLOBAL_VERIFY_GUIDE + """
+输出格式：只输出一个 JSON 对象（sufficient 为布尔值：充分 true / 不充分 false），不要输出 JSON 以外的任何文字或代码块标记：
+""" + GLOBAL_VERIFY_JSON_FORMAT
 
-原始问题：{question}
+GLOBAL_VERIFY_PROMPT = """原始问题：{question}
 
-验证过的证据池：
-{all_evidence}
+所有子问题及状态：
+{sub_questions_summary}
 
-推理链：
-{reasoning_chain}
+证据池：
+{all_evidence}"""
+
+# ==================== 5. 全局总结（思维链 CoT） ====================
+
+GLOBAL_SUMMARY_SYSTEM = """你是一位最终推理专家。根据所有验证过的证据，使用思维链(CoT)推导最终答案。
 
 ## 推理步骤：
 1. 列出所有包含具体实体名称的有效证据（忽略"未获得有效信息"的）
@@ -322,18 +345,23 @@ GLOBAL_SUMMARY_PROMPT = """你是一位最终推理专家。根据所有验证
 5. **多条件交叉验证（关键！）**：对于多跳关联问题（如"A同时满足条件X、Y、Z"），候选答案必须被验证为同时满足问题中的所有条件。如果一个实体仅出现在单一证据/单一条件中，而没有任何证据将其与其他条件关联，则该实体不应作为最终答案
 6. 即使不是100%确定，也要给出最佳推断。但如果所有证据均明确表示"未获得有效信息"且没有任何候选实体被交叉验证，则从证据池中选择关联度最高的实体作为弱猜测
 
-**铁律：你只能使用上方"验证过的证据池"中的信息进行推理。绝对禁止引入证据池之外的任何知识、事实或假设来补充推理链。如果证据不足，给出基于现有证据的最佳猜测，但不要编造新信息。**
+**铁律：你只能使用用户消息中"验证过的证据池"中的信息进行推理。绝对禁止引入证据池之外的任何知识、事实或假设来补充推理链。如果证据不足，给出基于现有证据的最佳猜测，但不要编造新信息。**
 
 ## 最终答案
 （简洁精确的答案，直接回答原始问题。优先输出经过交叉验证的答案；若无法交叉验证，输出关联度最高的猜测）"""
 
+GLOBAL_SUMMARY_PROMPT = """原始问题：{question}
 
-# ==================== 答案格式化 ====================
+验证过的证据池：
+{all_evidence}
 
-FORMAT_ANSWER_PROMPT = """你是一位答案格式化专家。你的任务不是简单的文本清理，而是确保最终答案在语义上精确回答原始问题。
+推理链：
+{reasoning_chain}"""
+
+
+# ==================== 答案格式化 ====================
 
-原始问题：{question}
-原始答案：{raw_answer}
+FORMAT_ANSWER_SYSTEM = """你是一位答案格式化专家。你的任务不是简单的文本清理，而是确保最终答案在语义上精确回答原始问题，并直接给出标准化后的最终输出（本步之后不再有其他归一化处理）。
 
 ## 格式化推理（按顺序执行，仅输出最终结果）
 
@@ -356,27 +384,37 @@ FORMAT_ANSWER_PROMPT = """你是一位答案格式化专家。你的任务不是
 - **语言对齐**：答案语言是否匹配问题的语言期望？
 - **粒度对齐**：答案的详细程度是否匹配问题的要求？
 
-### 步骤4：最终归一化
+### 步骤4：格式约束
+判断题目是否给出了明确的输出格式要求（如"格式形如/格式为/输出格式/按…格式/用…分隔/保留…位小数/以…开头/输出为JSON"、可照抄的模板或示例、固定符号/单位/分隔符/大小写/顺序）：
+- **有明确要求**：严格按题目格式改写答案；除非题目要求，不要擅自改变英文大小写
+- **无明确要求**：执行步骤5
+
+### 步骤5：通用归一化
 - 去除首尾空格
-- 英文专有名词保留原始大小写（如 "Kobe Bryant" 而非 "kobe bryant"）
-- 数值题输出纯整数，不带单位（除非题目明确要求带单位）
-- 多实体用英文逗号加空格分隔（如 "A, B, C"），具体分隔符以题目要求为准
+- 英文普通名词转小写；专有名词、人名、地名保留原始大小写（如 "radio receiver"、"Kobe Bryant"）
+- 数值题输出纯整数（去掉小数部分），不带单位（除非题目明确要求带单位）
+- 多实体用英文逗号加空格分隔（如 "A, B, C"）
+- 去除多余的标点、引号、括号等装饰符号
 - 缩写处理：若原始答案本身就是标准缩写（无括号全称），保持缩写不展开；若有括号全称，取全称
 
 仅输出最终格式化后的答案，不要输出任何分析过程："""
 
+FORMAT_ANSWER_PROMPT = """原始问题：{question}
+原始答案：{raw_answer}"""
+
 
 # ==================== 实体预校验（decompose后、research前） ====================
 
-ENTITY_PRECHECK_PROMPT = """你是一位快速事实核查助手。验证候选实体是否与原始问题的描述基本匹配。
+ENTITY_PICK_SYSTEM = """你是一位快速事实核查助手。阅读用户给出的问题分析，从中识别最关键的1-{max_entities}个候选实体（人名、机构名、地名等专有名词），并调用 baike_search 工具查询百科信息。
 
-原始问题：{question}
+要求：只对具体的专有名词调用 baike_search（如人名、机构名、地名），不要对描述性短语或抽象概念调用。"""
 
-分析中提出的候选假设：
-{candidates_analysis}
+ENTITY_PICK_PROMPT = """原始问题：{question}
 
-以下是对候选实体的百科查询结果：
-{baike_info}
+分析内容：
+{anchor}"""
+
+ENTITY_PRECHECK_SYSTEM = """你是一位快速事实核查助手。验证候选实体是否与原始问题的描述基本匹配。
 
 ## 任务
 快速判断百科信息是否明显推翻了候选假设中的核心实体。
@@ -394,20 +432,18 @@ ENTITY_PRECHECK_PROMPT = """你是一位快速事实核查助手。验证候选
 判断：通过/不通过
 反馈：（如不通过，简要说明哪个实体被推翻、原因、以及百科中发现的可能替代实体；如通过，写"无"）"""
 
+ENTITY_PRECHECK_PROMPT = """原始问题：{question}
 
-# ==================== 合并版反思+证据提取（研究子图用） ====================
+分析中提出的候选假设：
+{candidates_analysis}
 
-RESEARCH_REFLECT_EVIDENCE_PROMPT = """你是一位信息筛选和证据提取专家。对搜索结果进行分析，并直接提取出一条关键证据。
+以下是对候选实体的百科查询结果：
+{baike_info}"""
 
-研究问题：{sub_question}
-搜索目的：{purpose}
-原始问题背景：{original_question}
 
-已有证据池（仅供交叉参考）：
-{evidence_summary}
+# ==================== 合并版反思+证据提取（研究子图用） ====================
 
-本次搜索结果：
-{search_results}
+RESEARCH_REFLECT_EVIDENCE_SYSTEM = """你是一位信息筛选和证据提取专家。对搜索结果进行分析，并直接提取出一条关键证据。
 
 ## 第一步：反思分析
 
@@ -446,22 +482,48 @@ RESEARCH_REFLECT_EVIDENCE_PROMPT = """你是一位信息筛选和证据提取专
 证据陈述：（一句话，包含所有具体实体名称，推测部分必须标注）
 可靠性：（high / medium / low）"""
 
+RESEARCH_REFLECT_EVIDENCE_PROMPT = """研究问题：{sub_question}
+搜索目的：{purpose}
+原始问题背景：{original_question}
 
-# ==================== 快速充分性检查（动态剪枝用） ====================
+已有证据池（仅供交叉参考）：
+{evidence_summary}
 
-QUICK_CHECK_PROMPT = """你是快速推理评估助手。判断现有证据是否已足以回答原始问题。
-注意：这是一个快速检查，不需要详细分析。只需判断是否能从现有证据中推导出明确答案。
+本次搜索结果：
+{search_results}"""
 
-原始问题：{question}
 
-当前证据池（{evidence_count}条）：
-{evidence}
+# ==================== 快速充分性检查（动态剪枝用） ====================
+
+QUICK_CHECK_SYSTEM = """你是快速推理评估助手。判断现有证据是否已足以回答原始问题。
+注意：这是一个快速检查，不需要详细分析。只需判断是否能从现有证据中推导出明确答案。
 
 ## 判断标准
-- 充分：仅凭上方证据池中的信息就能构建完整推理链，推导出一个明确、具体的答案（不是"可能""也许"）
+- 充分：仅凭用户消息中证据池中的信息就能构建完整推理链，推导出一个明确、具体的答案（不是"可能""也许"）
 - 不充分：证据链有关键断裂，或所有证据都是"未获得有效信息"，无法得出明确答案
-- **注意：只能基于上方证据池中的信息判断，不得引入你自身知识来补充推理**
+- **注意：只能基于用户消息中证据池中的信息判断，不得引入你自身知识来补充推理**
 
 仅输出两行：
 判断：充分/不充分
 答案：（如充分则给出简洁答案，不充分则写"待定"）"""
+
+QUICK_CHECK_PROMPT = """原始问题：{question}
+
+当前证据池（{evidence_count}条）：
+{evidence}"""
+
+
+# ==================== 结构化输出修复 ====================
+
+STRUCTURED_REPAIR_SYSTEM = """你是 JSON 修复助手。用户给出一段本应是 JSON 对象的模型输出，以及它未通过校验的原因。
+请按要求的格式修复：保留原输出中的全部信息，不增删内容，只修正语法、字段名与取值类型；
+如果原输出根本不是 JSON（例如 Markdown 文本），从中提取对应信息填入各字段。
+只输出修复后的 JSON 对象，不要输出任何其他文字或代码块标记。"""
+
+STRUCTURED_REPAIR_PROMPT = """要求的格式：
+{schema}
+
+校验错误：{error}
+
+待修复的输出：
+{raw}"""
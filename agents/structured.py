@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+结构化输出（JSON）— 取代 decompose_plan / global_verify 的逐行 Markdown 解析
+- JSON 模式请求（response_format=json_object，见 get_llm(json_mode=True)），收到后立即校验
+- 本地修复（零成本）：去代码块标记、截取最外层对象、去尾逗号、补全被截断的括号与引号
+- 仍不合格时一次短 LLM 修复调用（把校验错误和原输出交给模型改正）
+- 修复也失败时返回 None，由调用方退回旧的文本解析
+- aparse_structured：异步图路径使用的版本（修复调用走 ainvoke_llm）
+"""
+import json
+import re
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from agents.llm import LLMUnavailable, ainvoke_llm, get_llm, invoke_llm
+from agents.prompts import STRUCTURED_REPAIR_SYSTEM, STRUCTURED_REPAIR_PROMPT
+
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+_PRIORITIES = ("高", "中", "低")
+
+
+# ==================== 本地修复 ====================
+
+def _close_truncated(text: str) -> str:
+    """补全被截断的 JSON：未闭合的字符串加引号，未闭合的对象 / 数组按嵌套顺序补括号"""
+    stack, in_string, escaped = [], False, False
+    for ch in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    text = re.sub(r",\s*$", "", text.rstrip())
+    return text + "".join(reversed(stack))
+
+
+def parse_json_object(text: str) -> dict:
+    """从模型输出中解析一个 JSON 对象（含本地修复），失败抛出 ValueError"""
+    text = _FENCE_RE.sub("", (text or "").strip())
+    start = text.find("{")
+    if start == -1:
+        raise ValueError("输出中没有 JSON 对象")
+    end = text.rfind("}")
+    candidates = [text[start:end + 1]] if end > start else []
+    candidates.append(_close_truncated(text[start:]))
+    error = None
+    for candidate in candidates:
+        for attempt in (candidate, _TRAILING_COMMA_RE.sub(r"\1", candidate)):
+            try:
+                obj = json.loads(attempt, strict=False)   # strict=False：允许字符串内的原始换行
+            except json.JSONDecodeError as e:
+                error = e
+                continue
+            if isinstance(obj, dict):
+                return obj
+            error = ValueError("顶层不是 JSON 对象")
+    raise ValueError(f"JSON 解析失败: {error}")
+
+
+def _as_text(value) -> str:
+    """字段应为字符串，模型偶尔给出列表 / 对象，按行展开"""
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, list):
+        return "\n".join(_as_text(v) for v in value if _as_text(v))
+    if isinstance(value, dict):
+        return "\n".join(f"{k}：{_as_text(v)}" for k, v in value.items())
+    return str(value)
+
+
+# ==================== 校验 ====================
+
+def validate_plan(obj: dict) -> dict:
+    """decompose_plan 输出 → {"reasoning": str, "sub_questions": [{question, purpose, priority}]}"""
+    items = obj.get("sub_questions")
+    if not isinstance(items, list) or not items:
+        raise ValueError("sub_questions 缺失或不是非空数组")
+    sub_questions = []
+    for i, item in enumerate(items, 1):
+        if isinstance(item, str):
+            item = {"question": item}
+        if not isinstance(item, dict):
+            raise ValueError(f"sub_questions[{i}] 不是对象")
+        question = _as_text(item.get("question") or item.get("query"))
+        if not question:
+            raise ValueError(f"sub_questions[{i}].question 为空")
+        priority = _as_text(item.get("priority"))
+        sub_questions.append({
+            "question": question,
+            "purpose": _as_text(item.get("goal") or item.get("purpose")),
+            "priority": next((p for p in _PRIORITIES if p in priority), "中"),
+        })
+    return {"reasoning": _as_text(obj.get("reasoning")), "sub_questions": sub_questions}
+
+
+def validate_verdict(obj: dict) -> dict:
+    """global_verify 输出 → {"reasoning_chain", "condition_check", "assumption_audit", "sufficient": bool, "best_answer"}"""
+    sufficient = obj.get("sufficient")
+    if isinstance(sufficient, str):
+        text = sufficient.strip().lower()
+        if text in ("true", "充分", "是", "yes"):
+            sufficient = True
+        elif text in ("false", "不充分", "否", "no"):
+            sufficient = False
+    if not isinstance(sufficient, bool):
+        raise ValueError("sufficient 缺失或不是布尔值")
+    return {
+        "reasoning_chain": _as_text(obj.get("reasoning_chain")),
+        "condition_check": _as_text(obj.get("condition_check")),
+        "assumption_audit": _as_text(obj.get("assumption_audit")),
+        "sufficient": sufficient,
+        "best_answer": _as_text(obj.get("best_answer")),
+    }
+
+
+# ==================== 解析 + 修复 ====================
+
+def _parse_local(raw: str, validate, tag: str):
+    """本地解析校验 → (结果, None)；失败时 (None, 错误信息)"""
+    try:
+        return validate(parse_json_object(raw)), None
+    except ValueError as e:
+        print(f"[{tag}] 结构化输出校验失败（{e}），尝试修复")
+        return None, str(e)
+
+
+def _repair_messages(raw: str, schema: str, error: str) -> list:
+    return [
+        SystemMessage(content=STRUCTURED_REPAIR_SYSTEM),
+        HumanMessage(content=STRUCTURED_REPAIR_PROMPT.format(schema=schema, error=error, raw=raw)),
+    ]
+
+
+def parse_structured(raw: str, validate, schema: str, tag: str, deadline: float = None):
+    """本地解析校验 → 失败时一次 LLM 修复调用 → 仍失败返回 None（调用方退回文本解析）"""
+    result, error = _parse_local(raw, validate, tag)
+    if error is None:
+        return result
+
+    llm = get_llm(temperature=0.0, node="structured_repair", json_mode=True)
+    try:
+        response = invoke_llm(llm, _repair_messages(raw, schema, error), node="structured_repair", deadline=deadline)
+        return validate(parse_json_object(response.content))
+    except (ValueError, LLMUnavailable) as e:
+        print(f"[{tag}] 修复失败（{e}），退回文本解析")
+        return None
+
+
+async def aparse_structured(raw: str, validate, schema: str, tag: str, deadline: float = None):
+    """parse_structured 的异步版本"""
+    result, error = _parse_local(raw, validate, tag)
+    if error is None:
+        return result
+
+    llm = get_llm(temperature=0.0, node="structured_repair", json_mode=True)
+    try:
+        response = await ainvoke_llm(
+            llm, _repair_messages(raw, schema, error), node="structured_repair", deadline=deadline,
+        )
+        return validate(parse_json_object(response.content))
+    except (ValueError, LLMUnavailable) as e:
+        print(f"[{tag}] 修复失败（{e}），退回文本解析")
+        return None
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+批量问答入口 — 从 JSONL / CSV 读取问题，并发运行，每题一行 JSONL 结果，可断点续跑
+
+用法：
+    python batch.py questions.jsonl results.jsonl                  # 默认并发 BATCH_CONCURRENCY
+    python batch.py questions.csv results.jsonl -j 8               # CSV 需有表头
+    python batch.py questions.jsonl results.jsonl --id-field qid --question-field prompt
+
+输入：每行 / 每条记录含问题字段（默认 question）与 id 字段（默认 id；缺省时用行号，id 不可重复）。
+输出：{"id", "question", "answer", "normalized_answer", "latency", "loop_count",
+       "evidence_count", "is_sufficient", "trace"}；失败时为 {"id", "question", "error", "latency"}。
+续跑：输出文件中已成功（无 error）的 id 会被跳过，失败的 id 重新运行。
+同一进程内所有问题共享编译好的图、HTTP / LLM 连接池、限流器与缓存。
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config.settings import BATCH_CONCURRENCY
+from main import solve_question
+
+
+def load_questions(path: str, id_field: str = "id", question_field: str = "question") -> list:
+    """读取 JSONL / CSV（按扩展名），返回 [(id, question)]；id 统一为字符串。
+    缺少 id 字段（或为 null）时用行号作 id；id 重复（含行号与已有 id 相同）时报错，避免结果错位与续跑跳错题"""
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        if path.lower().endswith(".csv"):
+            records = list(csv.DictReader(f))
+        else:
+            records = [json.loads(line) for line in f if line.strip()]
+    questions, first_line, duplicates = [], {}, []
+    for line_no, record in enumerate(records, 1):
+        question = str(record.get(question_field) or "").strip()
+        if not question:
+            print(f"[Batch] 第 {line_no} 条缺少 {question_field} 字段，跳过")
+            continue
+        raw_id = record.get(id_field)
+        qid = str(line_no) if raw_id is None else str(raw_id)
+        if qid in first_line:
+            duplicates.append(f"{qid!r}（第 {first_line[qid]} 条与第 {line_no} 条）")
+            continue
+        first_line[qid] = line_no
+        questions.append((qid, question))
+    if duplicates:
+        raise ValueError(f"{path} 中 id 重复: " + "，".join(duplicates))
+    return questions
+
+
+def completed_ids(output_path: str) -> set:
+    """输出文件中已成功完成的 id（续跑时跳过）"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue            # 上次中断时写了一半的行
+            if not record.get("error"):
+                done.add(str(record.get("id")))
+    return done
+
+
+def _solve(qid: str, question: str) -> dict:
+    start = time.time()
+    try:
+        return {"id": qid, "question": question, **solve_question(question)}
+    except Exception as e:
+        traceback.print_exc()
+        return {"id": qid, "question": question, "error": f"{type(e).__name__}: {e}",
+                "latency": round(time.time() - start, 2)}
+
+
+def run_batch(input_path: str, output_path: str, concurrency: int = BATCH_CONCURRENCY,
+              id_field: str = "id", question_field: str = "question") -> dict:
+    """并发运行所有未完成的问题，结果逐行追加写入 output_path；返回 {total, skipped, ok, failed}"""
+    questions = load_questions(input_path, id_field, question_field)
+    done = completed_ids(output_path)
+    todo = [(qid, q) for qid, q in questions if qid not in done]
+    stats = {"total": len(questions), "skipped": len(questions) - len(todo), "ok": 0, "failed": 0}
+    print(f"[Batch] 共 {len(questions)} 题，已完成 {stats['skipped']} 题，待运行 {len(todo)} 题（并发 {concurrency}）")
+    if not todo:
+        return stats
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    write_lock = threading.Lock()
+    start = time.time()
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch")
+    try:
+        with open(output_path, "a", encoding="utf-8") as out:
+            futures = {executor.submit(_solve, qid, q): qid for qid, q in todo}
+            for finished, fut in enumerate(as_completed(futures), 1):
+                record = fut.result()
+                with write_lock:
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    out.flush()
+                stats["failed" if record.get("error") else "ok"] += 1
+                print(f"[Batch] {finished}/{len(todo)} id={record['id']} "
+                      + (f"失败: {record['error']}" if record.get("error")
+                         else f"答案: {record['normalized_answer']} ({record['latency']}s)")
+                      + f" | 已用 {time.time() - start:.0f}s")
+    except KeyboardInterrupt:
+        print("[Batch] 中断：已写入的结果会在下次运行时跳过")
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown(wait=True)
+    print(f"[Batch] 完成: 成功 {stats['ok']}，失败 {stats['failed']}，跳过 {stats['skipped']}，"
+          f"耗时 {time.time() - start:.0f}s")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量运行多智能体问答")
+    parser.add_argument("input", help="问题文件（.jsonl 或 .csv）")
+    parser.add_argument("output", help="结果 JSONL（追加写入，已成功的 id 续跑时跳过）")
+    parser.add_argument("-j", "--concurrency", type=int, default=BATCH_CONCURRENCY, help="同时运行的问题数")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--question-field", default="question")
+    args = parser.parse_args()
+    try:
+        run_batch(args.input, args.output, args.concurrency, args.id_field, args.question_field)
+    except ValueError as e:
+        parser.error(str(e))
+
+
+if __name__ == "__main__":
+    main()
@@ -32,5 +32,183 @@ MAX_LOOPS = 4                   # 主循环最大次数（decompose→parallel_r
 RECURSION_LIMIT = 100           # LangGraph 递归上限
 MAX_BAIKE_VERIFY = 2            # 每个研究分支最多触发的百科验证次数
 QUICK_CHECK_MIN_EVIDENCE = 2    # 触发快速充分性检查的最小证据数
+QUICK_CHECK_COALESCE_WINDOW = 0.3   # 分支完成后等待该秒数再发起快速检查，期间到达的证据合并为一次检查
 MAX_PARALLEL_WORKERS = 4        # 并行研究最大线程数
 MAX_PRECHECK_ENTITIES = 3       # 实体预校验最多验证的候选实体数
+
+# ==================== 搜索结果缓存（SQLite，本地磁盘） ====================
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache")
+SEARCH_CACHE_ENABLED = True
+SEARCH_CACHE_PATH = os.path.join(CACHE_DIR, "search_cache.sqlite3")
+SEARCH_CACHE_MAX_ENTRIES = 5000          # 超出后按 LRU 淘汰
+SEARCH_CACHE_TTL = {                     # 各引擎结果 TTL（秒）
+    "bocha": 24 * 3600,
+    "serper": 24 * 3600,
+    "baike_list": 7 * 24 * 3600,         # 百科词条变化慢，按实体缓存一周
+    "baike_content": 7 * 24 * 3600,
+}
+SEARCH_CACHE_NEGATIVE_TTL = 2 * 3600     # "无结果" 的负缓存 TTL（秒）
+BAIKE_NEGATIVE_TTL = 24 * 3600           # 百科 "未找到" 实体的负缓存 TTL（秒）
+
+# ==================== HTTP 连接池（搜索 / 百科 / URL 读取共用） ====================
+HTTP_POOL_CONNECTIONS = 16      # 缓存的 host 连接池个数
+HTTP_POOL_MAXSIZE = 32          # 单个 host 的最大保活连接数（≥ 并发线程数）
+HTTP_MAX_RETRIES = 2            # 连接错误 / 502/503/504 自动重试次数
+HTTP_BACKOFF_FACTOR = 0.5       # 重试退避系数（0.5s, 1s, 2s ...）
+HTTP_CONNECT_TIMEOUT = 5        # 连接超时（秒）
+HTTP_READ_TIMEOUT = 30          # 默认读取超时（秒）
+
+# ==================== 异步搜索后端（httpx + asyncio） ====================
+ASYNC_MAX_CONNECTIONS = 200     # 单个事件循环 AsyncClient 最大连接数
+ASYNC_PROVIDER_CONCURRENCY = {  # 各 provider 同时在途请求上限（Semaphore）
+    "bocha": 16,
+    "serper": 16,
+    "baike": 8,
+    "fetch": 32,
+}
+
+# ==================== auto_search 对冲（hedged request） ====================
+AUTO_SEARCH_HEDGE_MODE = "hedge"   # off=串行降级 / hedge=延迟后并发备用引擎取先到的非空结果 / merge=两引擎结果合并
+AUTO_SEARCH_HEDGE_DELAY = None     # 对冲延迟（秒）；None=按主引擎 p95 自适应；0=立即并发
+HEDGE_DEFAULT_DELAY = 3.0          # 样本不足时的对冲延迟（秒）
+HEDGE_DELAY_MIN = 0.5              # 自适应对冲延迟下限（秒）
+HEDGE_DELAY_MAX = 8.0              # 自适应对冲延迟上限（秒）
+HEDGE_MIN_SAMPLES = 10             # 计算 p95 所需最少样本数
+HEDGE_MAX_WORKERS = 16             # 调度器 fetch 类别的默认线程数（对冲请求在其中运行）
+LATENCY_WINDOW = 200               # 每个引擎保留的延迟样本数
+
+# ==================== URL 深读（流式下载） ====================
+FETCH_MAX_BYTES = 2 * 1024 * 1024   # 单页下载字节上限（Content-Length 超过则直接拒绝）
+FETCH_CHUNK_BYTES = 16 * 1024       # 流式读取块大小
+FETCH_SNIFF_BYTES = 16 * 1024       # 字符集检测使用的前缀字节数
+FETCH_TEXT_MARGIN = 1.5             # 已收集正文达到 max_chars × 该系数即停止下载（留出归一化损耗）
+
+# ==================== Provider 限流（令牌桶 + AIMD 在途上限） ====================
+PROVIDER_LIMITS = {
+    # rate: 令牌/秒, burst: 桶容量, max_in_flight: 在途上限（AIMD 上界）, min_in_flight: 下界
+    "bocha": {"rate": 8, "burst": 8, "max_in_flight": 12, "min_in_flight": 2},
+    "serper": {"rate": 8, "burst": 8, "max_in_flight": 12, "min_in_flight": 2},
+    "baike": {"rate": 5, "burst": 5, "max_in_flight": 8, "min_in_flight": 1},
+    "fetch": {"rate": 4, "burst": 4, "max_in_flight": 6, "min_in_flight": 1},   # 按 host 独立
+    "llm": {"rate": 6, "burst": 10, "max_in_flight": 16, "min_in_flight": 2},
+    "default": {"rate": 5, "burst": 5, "max_in_flight": 8, "min_in_flight": 1},
+}
+GOVERNOR_MAX_THROTTLE_RETRIES = 2   # 429 后等待 Retry-After 再重试的次数
+GOVERNOR_DEFAULT_RETRY_AFTER = 2.0  # 429 未带 Retry-After 时的暂停秒数
+GOVERNOR_MAX_RETRY_AFTER = 30.0     # Retry-After 上限（秒）
+
+# ==================== 录制 / 回放（离线基准测试） ====================
+# off: 正常访问；record: 真实请求并把每个请求/响应（含 LLM）写入归档；replay: 只从归档返回
+# 录制/回放时搜索结果缓存自动旁路，保证每个 provider 请求都经过归档
+REPLAY_MODE = os.getenv("REPLAY_MODE", "off")
+REPLAY_ARCHIVE = os.getenv("REPLAY_ARCHIVE", os.path.join(CACHE_DIR, "replay", "default.sqlite3"))
+REPLAY_LATENCY_SCALE = float(os.getenv("REPLAY_LATENCY_SCALE", "1.0"))   # 回放时按录制耗时 × 系数 sleep，0 为不模拟
+REPLAY_MAX_BODY_BYTES = FETCH_MAX_BYTES   # 单个响应体最多录制的字节数
+
+# ==================== LLM 客户端（进程级复用） ====================
+LLM_MAX_CONNECTIONS = 32        # 到 LLM 端点的最大连接数（所有节点 / 分支共享）
+LLM_MAX_KEEPALIVE = 16          # 保持 keep-alive 的空闲连接数
+LLM_TIMEOUT = 600               # 单次请求总超时（秒），与 openai SDK 默认值一致
+
+# ==================== LLM 响应缓存（temperature=0 节点，默认关闭） ====================
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "0") == "1"   # 总开关（录制/回放时自动旁路）
+LLM_CACHE_PATH = os.path.join(CACHE_DIR, "llm_cache.sqlite3")
+LLM_CACHE_MAX_ENTRIES = 2000     # 超出后按 LRU 淘汰
+LLM_CACHE_TTL = 7 * 24 * 3600    # 秒
+LLM_CACHE_NODES = {              # 各节点开关（仅 temperature=0 的调用会真正缓存）
+    "entity_precheck": True,
+    "quick_check": True,
+    "format_answer": True,
+    "normalize_answer": True,
+}
+
+# ==================== 各节点生成预算（max_tokens / stop） ====================
+# 流式节点在解析出结论后会立即停止生成；预算是兜底上限，同样作用于非流式与缓存路径
+LLM_NODE_BUDGETS = {
+    "quick_check": {"max_tokens": 200},
+    "global_verify": {"max_tokens": 4000, "stop": ["\n缺口说明"]},   # 缺口/剪枝段落不参与解析
+    "global_summary": {"max_tokens": 3000},
+    "format_answer": {"max_tokens": 300},
+    "normalize_answer": {"max_tokens": 300},
+    "structured_repair": {"max_tokens": 2000},
+}
+
+# ==================== Prompt token 预算 ====================
+# 估算用的 tiktoken 编码名（可选依赖；未安装或编码文件无法下载时按字符类别估算），置空则始终用估算
+TOKEN_ENCODING = os.getenv("TOKEN_ENCODING", "cl100k_base")
+# 每个 prompt 模板各段的 token 上限；超出时按可靠性 / 相关度 / 名次挑选内容，而不是截取前 N 个字符
+PROMPT_TOKEN_BUDGETS = {
+    "ENTITY_PICK": {"anchor": 2500},                                   # entity_precheck 内联的实体选择 prompt
+    "ENTITY_PRECHECK_PROMPT": {"candidates_analysis": 2000, "baike_info": 3500, "feedback_baike": 2000},
+    "DECOMPOSE_PLAN_PROMPT": {"existing_evidence": 3000},
+    "QUICK_CHECK_PROMPT": {"evidence": 3000},
+    "GLOBAL_VERIFY_PROMPT": {"all_evidence": 6000},
+    "GLOBAL_SUMMARY_PROMPT": {"all_evidence": 6000, "reasoning_chain": 4000},
+    "RESEARCH_REFLECT_EVIDENCE_PROMPT": {"evidence_summary": 1500, "search_results": 8000},
+    "RESEARCH_EVIDENCE_PROMPT": {"reflection": 4000, "baike_supplement": 3000},
+}
+
+# ==================== Prompt 前缀缓存统计 ====================
+# 流式请求附带 stream_options.include_usage，使提前停止以外的流式调用也能拿到用量与缓存命中 token
+LLM_STREAM_USAGE = os.getenv("LLM_STREAM_USAGE", "1") == "1"
+
+# ==================== 运行 trace ====================
+# 每次运行把图节点 / LLM 调用 / provider 请求 / URL 深读 / 搜索缓存事件写入 TRACE_DIR/<run_id>.json
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "1") == "1"
+TRACE_DIR = os.getenv("TRACE_DIR", os.path.join(os.path.dirname(CACHE_DIR), "traces"))
+
+# ==================== LLM 调用超时 / 重试 / 熔断 + 运行 deadline ====================
+RUN_DEADLINE = float(os.getenv("RUN_DEADLINE", "300"))   # 单次运行总时限（秒），写入 state.deadline_ts；0 为不限
+LLM_NODE_TIMEOUTS = {           # 单次调用尝试的超时（秒）；流式调用同时限制总生成时长
+    "default": 60,
+    "entity_precheck": 30,
+    "decompose_plan": 90,
+    "quick_check": 20,
+    "global_verify": 120,
+    "global_summary": 90,
+    "format_answer": 30,
+    "research_search": 45,
+    "research_reflect": 90,
+    "research_evidence": 60,
+    "structured_repair": 45,
+}
+LLM_CALL_RETRIES = 2            # 超时 / 连接错误 / 429 / 5xx 后的重试次数
+LLM_RETRY_BACKOFF = 1.0         # 退避基数（秒）：第 n 次重试前等待 uniform(0, base × 2^n)
+LLM_RETRY_BACKOFF_MAX = 8.0     # 单次退避上限（秒）
+LLM_BREAKER_THRESHOLD = 5       # 连续可重试错误达到该次数后熔断
+LLM_BREAKER_COOLDOWN = 30.0     # 熔断后多少秒放行一个探测请求
+LLM_MIN_CALL_TIME = 5.0         # deadline 剩余不足该秒数时不再发起 LLM 调用
+DEADLINE_SUMMARY_RESERVE = 60.0  # 剩余时间不足该秒数时 global_verify 不再开启新一轮研究，直接总结
+
+# ==================== 结构化输出（JSON） ====================
+# 开启的节点以 JSON 对象输出并在收到后校验（本地修复 → 一次 LLM 修复 → 退回 Markdown 文本解析）
+STRUCTURED_OUTPUT_NODES = {
+    "decompose_plan": os.getenv("STRUCTURED_DECOMPOSE", "1") == "1",
+    "global_verify": os.getenv("STRUCTURED_VERIFY", "1") == "1",
+}
+LLM_JSON_MODE = os.getenv("LLM_JSON_MODE", "1") == "1"   # 请求附带 response_format=json_object；端点不支持时置 0，仅靠 prompt 约束
+
+# ==================== 冷启动 ====================
+STARTUP_BUDGET = float(os.getenv("STARTUP_BUDGET", "3.0"))   # 模块导入 + 图编译的耗时预算（秒），超出时启动报告给出提示
+
+# ==================== 批处理 ====================
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))   # batch.py 同时运行的问题数（共享图、连接池、限流器与缓存）
+
+# ==================== 任务调度器（进程级） ====================
+# 各资源类别的工作线程上限；多个问题同时运行（batch.py）时共享，线程总数不随问题数增长
+SCHEDULER_WORKERS = {
+    "branch": int(os.getenv("SCHED_BRANCH_WORKERS", "8")),    # 研究分支（单个问题内另受 MAX_PARALLEL_WORKERS 限制）
+    "llm": int(os.getenv("SCHED_LLM_WORKERS", "4")),          # 独立 LLM 调用（QuickCheck）
+    "search": int(os.getenv("SCHED_SEARCH_WORKERS", "8")),    # 搜索工具调用（博查 / Serper / 百科）
+    "fetch": int(os.getenv("SCHED_FETCH_WORKERS", str(HEDGE_MAX_WORKERS))),  # 单个 HTTP 请求（深读 / 百科义项 / 对冲）
+}
+
+# ==================== 流水线研究子图 ====================
+# 开启时子图边搜边反思：首个有结果的搜索引擎返回即反思并产出临时证据，
+# 其余引擎 / 深读页面到达后只在带来新信息时重新反思（细化），迟迟不到的结果不再等待。
+# 每个分支最多 1 + STREAM_MAX_REFINES 轮反思（每轮可能另有百科验证与证据整合调用），
+# LLM 开销与证据输出均不同于基线，默认关闭，需在评估成本与准确率后显式开启
+RESEARCH_STREAMING = os.getenv("RESEARCH_STREAMING", "0") == "1"
+STREAM_REFINE_MIN_NEW_HITS = int(os.getenv("STREAM_REFINE_MIN_NEW_HITS", "3"))  # 新增（未反思过的）URL 达到该数时细化；新深读页面 / 百科正文总会触发
+STREAM_MAX_REFINES = int(os.getenv("STREAM_MAX_REFINES", "2"))                  # 每个分支最多细化次数
+STREAM_STRAGGLER_WAIT = float(os.getenv("STREAM_STRAGGLER_WAIT", "15"))         # 每次反思结束后，剩余搜索 / 深读最多再等待的秒数
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""
+异步图节点 — 与 graph/nodes.py、graph/research_subgraph.py 的同步节点一一对应
+共用 prompt 构造与结果解析（_xxx_request / _xxx_result），只有 LLM 调用与搜索 I/O 换成异步版本：
+- LLM：ainvoke_llm / ainvoke_until（相同的超时 / 重试 / 熔断 / deadline 约束）
+- 搜索 / 深读 / 百科：tools/async_search.py（单个事件循环驱动全部在途请求，无需线程）
+由 graph/supervisor.compile_async_graph() 组装，main.arun_question() 调用。
+"""
+import asyncio
+import time
+from typing import List, Tuple
+
+from agents.llm import LLMUnavailable, ainvoke_llm, ainvoke_until, remaining_time
+from agents.structured import aparse_structured, validate_plan, validate_verdict
+from agents.prompts import DECOMPOSE_PLAN_JSON_FORMAT, GLOBAL_VERIFY_JSON_FORMAT
+from config.settings import LLM_MIN_CALL_TIME, STREAM_MAX_REFINES, STREAM_STRAGGLER_WAIT
+from graph.nodes import (
+    _extract_final_answer, _format_fast_path, _format_request, _format_result,
+    _plan_request, _plan_result,
+    _precheck_entities, _precheck_judge_request, _precheck_pick_request, _precheck_skip, _precheck_verdict,
+    _baike_hits_only,
+    _quick_check_done, _quick_check_request, _quick_check_result,
+    _summary_done, _summary_request, _summary_result,
+    _verify_done, _verify_request, _verify_result,
+)
+from graph.research_subgraph import (
+    ResearchSubgraphState, _PipelineResults,
+    _baike_verify_entities, _deep_read_urls, _evidence_request, _evidence_result, _parse_evidence_from_content,
+    _reflect_request, _search_calls, _search_request, _usable_page,
+)
+from graph.state import AgentState
+from tools.async_search import ASEARCH_HITS_BY_TOOL, abaike_search_many, afetch_url_content
+from tools.hits import SearchBatch
+from utils import trace
+
+
+# ==================== 主图节点 ====================
+
+async def aentity_precheck(state: AgentState) -> dict:
+    """entity_precheck 的异步版本"""
+    skipped = _precheck_skip(state)
+    if skipped is not None:
+        return skipped
+    precheck_count = state.get("precheck_count", 0)
+    passed = {"precheck_passed": True, "precheck_count": precheck_count + 1}
+
+    llm_with_baike, messages = _precheck_pick_request(state)
+    try:
+        response = await ainvoke_llm(llm_with_baike, messages, node="entity_precheck",
+                                     deadline=state.get("deadline_ts"))
+    except Exception as e:
+        print(f"[EntityPrecheck] LLM异常: {e}，自动放行")
+        return passed
+
+    entities = _precheck_entities(response)
+    if entities is None:
+        return passed
+    baike_results = _baike_hits_only(await abaike_search_many(entities))
+    if not baike_results:
+        return passed
+
+    llm, messages = _precheck_judge_request(state, baike_results)
+    try:
+        response = await ainvoke_llm(llm, messages, node="entity_precheck", deadline=state.get("deadline_ts"))
+        return _precheck_verdict(response.content, baike_results, precheck_count)
+    except Exception as e:
+        print(f"[EntityPrecheck] LLM异常: {e}，自动放行")
+        return passed
+
+
+async def adecompose_plan(state: AgentState) -> dict:
+    """decompose_plan 的异步版本"""
+    print(f"\n{'='*60}")
+    print("[DecomposePlan] 分析问题并规划搜索策略（奥卡姆剃刀）...")
+    print(f"{'='*60}")
+
+    llm, messages, all_questions, structured = _plan_request(state)
+    try:
+        response = await ainvoke_llm(llm, messages, node="decompose_plan", deadline=state.get("deadline_ts"))
+        content = response.content.strip()
+    except LLMUnavailable as e:
+        print(f"[DecomposePlan] LLM 不可用（{e}），直接搜索原始问题")
+        content = ""
+
+    plan = None
+    if structured and content:
+        plan = await aparse_structured(content, validate_plan, DECOMPOSE_PLAN_JSON_FORMAT, "DecomposePlan",
+                                       deadline=state.get("deadline_ts"))
+    return _plan_result(state, all_questions, content, plan)
+
+
+async def aquick_sufficiency_check(question: str, evidence_pool: list, deadline: float = None) -> tuple:
+    """quick_sufficiency_check 的异步版本；作废时由调用方取消任务（流随之关闭）"""
+    llm, messages = _quick_check_request(question, evidence_pool)
+    try:
+        content = await ainvoke_until(llm, messages, _quick_check_done, node="quick_check", deadline=deadline)
+        return _quick_check_result(content.strip())
+    except Exception as e:
+        print(f"[QuickCheck] 异常: {e}")
+        return False, ""
+
+
+async def aglobal_verify(state: AgentState) -> dict:
+    """global_verify 的异步版本"""
+    loop, sub_questions, llm, messages, structured = _verify_request(state)
+
+    deadline = state.get("deadline_ts")
+    try:
+        if structured:
+            content = (await ainvoke_llm(llm, messages, node="global_verify", deadline=deadline)).content.strip()
+        else:
+            content = (await ainvoke_until(llm, messages, _verify_done, node="global_verify",
+                                           deadline=deadline)).strip()
+    except LLMUnavailable as e:
+        print(f"[GlobalVerify] LLM 不可用（{e}）")
+        content = ""
+
+    verdict = None
+    if structured and content:
+        verdict = await aparse_structured(content, validate_verdict, GLOBAL_VERIFY_JSON_FORMAT, "GlobalVerify",
+                                          deadline=deadline)
+    return _verify_result(state, loop, sub_questions, content, verdict)
+
+
+async def aglobal_summary(state: AgentState) -> dict:
+    """global_summary 的异步版本"""
+    llm, messages = _summary_request(state)
+    try:
+        content = (await ainvoke_until(llm, messages, _summary_done, node="global_summary",
+                                       deadline=state.get("deadline_ts"))).strip()
+    except LLMUnavailable as e:
+        print(f"[GlobalSummary] LLM 不可用（{e}）")
+        content = ""
+    return _summary_result(state, content)
+
+
+async def aformat_answer(state: AgentState) -> dict:
+    """format_answer 的异步版本"""
+    fast = _format_fast_path(state)
+    if fast is not None:
+        return fast
+
+    llm, messages = _format_request(state)
+    try:
+        response = await ainvoke_llm(llm, messages, node="format_answer", deadline=state.get("deadline_ts"))
+        formatted = _extract_final_answer(response.content)
+    except LLMUnavailable as e:
+        print(f"[FormatAnswer] LLM 不可用（{e}），输出原始答案")
+        formatted = state.get("final_answer", "").strip()
+    return _format_result(formatted)
+
+
+# ==================== 研究子图节点 ====================
+
+async def _adeep_read_parallel(batches: List[SearchBatch], max_reads: int = 2) -> List[Tuple[str, str]]:
+    picked = _deep_read_urls(batches, max_reads)
+    contents = await asyncio.gather(*(afetch_url_content(url, 15000) for url in picked))
+    return [(url, c) for url, c in zip(picked, contents) if _usable_page(c)]
+
+
+async def _aselect_search_calls(state: ResearchSubgraphState) -> list:
+    """_select_search_calls 的异步版本"""
+    sq = state.get("current_branch_question", {})
+    q_id = sq.get("id", "?")
+    engine = (sq.get("search_engine") or "both").lower()
+    llm_with_search, messages = _search_request(state)
+    try:
+        response = await ainvoke_llm(llm_with_search, messages, node="research_search",
+                                     deadline=state.get("deadline_ts"))
+        tool_calls = getattr(response, "tool_calls", None) or []
+    except LLMUnavailable as e:
+        print(f"  [Q{q_id}/Search] LLM 不可用（{e}），按引擎默认搜索")
+        tool_calls = []
+    return _search_calls(q_id, sq.get("question", ""), engine, tool_calls)
+
+
+async def asearch_parallel(state: ResearchSubgraphState) -> dict:
+    """_search_parallel 的异步版本"""
+    sq = state.get("current_branch_question", {})
+    q_id = sq.get("id", "?")
+    query = sq.get("question", "")
+    engine = (sq.get("search_engine") or "both").lower()
+
+    if not query:
+        return {"search_hits": [], "deep_pages": []}
+
+    print(f"  [Q{q_id}/Search] 开始搜索 (engine={engine})")
+    calls = await _aselect_search_calls(state)
+    outs = await asyncio.gather(*(ASEARCH_HITS_BY_TOOL[name](**args) for name, args in calls),
+                                return_exceptions=True)
+    batches: List[SearchBatch] = [
+        SearchBatch(name, query, error=f"[搜索失败] {query}: {out}") if isinstance(out, Exception) else out
+        for (name, _), out in zip(calls, outs)
+    ]
+
+    print(f"  [Q{q_id}/Search] 搜索完成，获取 {len(batches)} 组结果")
+    deep_pages = [] if engine == "baike" else await _adeep_read_parallel(batches, max_reads=2)
+    if deep_pages:
+        print(f"  [Q{q_id}/DeepRead] 补充 {len(deep_pages)} 个高价值页面")
+
+    return {"search_hits": batches, "deep_pages": deep_pages}
+
+
+async def _areflect_evidence(state: ResearchSubgraphState):
+    """_reflect_evidence 的异步版本"""
+    sq = state.get("current_branch_question", {})
+    q_id = int(sq.get("id", 0) or 0)
+    query = sq.get("question", "")
+    print(f"  [Q{q_id}/Reflect] 开始反思...")
+
+    llm_with_baike, messages = _reflect_request(state)
+    deadline = state.get("deadline_ts")
+    try:
+        response = await ainvoke_llm(llm_with_baike, messages, node="research_reflect", deadline=deadline)
+    except LLMUnavailable as e:
+        print(f"  [Q{q_id}/Reflect] LLM 不可用（{e}），记为无有效信息")
+        return None
+    reflection = response.content.strip()
+
+    if getattr(response, "tool_calls", None):
+        baike_results = await abaike_search_many(_baike_verify_entities(q_id, response))
+        llm, messages = _evidence_request(q_id, query, reflection, baike_results)
+        try:
+            return (await ainvoke_llm(llm, messages, node="research_evidence", deadline=deadline)).content.strip()
+        except LLMUnavailable as e:
+            print(f"  [Q{q_id}/Evidence] LLM 不可用（{e}），使用反思输出")
+            return reflection
+    print(f"  [Q{q_id}/Reflect] 反思完成，未触发百科验证")
+    return reflection
+
+
+async def areflect_and_extract(state: ResearchSubgraphState) -> dict:
+    """_reflect_and_extract 的异步版本"""
+    q_id = int(state.get("current_branch_question", {}).get("id", 0) or 0)
+    return _evidence_result(state, q_id, (await _areflect_evidence(state)) or "")
+
+
+class _AsyncPipeline(_PipelineResults):
+    """_ThreadedPipeline 的异步版本：搜索 / 深读是当前事件循环中的任务"""
+
+    def __init__(self, query: str, deep_read: bool, calls: list):
+        super().__init__(query, deep_read)
+        self._tasks = {asyncio.ensure_future(ASEARCH_HITS_BY_TOOL[name](**args)): ("search", name)
+                       for name, args in calls}
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    async def collect(self, timeout: float = None) -> None:
+        if not self._tasks:
+            return
+        done, _ = await asyncio.wait(list(self._tasks), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            kind, key = self._tasks.pop(task)
+            if kind == "search":
+                try:
+                    urls = self.add_batch(key, task.result())
+                except Exception as e:
+                    urls = self.add_batch(key, error=e)
+                for url in urls:
+                    self._tasks[asyncio.ensure_future(afetch_url_content(url, 15000))] = ("fetch", url)
+            else:
+                try:
+                    self.add_page(key, task.result())
+                except Exception:
+                    continue
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+
+async def astream_research(state: ResearchSubgraphState) -> dict:
+    """_stream_research 的异步版本"""
+    sq = state.get("current_branch_question", {})
+    q_id = int(sq.get("id", 0) or 0)
+    query = sq.get("question", "")
+    engine = (sq.get("search_engine") or "both").lower()
+    deadline = state.get("deadline_ts")
+    t0 = time.monotonic()
+
+    print(f"  [Q{q_id}/Search] 开始流水线搜索 (engine={engine})")
+    results = _AsyncPipeline(query, engine != "baike", (await _aselect_search_calls(state)) if query else [])
+    try:
+        while results.pending and not results.has_content():
+            await results.collect()
+        print(f"  [Q{q_id}/Stream] 已到达 {len(results.batches)} 组结果，开始首轮反思"
+              f"（仍在进行: {results.pending}）")
+        snapshot = results.snapshot(state)
+        content = (await _areflect_evidence(snapshot)) or ""
+        statement, reliability = _parse_evidence_from_content(content, q_id)
+        print(f"  [Q{q_id}/Stream] 临时证据 ({reliability}): {statement[:80]}")
+        trace.record("stream", "provisional", wait=round(time.monotonic() - t0, 3), pending=results.pending)
+
+        for _ in range(STREAM_MAX_REFINES):
+            straggler_deadline = time.monotonic() + STREAM_STRAGGLER_WAIT
+            while results.pending and not results.worth_refining():
+                left = straggler_deadline - time.monotonic()
+                if left <= 0:
+                    break
+                await results.collect(timeout=left)
+            if not results.worth_refining():
+                break
+            if remaining_time(deadline) < LLM_MIN_CALL_TIME:
+                print(f"  [Q{q_id}/Stream] 运行剩余时间不足，保留临时证据")
+                break
+            new_hits, new_texts = results.novelty()
+            print(f"  [Q{q_id}/Stream] 新结果到达（新 URL {new_hits} 个，新长文本 {new_texts} 篇），细化证据")
+            trace.record("stream", "refine", new_hits=new_hits, new_texts=new_texts)
+            next_snapshot = results.snapshot(state)
+            refined = await _areflect_evidence(next_snapshot)
+            if refined is not None:
+                snapshot, content = next_snapshot, refined
+        if results.pending:
+            print(f"  [Q{q_id}/Stream] 放弃 {results.pending} 个未到达 / 无新信息的结果")
+            trace.record("stream", "abandoned", count=results.pending)
+    finally:
+        await results.close()
+
+    return _evidence_result(snapshot, q_id, content)
@@ -7,42 +7,47 @@
 import re
 from typing import List
 
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import HumanMessage, SystemMessage
 
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from config.settings import (
-    LLM_API_KEY, LLM_BASE_URL, LLM_MODEL_NAME,
     MAX_SEARCH_RETRIES, MAX_LOOPS, MAX_BAIKE_VERIFY,
-    MAX_PRECHECK_ENTITIES,
+    MAX_PRECHECK_ENTITIES, DEADLINE_SUMMARY_RESERVE, STRUCTURED_OUTPUT_NODES,
 )
 from graph.state import AgentState, SubQuestion, Evidence
-from tools.search import bocha_search, serper_search, auto_search, fetch_url_content, baike_search
+from tools.search import (
+    bocha_search, serper_search, auto_search, fetch_url_content, baike_search, baike_search_many,
+)
+from agents.llm import LLMUnavailable, get_llm, invoke_llm, invoke_until, remaining_time
+from utils.answer_formatter import rule_normalize
+from utils.token_budget import budget_for, select_evidence, share_budget, truncate_to_tokens
+from agents.structured import parse_structured, validate_plan, validate_verdict
 from agents.prompts import (
-    DECOMPOSE_PLAN_PROMPT, RESEARCH_SEARCH_PROMPT, RESEARCH_REFLECT_PROMPT,
-    RESEARCH_EVIDENCE_PROMPT, GLOBAL_VERIFY_PROMPT,
-    GLOBAL_SUMMARY_PROMPT, FORMAT_ANSWER_PROMPT,
-    QUICK_CHECK_PROMPT, ENTITY_PRECHECK_PROMPT,
+    DECOMPOSE_PLAN_SYSTEM, DECOMPOSE_PLAN_PROMPT, DECOMPOSE_PLAN_JSON_SYSTEM, DECOMPOSE_PLAN_JSON_FORMAT,
+    GLOBAL_VERIFY_SYSTEM, GLOBAL_VERIFY_PROMPT, GLOBAL_VERIFY_JSON_SYSTEM, GLOBAL_VERIFY_JSON_FORMAT,
+    GLOBAL_SUMMARY_SYSTEM, GLOBAL_SUMMARY_PROMPT,
+    FORMAT_ANSWER_SYSTEM, FORMAT_ANSWER_PROMPT,
+    QUICK_CHECK_SYSTEM, QUICK_CHECK_PROMPT,
+    ENTITY_PICK_SYSTEM, ENTITY_PICK_PROMPT,
+    ENTITY_PRECHECK_SYSTEM, ENTITY_PRECHECK_PROMPT,
 )
 
 
-def _get_llm(temperature: float = 0.2) -> ChatOpenAI:
-    return ChatOpenAI(
-        model=LLM_MODEL_NAME,
-        api_key=LLM_API_KEY,
-        base_url=LLM_BASE_URL,
-        temperature=temperature,
-    )
+def _evidence_line(e: Evidence) -> str:
+    return f"  [E{e['id']}] (可靠性:{e['reliability']}) {e['statement']}"
 
 
-def _evidence_summary(evidence_pool: list) -> str:
-    """格式化证据池为可读文本"""
+def _evidence_summary(evidence_pool: list, budget: int = None, question: str = "") -> str:
+    """格式化证据池为可读文本；指定 budget（token）时按可靠性与问题相关度挑选放得下的证据"""
     if not evidence_pool:
         return "（暂无证据）"
-    lines = []
-    for e in evidence_pool:
-        lines.append(f"  [E{e['id']}] (可靠性:{e['reliability']}) {e['statement']}")
+    kept, omitted = evidence_pool, 0
+    if budget:
+        kept, omitted = select_evidence(evidence_pool, budget, question, _evidence_line)
+    lines = [_evidence_line(e) for e in kept]
+    if omitted:
+        lines.append(f"  （另有 {omitted} 条低可靠 / 低相关证据因篇幅未列出）")
     return "\n".join(lines)
 
 
@@ -121,16 +126,8 @@ def _deep_read_promising_urls(raw_results: str, max_reads: int = 2) -> str:
 
 # ==================== 节点 0.5：实体预校验（decompose后、research前） ====================
 
-def entity_precheck(state: AgentState) -> dict:
-    """实体预校验节点 — LLM function calling + 百科快速校验候选实体。
-
-    流程：
-    1. LLM（绑定 baike_search 工具）阅读知识推理，自行选择关键实体调用百科
-    2. 执行百科工具调用
-    3. LLM 判断百科信息是否推翻候选假设
-
-    仅在第一轮（loop_count=0）且首次（precheck_count=0）时执行。
-    """
+def _precheck_skip(state: AgentState):
+    """非首轮 / 已校验过 / 无知识推理内容时直接放行（返回节点输出），否则返回 None"""
     precheck_count = state.get("precheck_count", 0)
     loop_count = state.get("loop_count", 0)
 
@@ -138,137 +135,151 @@ def entity_precheck(state: AgentState) -> dict:
     if loop_count > 0 or precheck_count > 0:
         return {"precheck_passed": True, "precheck_count": precheck_count}
 
-    anchor = state.get("anchor_analysis", "")
-    if not anchor:
+    if not state.get("anchor_analysis", ""):
         print(f"[EntityPrecheck] 无知识推理内容，自动放行")
         return {"precheck_passed": True, "precheck_count": precheck_count + 1}
 
     print(f"\n{'='*60}")
     print(f"[EntityPrecheck] LLM 选择候选实体并查询百科...")
     print(f"{'='*60}")
+    return None
 
-    # Step 1: LLM function calling — 让 LLM 自己选要验证的实体
-    llm = _get_llm(temperature=0.0)
-    llm_with_baike = llm.bind_tools([baike_search])
-
-    pick_prompt = (
-        f"你是一位快速事实核查助手。阅读以下问题分析，从中识别最关键的1-{MAX_PRECHECK_ENTITIES}个"
-        f"候选实体（人名、机构名、地名等专有名词），并调用 baike_search 工具查询百科信息。\n\n"
-        f"原始问题：{state['original_question']}\n\n"
-        f"分析内容：\n{anchor[:4000]}\n\n"
-        f"要求：只对具体的专有名词调用 baike_search（如人名、机构名、地名），"
-        f"不要对描述性短语或抽象概念调用。"
+
+def _precheck_pick_request(state: AgentState) -> tuple:
+    """Step 1：LLM function calling（绑定 baike_search）选择要验证的实体 → (llm, messages)"""
+    llm_with_baike = get_llm(temperature=0.0, tools=[baike_search], node="entity_precheck")
+    pick_prompt = ENTITY_PICK_PROMPT.format(
+        question=state["original_question"],
+        anchor=truncate_to_tokens(state.get("anchor_analysis", ""), budget_for("ENTITY_PICK", "anchor")),
     )
+    return llm_with_baike, [
+        SystemMessage(content=ENTITY_PICK_SYSTEM.format(max_entities=MAX_PRECHECK_ENTITIES)),
+        HumanMessage(content=pick_prompt),
+    ]
 
-    try:
-        response = llm_with_baike.invoke([HumanMessage(content=pick_prompt)])
-    except Exception as e:
-        print(f"[EntityPrecheck] LLM异常: {e}，自动放行")
-        return {"precheck_passed": True, "precheck_count": precheck_count + 1}
 
-    # Step 2: 执行 LLM 选择的百科工具调用
+def _precheck_entities(response):
+    """LLM 选择的实体列表；未发起工具调用时返回 None"""
     if not getattr(response, "tool_calls", None):
         print(f"[EntityPrecheck] LLM未选择任何实体验证，自动放行")
-        return {"precheck_passed": True, "precheck_count": precheck_count + 1}
+        return None
+    entities = [tc["args"].get("entity", "") for tc in response.tool_calls[:MAX_PRECHECK_ENTITIES]]
+    entities = [e for e in entities if e]
+    print(f"  [EntityPrecheck] LLM选择验证: {entities}")
+    return entities
+
+
+def _baike_hits_only(results: dict) -> dict:
+    """过滤出百科命中的实体 {实体: 百科文本}"""
+    hits = {}
+    for entity, result in results.items():
+        if "未找到" not in result and "查询异常" not in result:
+            hits[entity] = result
+            print(f"  [EntityPrecheck] ✓ 百科命中: {entity}")
+        else:
+            print(f"  [EntityPrecheck] ✗ 百科未命中: {entity}")
+    if not hits:
+        print(f"[EntityPrecheck] 所有实体百科未命中，自动放行")
+    return hits
 
-    baike_results = {}
-    for tc in response.tool_calls[:MAX_PRECHECK_ENTITIES]:
-        entity = tc["args"].get("entity", "")
-        print(f"  [EntityPrecheck] LLM选择验证: {entity}")
-        try:
-            result = baike_search.invoke(tc["args"])
-            if "未找到" not in result and "查询异常" not in result:
-                baike_results[entity] = result
-                print(f"  [EntityPrecheck] ✓ 百科命中: {entity}")
-            else:
-                print(f"  [EntityPrecheck] ✗ 百科未命中: {entity}")
-        except Exception:
-            print(f"  [EntityPrecheck] ✗ 百科查询失败: {entity}")
 
-    if not baike_results:
-        print(f"[EntityPrecheck] 所有实体百科未命中，自动放行")
-        return {"precheck_passed": True, "precheck_count": precheck_count + 1}
+def _baike_text(baike_results: dict, budget: int) -> str:
+    """各实体的百科文本均分预算（短的完整保留）"""
+    texts = share_budget(list(baike_results.values()), budget)
+    return "\n\n".join(f"[{e}]:\n{t}" for e, t in zip(baike_results, texts))
 
-    # Step 3: LLM 判断百科信息是否推翻假设
-    baike_text = "\n\n".join([f"[{e}]:\n{r[:2000]}" for e, r in baike_results.items()])
 
+def _precheck_judge_request(state: AgentState, baike_results: dict) -> tuple:
+    """Step 3：LLM 判断百科信息是否推翻假设 → (llm, messages)"""
+    llm = get_llm(temperature=0.0, node="entity_precheck")
     judge_prompt = ENTITY_PRECHECK_PROMPT.format(
         question=state["original_question"],
-        candidates_analysis=anchor[:3000],
-        baike_info=baike_text[:5000],
+        candidates_analysis=truncate_to_tokens(
+            state.get("anchor_analysis", ""), budget_for("ENTITY_PRECHECK_PROMPT", "candidates_analysis"),
+        ),
+        baike_info=_baike_text(baike_results, budget_for("ENTITY_PRECHECK_PROMPT", "baike_info")),
     )
+    return llm, [SystemMessage(content=ENTITY_PRECHECK_SYSTEM), HumanMessage(content=judge_prompt)]
 
-    try:
-        response = llm.invoke([HumanMessage(content=judge_prompt)])
-        content = response.content.strip()
-
-        passed = "通过" in content and "不通过" not in content
-        feedback = ""
-        if not passed:
-            if "反馈：" in content or "反馈:" in content:
-                feedback = content.split("反馈：")[-1].split("反馈:")[-1].strip()
-            feedback += f"\n\n百科参考信息：\n{baike_text[:3000]}"
-
-        print(f"[EntityPrecheck] 判断: {'通过 ✓' if passed else '不通过 ✗'}")
-        if not passed:
-            print(f"[EntityPrecheck] 反馈: {feedback[:200]}")
-
-        return {
-            "precheck_passed": passed,
-            "precheck_count": precheck_count + 1,
-            "precheck_feedback": feedback if not passed else "",
-        }
-    except Exception as e:
-        print(f"[EntityPrecheck] LLM异常: {e}，自动放行")
-        return {"precheck_passed": True, "precheck_count": precheck_count + 1}
 
+def _precheck_verdict(content: str, baike_results: dict, precheck_count: int) -> dict:
+    content = content.strip()
+    passed = "通过" in content and "不通过" not in content
+    feedback = ""
+    if not passed:
+        if "反馈：" in content or "反馈:" in content:
+            feedback = content.split("反馈：")[-1].split("反馈:")[-1].strip()
+        feedback += f"\n\n百科参考信息：\n{_baike_text(baike_results, budget_for('ENTITY_PRECHECK_PROMPT', 'feedback_baike'))}"
 
-# ==================== 节点 1：问题拆分和规划（ToT + 奥卡姆剃刀） ====================
+    print(f"[EntityPrecheck] 判断: {'通过 ✓' if passed else '不通过 ✗'}")
+    if not passed:
+        print(f"[EntityPrecheck] 反馈: {feedback[:200]}")
 
-def decompose_plan(state: AgentState) -> dict:
-    """问题拆分和规划节点 — 奥卡姆剃刀原则，只为缺口生成子问题"""
-    print(f"\n{'='*60}")
-    print(f"[DecomposePlan] 分析问题并规划搜索策略（奥卡姆剃刀）...")
-    print(f"{'='*60}")
+    return {
+        "precheck_passed": passed,
+        "precheck_count": precheck_count + 1,
+        "precheck_feedback": feedback if not passed else "",
+    }
 
-    llm = _get_llm()
 
-    existing_evidence = _evidence_summary(state.get("evidence_pool", []))
-    completed_questions = _completed_questions_summary(
-        state.get("sub_questions", []),
-        state.get("completed_question_ids", []),
-    )
+def entity_precheck(state: AgentState) -> dict:
+    """实体预校验节点 — LLM function calling + 百科快速校验候选实体。
 
-    # 先更新已有子问题状态（标记已完成的）
-    completed_set = set(state.get("completed_question_ids", []))
-    all_questions = list(state.get("sub_questions", []))
-    for sq in all_questions:
-        if sq["id"] in completed_set and sq["status"] == "pending":
-            sq["status"] = "done"
+    流程：
+    1. LLM（绑定 baike_search 工具）阅读知识推理，自行选择关键实体调用百科
+    2. 执行百科工具调用
+    3. LLM 判断百科信息是否推翻候选假设
 
-    failed_queries = _failed_queries_summary(
-        state.get("sub_questions", []),
-        state.get("evidence_pool", []),
-        state.get("completed_question_ids", []),
-    )
+    仅在第一轮（loop_count=0）且首次（precheck_count=0）时执行。
+    """
+    skipped = _precheck_skip(state)
+    if skipped is not None:
+        return skipped
+    precheck_count = state.get("precheck_count", 0)
+    passed = {"precheck_passed": True, "precheck_count": precheck_count + 1}
 
-    prompt = DECOMPOSE_PLAN_PROMPT.format(
-        question=state["original_question"],
-        existing_evidence=existing_evidence,
-        completed_questions=completed_questions,
-        failed_queries=failed_queries,
-    )
+    # Step 1: LLM function calling — 让 LLM 自己选要验证的实体
+    llm_with_baike, messages = _precheck_pick_request(state)
+    try:
+        response = invoke_llm(llm_with_baike, messages, node="entity_precheck", deadline=state.get("deadline_ts"))
+    except Exception as e:
+        print(f"[EntityPrecheck] LLM异常: {e}，自动放行")
+        return passed
 
-    # 如果实体预校验失败，将反馈注入 prompt
-    precheck_fb = state.get("precheck_feedback", "")
-    if precheck_fb:
-        prompt += (f"\n\n## 实体预校验反馈（重要！你之前提出的候选实体被百科信息推翻）\n"
-                   f"{precheck_fb}\n"
-                   f"请根据此反馈重新分析问题，调整候选假设和搜索策略。")
+    # Step 2: 执行 LLM 选择的百科工具调用（各实体并发查询，百科结果按实体缓存，重复实体只查一次）
+    entities = _precheck_entities(response)
+    if entities is None:
+        return passed
+    baike_results = _baike_hits_only(baike_search_many(entities))
+    if not baike_results:
+        return passed
+
+    # Step 3: LLM 判断百科信息是否推翻假设
+    llm, messages = _precheck_judge_request(state, baike_results)
+    try:
+        response = invoke_llm(llm, messages, node="entity_precheck", deadline=state.get("deadline_ts"))
+        return _precheck_verdict(response.content, baike_results, precheck_count)
+    except Exception as e:
+        print(f"[EntityPrecheck] LLM异常: {e}，自动放行")
+        return passed
 
-    response = llm.invoke([HumanMessage(content=prompt)])
-    content = response.content.strip()
 
+# ==================== 节点 1：问题拆分和规划（ToT + 奥卡姆剃刀） ====================
+
+def _clean_query(query: str) -> str:
+    """清除子问题查询中残余的 markdown 格式与引号包裹"""
+    query = re.sub(r'^[\*\#\`\s]+', '', query)
+    query = re.sub(r'[\*\#\`]+$', '', query).strip()
+    # 去除引号包裹（LLM 有时用引号包裹查询）
+    if query.startswith('"') and query.endswith('"'):
+        query = query[1:-1].strip()
+    if query.startswith('`') and query.endswith('`'):
+        query = query[1:-1].strip()
+    return query
+
+
+def _parse_plan_text(content: str) -> tuple:
+    """Markdown 文本模式的规划输出解析 → (知识推理, [{question, purpose, priority, engine}])"""
     # 解析知识推理（兼容旧版"锚点分析"）
     anchor_analysis = ""
     for section_header in ["## 知识推理", "## 锚点分析"]:
@@ -278,10 +289,7 @@ def decompose_plan(state: AgentState) -> dict:
             break
 
     # 解析子问题列表
-    existing_ids = {sq["id"] for sq in all_questions}
-    next_id = max(existing_ids) + 1 if existing_ids else 1
-
-    new_questions: List[SubQuestion] = []
+    items = []
     current_q = {"question": "", "engine": "both", "priority": "中", "purpose": ""}
 
     sq_section = ""
@@ -295,17 +303,7 @@ def decompose_plan(state: AgentState) -> dict:
 
         if re.match(r'^\d+[\.\.\)）、]', line):
             if current_q["question"]:
-                new_questions.append(SubQuestion(
-                    id=next_id,
-                    question=current_q["question"],
-                    purpose=current_q["purpose"],
-                    priority=current_q["priority"],
-                    status="pending",
-                    search_engine=current_q["engine"],
-                    raw_results="",
-                    reflection="",
-                ))
-                next_id += 1
+                items.append(dict(current_q))
 
             stripped = re.sub(r'^\d+[\.\.\)）、]\s*', '', line).strip()
             # 先清除 markdown 格式（**子问题**：→ 子问题：），防止标签匹配失败
@@ -318,14 +316,7 @@ def decompose_plan(state: AgentState) -> dict:
                 current_q["question"] = stripped_clean.split("问题：")[-1].split("问题:")[-1].strip()
             else:
                 current_q["question"] = stripped_clean
-            # 清除残余 markdown 格式泄漏
-            current_q["question"] = re.sub(r'^[\*\#\`\s]+', '', current_q["question"])
-            current_q["question"] = re.sub(r'[\*\#\`]+$', '', current_q["question"]).strip()
-            # 去除引号包裹（LLM 有时用引号包裹查询）
-            if current_q["question"].startswith('"') and current_q["question"].endswith('"'):
-                current_q["question"] = current_q["question"][1:-1].strip()
-            if current_q["question"].startswith('`') and current_q["question"].endswith('`'):
-                current_q["question"] = current_q["question"][1:-1].strip()
+            current_q["question"] = _clean_query(current_q["question"])
             current_q["engine"] = "both"
             current_q["priority"] = "中"
             current_q["purpose"] = ""
@@ -358,16 +349,80 @@ def decompose_plan(state: AgentState) -> dict:
             current_q["purpose"] = line.split("验证目标：")[-1].split("验证目标:")[-1].strip()
 
     if current_q["question"]:
+        items.append({**current_q, "purpose": current_q["purpose"] or "获取相关信息"})
+
+    return anchor_analysis, items
+
+
+def _plan_request(state: AgentState) -> tuple:
+    """→ (llm, messages, 更新状态后的子问题列表, 是否结构化输出)"""
+    structured = STRUCTURED_OUTPUT_NODES.get("decompose_plan", False)
+    llm = get_llm(node="decompose_plan", json_mode=structured)
+    system = DECOMPOSE_PLAN_JSON_SYSTEM if structured else DECOMPOSE_PLAN_SYSTEM
+
+    existing_evidence = _evidence_summary(
+        state.get("evidence_pool", []),
+        budget=budget_for("DECOMPOSE_PLAN_PROMPT", "existing_evidence"),
+        question=state["original_question"],
+    )
+    completed_questions = _completed_questions_summary(
+        state.get("sub_questions", []),
+        state.get("completed_question_ids", []),
+    )
+
+    # 先更新已有子问题状态（标记已完成的）
+    completed_set = set(state.get("completed_question_ids", []))
+    all_questions = list(state.get("sub_questions", []))
+    for sq in all_questions:
+        if sq["id"] in completed_set and sq["status"] == "pending":
+            sq["status"] = "done"
+
+    failed_queries = _failed_queries_summary(
+        state.get("sub_questions", []),
+        state.get("evidence_pool", []),
+        state.get("completed_question_ids", []),
+    )
+
+    prompt = DECOMPOSE_PLAN_PROMPT.format(
+        question=state["original_question"],
+        existing_evidence=existing_evidence,
+        completed_questions=completed_questions,
+        failed_queries=failed_queries,
+    )
+
+    # 如果实体预校验失败，将反馈注入 prompt
+    precheck_fb = state.get("precheck_feedback", "")
+    if precheck_fb:
+        prompt += (f"\n\n## 实体预校验反馈（重要！你之前提出的候选实体被百科信息推翻）\n"
+                   f"{precheck_fb}\n"
+                   f"请根据此反馈重新分析问题，调整候选假设和搜索策略。")
+
+    return llm, [SystemMessage(content=system), HumanMessage(content=prompt)], all_questions, structured
+
+
+def _plan_result(state: AgentState, all_questions: list, content: str, plan) -> dict:
+    """结构化结果（plan）或 Markdown 文本（plan 为 None 时）→ 新子问题合并入列表"""
+    anchor_analysis, items = _parse_plan_text(content) if plan is None else (
+        plan["reasoning"],
+        [{"question": _clean_query(q["question"]), "purpose": q["purpose"] or "获取相关信息",
+          "priority": q["priority"], "engine": "both"} for q in plan["sub_questions"]],
+    )
+
+    existing_ids = {sq["id"] for sq in all_questions}
+    next_id = max(existing_ids) + 1 if existing_ids else 1
+    new_questions: List[SubQuestion] = []
+    for item in items:
         new_questions.append(SubQuestion(
             id=next_id,
-            question=current_q["question"],
-            purpose=current_q["purpose"] or "获取相关信息",
-            priority=current_q["priority"],
+            question=item["question"],
+            purpose=item["purpose"],
+            priority=item["priority"],
             status="pending",
-            search_engine=current_q["engine"],
+            search_engine=item["engine"],
             raw_results="",
             reflection="",
         ))
+        next_id += 1
 
     # Fallback
     if not new_questions:
@@ -417,36 +472,84 @@ def decompose_plan(state: AgentState) -> dict:
     }
 
 
+def decompose_plan(state: AgentState) -> dict:
+    """问题拆分和规划节点 — 奥卡姆剃刀原则，只为缺口生成子问题"""
+    print(f"\n{'='*60}")
+    print(f"[DecomposePlan] 分析问题并规划搜索策略（奥卡姆剃刀）...")
+    print(f"{'='*60}")
+
+    llm, messages, all_questions, structured = _plan_request(state)
+    try:
+        content = invoke_llm(llm, messages, node="decompose_plan", deadline=state.get("deadline_ts")).content.strip()
+    except LLMUnavailable as e:
+        # 无规划输出 → Fallback 直接搜索原始问题
+        print(f"[DecomposePlan] LLM 不可用（{e}），直接搜索原始问题")
+        content = ""
+
+    # 结构化输出：校验 + 修复；修复失败（或文本模式）时按 Markdown 解析
+    plan = None
+    if structured and content:
+        plan = parse_structured(content, validate_plan, DECOMPOSE_PLAN_JSON_FORMAT, "DecomposePlan",
+                                deadline=state.get("deadline_ts"))
+    return _plan_result(state, all_questions, content, plan)
+
+
 # ==================== 快速充分性检查（供 parallel_research 动态剪枝调用） ====================
 
-def quick_sufficiency_check(question: str, evidence_pool: list) -> tuple:
-    """快速充分性检查 — 轻量级 LLM 调用，判断当前证据是否足以回答问题。
+def _quick_check_done(text: str) -> bool:
+    """流式提前停止：已判断为不充分，或答案行已完整输出"""
+    for line in text.split("\n")[:-1]:
+        line = line.strip()
+        if "不充分" in line or line.startswith(("答案：", "答案:")):
+            return True
+    return False
 
-    Returns:
-        (is_sufficient: bool, quick_answer: str)
-    """
-    llm = _get_llm(temperature=0.0)
-    evidence_text = _evidence_summary(evidence_pool)
 
+def _quick_check_request(question: str, evidence_pool: list) -> tuple:
+    llm = get_llm(temperature=0.0, node="quick_check")
+    evidence_text = _evidence_summary(
+        evidence_pool, budget=budget_for("QUICK_CHECK_PROMPT", "evidence"), question=question,
+    )
     prompt = QUICK_CHECK_PROMPT.format(
         question=question,
         evidence_count=len(evidence_pool),
         evidence=evidence_text,
     )
+    return llm, [SystemMessage(content=QUICK_CHECK_SYSTEM), HumanMessage(content=prompt)]
 
-    try:
-        response = llm.invoke([HumanMessage(content=prompt)])
-        content = response.content.strip()
 
-        is_sufficient = "充分" in content and "不充分" not in content
-        answer = ""
-        if "答案：" in content or "答案:" in content:
-            answer = content.split("答案：")[-1].split("答案:")[-1].split("\n")[0].strip()
+def _quick_check_result(content: str) -> tuple:
+    is_sufficient = "充分" in content and "不充分" not in content
+    answer = ""
+    if "答案：" in content or "答案:" in content:
+        answer = content.split("答案：")[-1].split("答案:")[-1].split("\n")[0].strip()
+
+    print(f"[QuickCheck] 判断: {'充分' if is_sufficient else '不充分'}"
+          + (f"，答案: {answer}" if answer else ""))
+
+    return is_sufficient, answer
+
+
+def quick_sufficiency_check(question: str, evidence_pool: list, deadline: float = None, cancel=None) -> tuple:
+    """快速充分性检查 — 轻量级 LLM 调用，判断当前证据是否足以回答问题。
+    cancel（threading.Event）被设置后检查作废：尚未开始则直接返回，流式生成中则在下一行停止。
 
-        print(f"[QuickCheck] 判断: {'充分' if is_sufficient else '不充分'}"
-              + (f"，答案: {answer}" if answer else ""))
+    Returns:
+        (is_sufficient: bool, quick_answer: str)
+    """
+    if cancel is not None and cancel.is_set():
+        return False, ""
 
-        return is_sufficient, answer
+    llm, messages = _quick_check_request(question, evidence_pool)
+    try:
+        content = invoke_until(
+            llm, messages,
+            lambda text: (cancel is not None and cancel.is_set()) or _quick_check_done(text),
+            node="quick_check", deadline=deadline,
+        ).strip()
+        if cancel is not None and cancel.is_set():
+            return False, ""
+        return _quick_check_result(content)
     except Exception as e:
         print(f"[QuickCheck] 异常: {e}")
         return False, ""
@@ -454,8 +557,43 @@ def quick_sufficiency_check(question: str, evidence_pool: list) -> tuple:
 
 # ==================== 节点 3：全局验证（GoT — 推理链评估） ====================
 
-def global_verify(state: AgentState) -> dict:
-    """全局验证节点 — 评估推理链完整性（取代刚性覆盖率百分比）"""
+def _verify_done(text: str) -> bool:
+    """流式提前停止："## 判断" 段的当前最佳答案行已完整输出（其后的缺口说明/剪枝建议不参与解析）"""
+    clean = text.replace("**", "").replace("*", "")
+    if "## 判断" not in clean:
+        return False
+    judgment = clean.split("## 判断", 1)[1]
+    return any("当前最佳答案" in line for line in judgment.split("\n")[:-1])
+
+
+def _parse_verdict_text(content: str) -> tuple:
+    """Markdown 文本模式的验证输出解析 → (推理链, 是否充分, 当前最佳答案)"""
+    # 剥离 markdown 格式符号后解析
+    content_clean = content.replace("**", "").replace("*", "")
+    content_clean = re.sub(r'^[\s\-]+', '', content_clean, flags=re.MULTILINE)
+
+    is_sufficient = False
+    best_answer = ""
+    reasoning_chain = ""
+
+    # 提取推理链
+    if "## 推理链" in content_clean:
+        rc_section = content_clean.split("## 推理链")[1]
+        reasoning_chain = rc_section.split("## 判断")[0].strip() if "## 判断" in rc_section else rc_section.strip()
+
+    # 提取判断
+    if "## 判断" in content_clean:
+        judgment = content_clean.split("## 判断")[1].strip()
+        if "充分性：充分" in judgment or "充分性:充分" in judgment or "充分性： 充分" in judgment:
+            is_sufficient = True
+        if "当前最佳答案：" in judgment or "当前最佳答案:" in judgment:
+            best_answer = judgment.split("当前最佳答案：")[-1].split("当前最佳答案:")[-1].split("\n")[0].strip()
+
+    return reasoning_chain, is_sufficient, best_answer
+
+
+def _verify_request(state: AgentState) -> tuple:
+    """→ (本轮序号, 更新状态后的子问题列表, llm, messages, 是否结构化输出)"""
     loop = state.get("loop_count", 0) + 1
     evidence_pool = state.get("evidence_pool", [])
     print(f"\n{'='*60}")
@@ -472,40 +610,37 @@ def global_verify(state: AgentState) -> dict:
     done_count = sum(1 for sq in sub_questions if sq["status"] == "done")
     print(f"[GlobalVerify] 子问题: {done_count}/{len(sub_questions)} 已完成 | 证据池: {len(evidence_pool)} 条")
 
-    llm = _get_llm(temperature=0.1)
+    structured = STRUCTURED_OUTPUT_NODES.get("global_verify", False)
+    llm = get_llm(temperature=0.1, node="global_verify", json_mode=structured)
 
     sq_summary = _sub_questions_summary(sub_questions)
-    all_evidence = _evidence_summary(state.get("evidence_pool", []))
+    all_evidence = _evidence_summary(
+        evidence_pool,
+        budget=budget_for("GLOBAL_VERIFY_PROMPT", "all_evidence"),
+        question=state["original_question"],
+    )
 
     prompt = GLOBAL_VERIFY_PROMPT.format(
         question=state["original_question"],
         sub_questions_summary=sq_summary,
         all_evidence=all_evidence,
     )
-
-    response = llm.invoke([HumanMessage(content=prompt)])
-    content = response.content.strip()
-
-    # 剥离 markdown 格式符号后解析
-    content_clean = content.replace("**", "").replace("*", "")
-    content_clean = re.sub(r'^[\s\-]+', '', content_clean, flags=re.MULTILINE)
-
-    is_sufficient = False
-    best_answer = ""
-    reasoning_chain = ""
-
-    # 提取推理链
-    if "## 推理链" in content_clean:
-        rc_section = content_clean.split("## 推理链")[1]
-        reasoning_chain = rc_section.split("## 判断")[0].strip() if "## 判断" in rc_section else rc_section.strip()
-
-    # 提取判断
-    if "## 判断" in content_clean:
-        judgment = content_clean.split("## 判断")[1].strip()
-        if "充分性：充分" in judgment or "充分性:充分" in judgment or "充分性： 充分" in judgment:
-            is_sufficient = True
-        if "当前最佳答案：" in judgment or "当前最佳答案:" in judgment:
-            best_answer = judgment.split("当前最佳答案：")[-1].split("当前最佳答案:")[-1].split("\n")[0].strip()
+    system = GLOBAL_VERIFY_JSON_SYSTEM if structured else GLOBAL_VERIFY_SYSTEM
+    return loop, sub_questions, llm, [SystemMessage(content=system), HumanMessage(content=prompt)], structured
+
+
+def _verify_result(state: AgentState, loop: int, sub_questions: list, content: str, verdict) -> dict:
+    """结构化结果（verdict）或 Markdown 文本（verdict 为 None 时）→ 节点输出（含循环上限 / deadline 强制通过）"""
+    deadline = state.get("deadline_ts")
+    if verdict is not None:
+        reasoning_chain = "\n\n".join(part for part in (
+            verdict["reasoning_chain"],
+            f"## 条件核查清单\n{verdict['condition_check']}" if verdict["condition_check"] else "",
+            f"## 假设审计\n{verdict['assumption_audit']}" if verdict["assumption_audit"] else "",
+        ) if part)
+        is_sufficient, best_answer = verdict["sufficient"], verdict["best_answer"]
+    else:
+        reasoning_chain, is_sufficient, best_answer = _parse_verdict_text(content)
 
     # 循环次数达到上限，强制通过
     force_passed = False
@@ -513,6 +648,11 @@ def global_verify(state: AgentState) -> dict:
         force_passed = True
         is_sufficient = True
         print(f"[GlobalVerify] 达到最大循环次数 {MAX_LOOPS}，强制通过")
+    elif not is_sufficient and remaining_time(deadline) < DEADLINE_SUMMARY_RESERVE:
+        # 剩余时间不够再跑一轮研究，留给总结与格式化
+        force_passed = True
+        is_sufficient = True
+        print(f"[GlobalVerify] 运行剩余 {max(remaining_time(deadline), 0):.0f}s，不再开启新一轮研究，强制通过")
 
     print(f"[GlobalVerify] 充分性: {'充分' if is_sufficient else '不充分'}")
     if best_answer:
@@ -533,28 +673,66 @@ def global_verify(state: AgentState) -> dict:
     return result
 
 
+def global_verify(state: AgentState) -> dict:
+    """全局验证节点 — 评估推理链完整性（取代刚性覆盖率百分比）"""
+    loop, sub_questions, llm, messages, structured = _verify_request(state)
+
+    deadline = state.get("deadline_ts")
+    try:
+        if structured:
+            # JSON 以 best_answer 收尾，无需流式提前停止
+            content = invoke_llm(llm, messages, node="global_verify", deadline=deadline).content.strip()
+        else:
+            content = invoke_until(llm, messages, _verify_done, node="global_verify", deadline=deadline).strip()
+    except LLMUnavailable as e:
+        # 无验证输出 → 按不充分处理；时间不足时由 deadline 检查强制进入总结
+        print(f"[GlobalVerify] LLM 不可用（{e}）")
+        content = ""
+
+    verdict = None
+    if structured and content:
+        verdict = parse_structured(content, validate_verdict, GLOBAL_VERIFY_JSON_FORMAT, "GlobalVerify",
+                                   deadline=deadline)
+    return _verify_result(state, loop, sub_questions, content, verdict)
+
+
 # ==================== 节点 4：全局总结（CoT） ====================
 
-def global_summary(state: AgentState) -> dict:
-    """全局总结节点 — 使用推理链推导最终答案"""
+def _summary_done(text: str) -> bool:
+    """流式提前停止："## 最终答案" 之后已有一个完整的非空行"""
+    clean = text.replace("**", "").replace("*", "").replace("`", "")
+    if "## 最终答案" not in clean:
+        return False
+    tail = clean.split("## 最终答案", 1)[1]
+    return any(line.strip() for line in tail.split("\n")[:-1])
+
+
+def _summary_request(state: AgentState) -> tuple:
     print(f"\n{'='*60}")
     print(f"[GlobalSummary] 生成最终答案...")
     print(f"{'='*60}")
 
-    llm = _get_llm(temperature=0.1)
+    llm = get_llm(temperature=0.1, node="global_summary")
 
-    all_evidence = _evidence_summary(state.get("evidence_pool", []))
+    all_evidence = _evidence_summary(
+        state.get("evidence_pool", []),
+        budget=budget_for("GLOBAL_SUMMARY_PROMPT", "all_evidence"),
+        question=state["original_question"],
+    )
     reasoning_chain = state.get("reasoning_chain", "（无推理链）")
 
     prompt = GLOBAL_SUMMARY_PROMPT.format(
         question=state["original_question"],
         all_evidence=all_evidence,
-        reasoning_chain=reasoning_chain[:6000],
+        # 推理链的结论在末尾，超预算时保留首尾
+        reasoning_chain=truncate_to_tokens(
+            reasoning_chain, budget_for("GLOBAL_SUMMARY_PROMPT", "reasoning_chain"), keep="ends",
+        ),
     )
+    return llm, [SystemMessage(content=GLOBAL_SUMMARY_SYSTEM), HumanMessage(content=prompt)]
 
-    response = llm.invoke([HumanMessage(content=prompt)])
-    content = response.content.strip()
 
+def _summary_result(state: AgentState, content: str) -> dict:
     # 剥离 markdown 格式后提取答案
     content_clean = content.replace("**", "").replace("*", "").replace("`", "")
 
@@ -584,6 +762,20 @@ def global_summary(state: AgentState) -> dict:
     return {"final_answer": answer}
 
 
+def global_summary(state: AgentState) -> dict:
+    """全局总结节点 — 使用推理链推导最终答案"""
+    llm, messages = _summary_request(state)
+    try:
+        content = invoke_until(
+            llm, messages, _summary_done, node="global_summary", deadline=state.get("deadline_ts"),
+        ).strip()
+    except LLMUnavailable as e:
+        # 无总结输出 → fallback 使用验证阶段的最佳答案
+        print(f"[GlobalSummary] LLM 不可用（{e}）")
+        content = ""
+    return _summary_result(state, content)
+
+
 # ==================== 节点 5：答案格式化 ====================
 
 def _extract_final_answer(text: str) -> str:
@@ -605,24 +797,48 @@ def _extract_final_answer(text: str) -> str:
     return lines[-1]
 
 
-def format_answer(state: AgentState) -> dict:
-    """格式化最终答案"""
+def _format_fast_path(state: AgentState):
+    """无答案或规则可确定时直接返回节点输出，否则返回 None（需要 LLM 格式化）"""
     print(f"\n[FormatAnswer] 格式化...")
 
     raw = state.get("final_answer", "")
     if not raw:
         print(f"[FormatAnswer] 无答案可格式化")
-        return {"formatted_answer": ""}
+        return {"formatted_answer": "", "normalized_answer": ""}
 
-    llm = _get_llm(temperature=0.0)
+    fast = rule_normalize(raw, state["original_question"])
+    if fast is not None:
+        print(f"[FormatAnswer] 规则快速路径: {fast}")
+        return {"formatted_answer": fast, "normalized_answer": fast}
+    return None
+
+
+def _format_request(state: AgentState) -> tuple:
+    llm = get_llm(temperature=0.0, node="format_answer")
     prompt = FORMAT_ANSWER_PROMPT.format(
         question=state["original_question"],
-        raw_answer=raw,
+        raw_answer=state.get("final_answer", ""),
     )
+    return llm, [SystemMessage(content=FORMAT_ANSWER_SYSTEM), HumanMessage(content=prompt)]
 
-    response = llm.invoke([HumanMessage(content=prompt)])
-    formatted = _extract_final_answer(response.content)
 
+def _format_result(formatted: str) -> dict:
     print(f"[FormatAnswer] 最终输出: {formatted}")
 
-    return {"formatted_answer": formatted}
+    return {"formatted_answer": formatted, "normalized_answer": formatted}
+
+
+def format_answer(state: AgentState) -> dict:
+    """格式化 + 归一化最终答案：规则可确定时直接输出，否则一次融合 LLM 调用"""
+    fast = _format_fast_path(state)
+    if fast is not None:
+        return fast
+
+    llm, messages = _format_request(state)
+    try:
+        response = invoke_llm(llm, messages, node="format_answer", deadline=state.get("deadline_ts"))
+        formatted = _extract_final_answer(response.content)
+    except LLMUnavailable as e:
+        print(f"[FormatAnswer] LLM 不可用（{e}），输出原始答案")
+        formatted = state.get("final_answer", "").strip()
+    return _format_result(formatted)
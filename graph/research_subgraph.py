@@ -3,57 +3,73 @@
 研究子图（Research Subgraph）— 用于封装单个子问题的固定研究流程。
 
 该子图会被主图通过 Send API 并行调度（并发粒度：子问题级）。
-为了进一步缩短单个子问题的耗时，子图内部对多搜索引擎请求与 DeepRead 采用线程并发。
+为了进一步缩短单个子问题的耗时，子图内部对多搜索引擎请求与 DeepRead 并发执行
+（进程级调度器的 search / fetch 类别，继承分支的优先级）。
+流水线模式（RESEARCH_STREAMING=1 开启，默认关闭）进一步让反思与搜索 / 深读重叠：
+首个引擎返回即产出临时证据，之后的结果只在带来新信息时触发细化，最慢的引擎不再卡住整个分支。
 """
 
-import re
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, TypedDict
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from dataclasses import replace
+from itertools import islice
+from typing import List, Tuple, TypedDict
 
-from langchain_core.messages import HumanMessage
-from langchain_openai import ChatOpenAI
+from langchain_core.messages import HumanMessage, SystemMessage
 from langgraph.graph import END, StateGraph
 
+from agents.llm import LLMUnavailable, get_llm, invoke_llm, remaining_time
 from agents.prompts import (
-    RESEARCH_SEARCH_PROMPT, RESEARCH_REFLECT_PROMPT, RESEARCH_EVIDENCE_PROMPT,
-    RESEARCH_REFLECT_EVIDENCE_PROMPT,
+    RESEARCH_SEARCH_SYSTEM, RESEARCH_SEARCH_PROMPT,
+    RESEARCH_EVIDENCE_SYSTEM, RESEARCH_EVIDENCE_PROMPT,
+    RESEARCH_REFLECT_EVIDENCE_SYSTEM, RESEARCH_REFLECT_EVIDENCE_PROMPT,
 )
 from config.settings import (
-    LLM_API_KEY,
-    LLM_BASE_URL,
-    LLM_MODEL_NAME,
-    MAX_SEARCH_RETRIES,
-    MAX_BAIKE_VERIFY,
+    LLM_MIN_CALL_TIME, MAX_BAIKE_VERIFY,
+    RESEARCH_STREAMING, STREAM_MAX_REFINES, STREAM_REFINE_MIN_NEW_HITS, STREAM_STRAGGLER_WAIT,
 )
 from graph.state import Evidence
-from tools.search import baike_search, bocha_search, fetch_url_content, serper_search
+from tools.hits import SearchBatch, iter_unique_hits
+from tools.search import (
+    SEARCH_HITS_BY_TOOL, baike_search, baike_search_many, bocha_search, fetch_url_content, serper_search,
+)
+from utils import scheduler, trace
+from utils.trace import traced_node
+from utils.token_budget import (
+    budget_for, estimate_tokens, pack_items, relevance, select_evidence, share_budget, truncate_to_tokens,
+)
 
 
 class ResearchSubgraphState(TypedDict, total=False):
     original_question: str
+    deadline_ts: float
+    stop_event: object         # threading.Event：主图剪枝后 set()，进行中的分支在下一阶段前退出（异步模式为 None，直接取消任务）
     evidence_pool: list
     current_branch_question: dict
     completed_question_ids: list
-    search_results: str
+    search_hits: list          # List[SearchBatch]，每次工具调用一个
+    deep_pages: list           # [(url, 页面文本), ...]，高价值页面深读结果
     reflection: str
     baike_supplement: str
 
 
-def _get_llm(temperature: float = 0.1) -> ChatOpenAI:
-    return ChatOpenAI(
-        model=LLM_MODEL_NAME,
-        api_key=LLM_API_KEY,
-        base_url=LLM_BASE_URL,
-        temperature=temperature,
-    )
+def _stopped(state: ResearchSubgraphState) -> bool:
+    stop_event = state.get("stop_event")
+    return stop_event is not None and stop_event.is_set()
+
 
+def _evidence_line(e: Evidence) -> str:
+    return f"  [E{e['id']}] (可靠性:{e['reliability']}) {e['statement']}"
 
-def _evidence_summary(evidence_pool: list) -> str:
+
+def _evidence_summary(evidence_pool: list, budget: int, question: str) -> str:
     if not evidence_pool:
         return "（暂无证据）"
-    return "\n".join(
-        [f"  [E{e['id']}] (可靠性:{e['reliability']}) {e['statement']}" for e in evidence_pool]
-    )
+    kept, omitted = select_evidence(evidence_pool, budget, question, _evidence_line)
+    lines = [_evidence_line(e) for e in kept]
+    if omitted:
+        lines.append(f"  （另有 {omitted} 条低可靠 / 低相关证据因篇幅未列出）")
+    return "\n".join(lines)
 
 
 _HIGH_VALUE_URL_PATTERNS = [
@@ -62,106 +78,167 @@ _HIGH_VALUE_URL_PATTERNS = [
 ]
 
 
-def _extract_urls(raw_results: str) -> List[str]:
-    return re.findall(r"https?://[^\s\)）\]]+", raw_results)
+def _deep_read_urls(batches: List[SearchBatch], max_reads: int = 2) -> List[str]:
+    """按名次挑选高价值（百科类）命中 URL"""
+    return list(islice(
+        (hit.url for hit in iter_unique_hits(batches)
+         if any(p in hit.url for p in _HIGH_VALUE_URL_PATTERNS)),
+        max_reads,
+    ))
+
 
+def _usable_page(content: str) -> bool:
+    return "[URL读取失败]" not in content and "[URL内容]" in content and len(content) > 100
 
-def _deep_read_parallel(raw_results: str, max_reads: int = 2) -> str:
-    urls = _extract_urls(raw_results)
-    picked: List[str] = []
-    for url in urls:
-        if len(picked) >= max_reads:
-            break
-        if any(p in url for p in _HIGH_VALUE_URL_PATTERNS):
-            picked.append(url)
+
+def _deep_read_parallel(batches: List[SearchBatch], max_reads: int = 2) -> List[Tuple[str, str]]:
+    """按名次挑选高价值（百科类）命中 URL 并行深读，返回 [(url, 页面文本), ...]"""
+    picked = _deep_read_urls(batches, max_reads)
     if not picked:
-        return ""
+        return []
 
-    parts: List[str] = []
-    with ThreadPoolExecutor(max_workers=len(picked)) as ex:
-        futs = [ex.submit(fetch_url_content, url, 15000) for url in picked]
-        for fut in as_completed(futs):
-            try:
-                c = fut.result()
-                if "[URL读取失败]" not in c and "[URL内容]" in c and len(c) > 100:
-                    parts.append(c)
-            except Exception:
-                continue
-    return "\n\n".join(parts)
+    pages: List[Tuple[str, str]] = []
+    futs = [(url, scheduler.submit("fetch", fetch_url_content, url, 15000)) for url in picked]
+    for url, fut in futs:
+        try:
+            c = fut.result()
+            if _usable_page(c):
+                pages.append((url, c))
+        except Exception:
+            continue
+    return pages
 
 
-def _search_parallel(state: ResearchSubgraphState) -> dict:
-    sq = state.get("current_branch_question", {})
-    q_id = sq.get("id", "?")
-    query = sq.get("question", "")
-    engine = (sq.get("search_engine") or "both").lower()
+_DEEP_PAGES_HEADER = "--- 以下为高价值页面的完整内容 ---"
 
-    if not query:
-        return {"search_results": ""}
 
-    print(f"  [Q{q_id}/Search] 开始搜索 (engine={engine})")
-    llm = _get_llm(temperature=0.1)
-    search_tools = [bocha_search, serper_search, baike_search]
-    tools_by_name = {t.name: t for t in search_tools}
-    llm_with_search = llm.bind_tools(search_tools)
+def _render_search_results(batches: List[SearchBatch], deep_pages: list, budget: int, query: str) -> str:
+    """构造 prompt 时才渲染搜索结果文本，总量控制在 budget（token）以内：
+    - 错误 / 无结果提示原样保留
+    - 搜索命中按（与子问题的相关度 + 名次）挑选，先占用至多一半预算（没有长文本时可用全部）
+    - 百科正文与深读页面共享剩余预算，按段落截断"""
+    body_batches = [b for b in batches if b.body and not b.error]      # 百科：渲染正文，hits 仅用于溯源
+    hit_batches = [b for b in batches if b.hits and not b.body and not b.error]
+    fixed = sum(estimate_tokens(b.render()) for b in batches if b.error or (not b.body and not b.hits))
+    remaining = max(0, budget - fixed)
+
+    hits = [hit for b in hit_batches for hit in b.hits]
+    hit_budget = remaining // 2 if body_batches or deep_pages else remaining
+    kept, _ = pack_items(
+        hits, hit_budget,
+        score=lambda h: relevance(query, f"{h.title} {h.snippet}") + 1.0 / h.rank,
+        render=lambda h: h.render(),
+    )
+    kept_ids = {id(h) for h in kept}
+    used = sum(estimate_tokens(h.render()) + 1 for h in kept)
+
+    long_texts = share_budget([b.body for b in body_batches] + [c for _, c in deep_pages], max(0, remaining - used))
+    bodies = dict(zip(map(id, body_batches), long_texts))
+    parts: List[str] = []
+    for b in batches:
+        if id(b) in bodies:
+            parts.append(replace(b, body=bodies[id(b)]).render())
+        elif b.hits and not b.body and not b.error:
+            picked = [h for h in b.hits if id(h) in kept_ids]
+            if picked:          # 命中全部落选的批次整体跳过
+                parts.append(replace(b, hits=picked).render())
+        else:
+            parts.append(b.render())
+    if deep_pages:
+        parts.append(_DEEP_PAGES_HEADER)
+        parts.extend(long_texts[len(body_batches):])
+    return "\n\n".join(p for p in parts if p)
+
+
+def _source_urls(batches: List[SearchBatch], deep_pages: list, limit: int = 3) -> List[str]:
+    """证据来源：已深读的页面优先，其次按名次取搜索命中 URL"""
+    urls = [url for url, _ in deep_pages] + [hit.url for hit in iter_unique_hits(batches)]
+    return list(dict.fromkeys(urls))[:limit]
 
+
+def _search_request(state: ResearchSubgraphState) -> tuple:
+    """→ (llm（绑定搜索工具）, messages)"""
+    sq = state.get("current_branch_question", {})
+    llm_with_search = get_llm(
+        temperature=0.1, tools=[bocha_search, serper_search, baike_search], node="research_search",
+    )
     search_prompt = RESEARCH_SEARCH_PROMPT.format(
-        sub_question=query,
+        sub_question=sq.get("question", ""),
         purpose=sq.get("purpose", ""),
         original_question=state.get("original_question", ""),
     )
+    return llm_with_search, [SystemMessage(content=RESEARCH_SEARCH_SYSTEM), HumanMessage(content=search_prompt)]
 
-    tool_calls = []
-    for attempt in range(MAX_SEARCH_RETRIES):
-        try:
-            response = llm_with_search.invoke([HumanMessage(content=search_prompt)])
-            tool_calls = getattr(response, "tool_calls", None) or []
-            break
-        except Exception:
-            if attempt == MAX_SEARCH_RETRIES - 1:
-                tool_calls = []
 
+def _search_calls(q_id, query: str, engine: str, tool_calls: list) -> list:
+    """LLM 选择的工具调用 → [(工具名, 参数)]；未选择时按子问题的 engine 默认搜索"""
     calls = []
     if tool_calls:
         for tc in tool_calls:
             tool_name = tc.get("name")
             tool_args = tc.get("args") or {}
-            if tool_name in tools_by_name:
-                calls.append((tool_name, tools_by_name[tool_name].invoke, tool_args))
+            if tool_name in SEARCH_HITS_BY_TOOL:
+                calls.append((tool_name, tool_args))
                 print(f"  [Q{q_id}/Search] LLM选择 {tool_name}({tool_args})")
     else:
         print(f"  [Q{q_id}/Search] LLM未选择工具，fallback到 engine={engine}")
         if engine == "baike":
-            calls = [("baike", baike_search.invoke, {"entity": query})]
+            calls = [("baike_search", {"entity": query})]
         elif engine == "bocha":
-            calls = [("bocha", bocha_search.invoke, {"query": query})]
+            calls = [("bocha_search", {"query": query})]
         elif engine == "serper":
-            calls = [("serper", serper_search.invoke, {"query": query})]
+            calls = [("serper_search", {"query": query})]
         else:
             calls = [
-                ("bocha", bocha_search.invoke, {"query": query}),
-                ("serper", serper_search.invoke, {"query": query}),
+                ("bocha_search", {"query": query}),
+                ("serper_search", {"query": query}),
             ]
+    return calls
+
+
+def _select_search_calls(state: ResearchSubgraphState) -> list:
+    """LLM 选择搜索工具 → [(工具名, 参数)]（LLM 不可用时按引擎默认搜索）"""
+    sq = state.get("current_branch_question", {})
+    q_id = sq.get("id", "?")
+    engine = (sq.get("search_engine") or "both").lower()
+    llm_with_search, messages = _search_request(state)
+    try:
+        response = invoke_llm(llm_with_search, messages, node="research_search", deadline=state.get("deadline_ts"))
+        tool_calls = getattr(response, "tool_calls", None) or []
+    except LLMUnavailable as e:
+        print(f"  [Q{q_id}/Search] LLM 不可用（{e}），按引擎默认搜索")
+        tool_calls = []
+    return _search_calls(q_id, sq.get("question", ""), engine, tool_calls)
+
 
-    results: List[str] = []
-    max_workers = max(1, min(len(calls), 4))
-    with ThreadPoolExecutor(max_workers=max_workers) as ex:
-        futs = [ex.submit(fn, args) for _, fn, args in calls]
-        for fut in as_completed(futs):
-            try:
-                results.append(fut.result())
-            except Exception as e:
-                results.append(f"[搜索失败] {query}: {e}")
+def _search_parallel(state: ResearchSubgraphState) -> dict:
+    sq = state.get("current_branch_question", {})
+    q_id = sq.get("id", "?")
+    query = sq.get("question", "")
+    engine = (sq.get("search_engine") or "both").lower()
+
+    if not query:
+        return {"search_hits": [], "deep_pages": []}
+
+    print(f"  [Q{q_id}/Search] 开始搜索 (engine={engine})")
+    calls = _select_search_calls(state)
+    if _stopped(state):
+        print(f"  [Q{q_id}/Search] 分支已剪枝，跳过搜索")
+        return {"search_hits": [], "deep_pages": []}
+    batches: List[SearchBatch] = []
+    futs = [(name, scheduler.submit("search", SEARCH_HITS_BY_TOOL[name], **args)) for name, args in calls]
+    for name, fut in futs:
+        try:
+            batches.append(fut.result())
+        except Exception as e:
+            batches.append(SearchBatch(name, query, error=f"[搜索失败] {query}: {e}"))
 
-    print(f"  [Q{q_id}/Search] 搜索完成，获取 {len(results)} 组结果")
-    search_results = "\n\n".join(results)
-    deep_content = "" if engine == "baike" else _deep_read_parallel(search_results, max_reads=2)
-    if deep_content:
-        search_results += "\n\n--- 以下为高价值页面的完整内容 ---\n\n" + deep_content
-        url_count = deep_content.count("[URL内容]")
-        print(f"  [Q{q_id}/DeepRead] 补充 {url_count} 个高价值页面")
+    print(f"  [Q{q_id}/Search] 搜索完成，获取 {len(batches)} 组结果")
+    deep_pages = [] if engine == "baike" or _stopped(state) else _deep_read_parallel(batches, max_reads=2)
+    if deep_pages:
+        print(f"  [Q{q_id}/DeepRead] 补充 {len(deep_pages)} 个高价值页面")
 
-    return {"search_results": search_results}
+    return {"search_hits": batches, "deep_pages": deep_pages}
 
 
 def _parse_evidence_from_content(content: str, q_id: int) -> tuple:
@@ -191,68 +268,67 @@ def _parse_evidence_from_content(content: str, q_id: int) -> tuple:
     return statement, reliability
 
 
-def _reflect_and_extract(state: ResearchSubgraphState) -> dict:
-    """合并版反思+证据提取 — 减少一次 LLM 调用。
-
-    流程：
-    1. 用合并 prompt 调用 LLM（绑定 baike 工具）
-    2. 若 LLM 触发 baike → 执行百科查询 → 用 EVIDENCE_PROMPT 做第二次 LLM 调用整合
-    3. 若未触发 baike → 直接从合并输出中解析证据（省掉第二次 LLM 调用）
-    """
+def _reflect_request(state: ResearchSubgraphState) -> tuple:
+    """合并版反思 + 证据提取 → (llm（绑定 baike 工具）, messages)"""
     sq = state.get("current_branch_question", {})
-    q_id = int(sq.get("id", 0) or 0)
     query = sq.get("question", "")
-    print(f"  [Q{q_id}/Reflect] 开始反思...")
-
-    llm = _get_llm(temperature=0.1)
-    llm_with_baike = llm.bind_tools([baike_search])
+    llm_with_baike = get_llm(temperature=0.1, tools=[baike_search], node="research_reflect")
 
     combined_prompt = RESEARCH_REFLECT_EVIDENCE_PROMPT.format(
         sub_question=query,
         purpose=sq.get("purpose", ""),
         original_question=state.get("original_question", ""),
-        evidence_summary=_evidence_summary(state.get("evidence_pool", [])),
-        search_results=(state.get("search_results", "") or "")[:12000],
+        evidence_summary=_evidence_summary(
+            state.get("evidence_pool", []),
+            budget_for("RESEARCH_REFLECT_EVIDENCE_PROMPT", "evidence_summary"),
+            query,
+        ),
+        search_results=_render_search_results(
+            state.get("search_hits") or [], state.get("deep_pages") or [],
+            budget_for("RESEARCH_REFLECT_EVIDENCE_PROMPT", "search_results"), query,
+        ),
     )
+    return llm_with_baike, [
+        SystemMessage(content=RESEARCH_REFLECT_EVIDENCE_SYSTEM), HumanMessage(content=combined_prompt),
+    ]
 
-    response = llm_with_baike.invoke([HumanMessage(content=combined_prompt)])
-    reflection = response.content.strip()
 
-    # 检查是否触发百科验证
-    baike_supplement = ""
-    if getattr(response, "tool_calls", None):
-        baike_parts = []
-        for tc in response.tool_calls[:MAX_BAIKE_VERIFY]:
-            entity = tc["args"].get("entity", "")
-            print(f"  [Q{q_id}/BaikeVerify] 验证实体: {entity}")
-            try:
-                result = baike_search.invoke(tc["args"])
-                if "未找到" not in result and "查询异常" not in result:
-                    baike_parts.append(f"百度百科验证 [{entity}]:\n{result[:5000]}")
-            except Exception:
-                continue
-        if baike_parts:
-            baike_supplement = "\n\n--- 百度百科验证补充 ---\n\n" + "\n\n".join(baike_parts)
-            print(f"  [Q{q_id}/BaikeVerify] 补充 {len(baike_parts)} 个实体的百科信息")
+def _baike_verify_entities(q_id: int, response) -> list:
+    entities = [tc["args"].get("entity", "") for tc in response.tool_calls[:MAX_BAIKE_VERIFY]]
+    entities = [e for e in entities if e]
+    print(f"  [Q{q_id}/BaikeVerify] 验证实体: {entities}")
+    return entities
 
-        # baike 触发时，需要第二次 LLM 调用整合百科信息到证据
-        print(f"  [Q{q_id}/Evidence] 提取证据（整合百科）...")
-        evidence_prompt = RESEARCH_EVIDENCE_PROMPT.format(
-            sub_question=query,
-            reflection=reflection[:6000],
-            baike_supplement=baike_supplement[:4000],
+
+def _evidence_request(q_id: int, query: str, reflection: str, baike_results: dict) -> tuple:
+    """百科验证结果整合进证据（第二次 LLM 调用）→ (llm, messages)"""
+    baike_supplement = ""
+    baike_parts = [(entity, result) for entity, result in baike_results.items()
+                   if "未找到" not in result and "查询异常" not in result]
+    if baike_parts:
+        texts = share_budget(
+            [r for _, r in baike_parts], budget_for("RESEARCH_EVIDENCE_PROMPT", "baike_supplement"),
         )
-        evidence_response = llm.invoke([HumanMessage(content=evidence_prompt)])
-        evidence_content = evidence_response.content.strip()
-    else:
-        print(f"  [Q{q_id}/Reflect] 反思完成，未触发百科验证")
-        # 无 baike → 直接从合并输出中解析证据（省掉一次 LLM 调用）
-        evidence_content = reflection
+        baike_supplement = "\n\n--- 百度百科验证补充 ---\n\n" + "\n\n".join(
+            f"百度百科验证 [{entity}]:\n{text}" for (entity, _), text in zip(baike_parts, texts)
+        )
+        print(f"  [Q{q_id}/BaikeVerify] 补充 {len(baike_parts)} 个实体的百科信息")
+
+    print(f"  [Q{q_id}/Evidence] 提取证据（整合百科）...")
+    evidence_prompt = RESEARCH_EVIDENCE_PROMPT.format(
+        sub_question=query,
+        reflection=truncate_to_tokens(reflection, budget_for("RESEARCH_EVIDENCE_PROMPT", "reflection")),
+        baike_supplement=baike_supplement,
+    )
+    llm = get_llm(temperature=0.1, node="research_evidence")
+    return llm, [SystemMessage(content=RESEARCH_EVIDENCE_SYSTEM), HumanMessage(content=evidence_prompt)]
 
+
+def _evidence_result(state: ResearchSubgraphState, q_id: int, evidence_content: str) -> dict:
     # 解析证据
     statement, reliability = _parse_evidence_from_content(evidence_content, q_id)
 
-    source_urls = _extract_urls((state.get("search_results", "") or "")[:5000])[:3]
+    source_urls = _source_urls(state.get("search_hits") or [], state.get("deep_pages") or [])
     new_evidence = Evidence(
         id=q_id * 10,
         source_question_id=q_id,
@@ -268,10 +344,226 @@ def _reflect_and_extract(state: ResearchSubgraphState) -> dict:
     }
 
 
-def compile_research_subgraph():
+def _reflect_evidence(state: ResearchSubgraphState):
+    """合并版反思+证据提取 — 减少一次 LLM 调用，返回用于解析证据的文本（反思 LLM 不可用时为 None）。
+
+    流程：
+    1. 用合并 prompt 调用 LLM（绑定 baike 工具）
+    2. 若 LLM 触发 baike → 执行百科查询 → 用 EVIDENCE_PROMPT 做第二次 LLM 调用整合
+    3. 若未触发 baike → 直接从合并输出中解析证据（省掉第二次 LLM 调用）
+    """
+    sq = state.get("current_branch_question", {})
+    q_id = int(sq.get("id", 0) or 0)
+    query = sq.get("question", "")
+    print(f"  [Q{q_id}/Reflect] 开始反思...")
+
+    llm_with_baike, messages = _reflect_request(state)
+    deadline = state.get("deadline_ts")
+    try:
+        response = invoke_llm(llm_with_baike, messages, node="research_reflect", deadline=deadline)
+    except LLMUnavailable as e:
+        print(f"  [Q{q_id}/Reflect] LLM 不可用（{e}），记为无有效信息")
+        return None
+    reflection = response.content.strip()
+
+    # 检查是否触发百科验证
+    if getattr(response, "tool_calls", None) and not _stopped(state):
+        baike_results = baike_search_many(_baike_verify_entities(q_id, response))
+        # baike 触发时，需要第二次 LLM 调用整合百科信息到证据
+        llm, messages = _evidence_request(q_id, query, reflection, baike_results)
+        try:
+            return invoke_llm(llm, messages, node="research_evidence", deadline=deadline).content.strip()
+        except LLMUnavailable as e:
+            # 整合失败时退回合并输出本身（不含百科补充）
+            print(f"  [Q{q_id}/Evidence] LLM 不可用（{e}），使用反思输出")
+            return reflection
+    print(f"  [Q{q_id}/Reflect] 反思完成，未触发百科验证")
+    # 无 baike → 直接从合并输出中解析证据（省掉一次 LLM 调用）
+    return reflection
+
+
+def _reflect_and_extract(state: ResearchSubgraphState) -> dict:
+    q_id = int(state.get("current_branch_question", {}).get("id", 0) or 0)
+    if _stopped(state):
+        print(f"  [Q{q_id}/Reflect] 分支已剪枝，跳过反思")
+        return {}
+    return _evidence_result(state, q_id, _reflect_evidence(state) or "")
+
+
+# ==================== 流水线模式：边搜边反思 ====================
+
+class _PipelineResults:
+    """流水线模式下按到达顺序累积的搜索批次与深读页面（不含 I/O，由同步 / 异步子类驱动）：
+    - 搜索批次到达即为其中的高价值 URL 发起深读（整个分支至多 max_reads 个）
+    - 以信息键（命中 URL / 百科正文 / 深读页面）记录上次反思看到的内容，判断新到结果是否值得细化"""
+
+    def __init__(self, query: str, deep_read: bool, max_reads: int = 2):
+        self.query = query
+        self.batches: List[SearchBatch] = []
+        self.pages: List[Tuple[str, str]] = []
+        self._reads_left = max_reads if deep_read else 0
+        self._picked = set()
+        self._reflected = set()
+
+    def add_batch(self, name: str, batch=None, error: Exception = None) -> List[str]:
+        """记录一组搜索结果，返回需要发起深读的 URL"""
+        if error is not None:
+            batch = SearchBatch(name, self.query, error=f"[搜索失败] {self.query}: {error}")
+        self.batches.append(batch)
+        urls = [url for url in _deep_read_urls([batch], self._reads_left) if url not in self._picked]
+        urls = urls[:self._reads_left]
+        self._picked.update(urls)
+        self._reads_left -= len(urls)
+        return urls
+
+    def add_page(self, url: str, content: str) -> None:
+        if _usable_page(content):
+            self.pages.append((url, content))
+
+    def has_content(self) -> bool:
+        return bool(self.pages) or any((b.hits or b.body) and not b.error for b in self.batches)
+
+    def _keys(self) -> set:
+        keys = {("hit", hit.url) for hit in iter_unique_hits(self.batches)}
+        keys.update(("body", b.label, b.query) for b in self.batches if b.body and not b.error)
+        keys.update(("page", url) for url, _ in self.pages)
+        return keys
+
+    def novelty(self) -> tuple:
+        """上次反思之后新增的 (命中 URL 数, 长文本数)"""
+        new = self._keys() - self._reflected
+        hits = sum(1 for k in new if k[0] == "hit")
+        return hits, len(new) - hits
+
+    def worth_refining(self) -> bool:
+        hits, long_texts = self.novelty()
+        return long_texts > 0 or hits >= STREAM_REFINE_MIN_NEW_HITS
+
+    def snapshot(self, state: ResearchSubgraphState) -> dict:
+        """以当前已到达的结果作为反思输入，并记为已反思"""
+        self._reflected = self._keys()
+        return {**state, "search_hits": list(self.batches), "deep_pages": list(self.pages)}
+
+
+class _ThreadedPipeline(_PipelineResults):
+    """同步驱动：搜索 / 深读提交到调度器的 search / fetch 类别，按完成顺序收取"""
+
+    def __init__(self, query: str, deep_read: bool, calls: list):
+        super().__init__(query, deep_read)
+        self._futs = {scheduler.submit("search", SEARCH_HITS_BY_TOOL[name], **args): ("search", name)
+                      for name, args in calls}
+
+    @property
+    def pending(self) -> int:
+        return len(self._futs)
+
+    def collect(self, timeout: float = None) -> None:
+        """等待至少一个结果到达（或超时），收取所有已完成的结果"""
+        if not self._futs:
+            return
+        done, _ = wait(list(self._futs), timeout=timeout, return_when=FIRST_COMPLETED)
+        for fut in done:
+            kind, key = self._futs.pop(fut)
+            if kind == "search":
+                try:
+                    urls = self.add_batch(key, fut.result())
+                except Exception as e:
+                    urls = self.add_batch(key, error=e)
+                for url in urls:
+                    self._futs[scheduler.submit("fetch", fetch_url_content, url, 15000)] = ("fetch", url)
+            else:
+                try:
+                    self.add_page(key, fut.result())
+                except Exception:
+                    continue
+
+    def close(self) -> None:
+        """放弃未到达的结果（尚在排队的任务直接出队）"""
+        for fut in self._futs:
+            fut.cancel()
+        self._futs.clear()
+
+
+def _stream_research(state: ResearchSubgraphState) -> dict:
+    """流水线版研究流程（RESEARCH_STREAMING）— 搜索、深读与反思重叠进行：
+
+    1. 首个有内容的搜索批次到达即反思，产出临时证据（其余引擎与深读继续进行）
+    2. 每次反思结束后收取新到结果：带来足够新信息（STREAM_REFINE_MIN_NEW_HITS 个新 URL，
+       或任何深读页面 / 百科正文）时基于全部结果重新反思（细化），至多 STREAM_MAX_REFINES 次
+    3. 剩余结果最多再等 STREAM_STRAGGLER_WAIT 秒，之后放弃，分支以最近一次证据结束
+    """
+    sq = state.get("current_branch_question", {})
+    q_id = int(sq.get("id", 0) or 0)
+    query = sq.get("question", "")
+    engine = (sq.get("search_engine") or "both").lower()
+    deadline = state.get("deadline_ts")
+    t0 = time.monotonic()
+
+    print(f"  [Q{q_id}/Search] 开始流水线搜索 (engine={engine})")
+    results = _ThreadedPipeline(query, engine != "baike", _select_search_calls(state) if query else [])
+    try:
+        while results.pending and not results.has_content() and not _stopped(state):
+            results.collect()
+        if _stopped(state):
+            print(f"  [Q{q_id}/Stream] 分支已剪枝，跳过反思")
+            return {}
+        print(f"  [Q{q_id}/Stream] 已到达 {len(results.batches)} 组结果，开始首轮反思"
+              f"（仍在进行: {results.pending}）")
+        snapshot = results.snapshot(state)
+        content = _reflect_evidence(snapshot) or ""
+        statement, reliability = _parse_evidence_from_content(content, q_id)
+        print(f"  [Q{q_id}/Stream] 临时证据 ({reliability}): {statement[:80]}")
+        trace.record("stream", "provisional", wait=round(time.monotonic() - t0, 3), pending=results.pending)
+
+        for _ in range(STREAM_MAX_REFINES):
+            straggler_deadline = time.monotonic() + STREAM_STRAGGLER_WAIT
+            while results.pending and not results.worth_refining() and not _stopped(state):
+                left = straggler_deadline - time.monotonic()
+                if left <= 0:
+                    break
+                results.collect(timeout=left)
+            if not results.worth_refining():
+                break
+            if _stopped(state):
+                print(f"  [Q{q_id}/Stream] 分支已剪枝，不再细化")
+                break
+            if remaining_time(deadline) < LLM_MIN_CALL_TIME:
+                print(f"  [Q{q_id}/Stream] 运行剩余时间不足，保留临时证据")
+                break
+            new_hits, new_texts = results.novelty()
+            print(f"  [Q{q_id}/Stream] 新结果到达（新 URL {new_hits} 个，新长文本 {new_texts} 篇），细化证据")
+            trace.record("stream", "refine", new_hits=new_hits, new_texts=new_texts)
+            next_snapshot = results.snapshot(state)
+            refined = _reflect_evidence(next_snapshot)
+            if refined is not None:         # 细化失败时保留上一版证据
+                snapshot, content = next_snapshot, refined
+        if results.pending:
+            print(f"  [Q{q_id}/Stream] 放弃 {results.pending} 个未到达 / 无新信息的结果")
+            trace.record("stream", "abandoned", count=results.pending)
+    finally:
+        results.close()
+
+    return _evidence_result(snapshot, q_id, content)
+
+
+def compile_research_subgraph(async_mode: bool = False, streaming: bool = RESEARCH_STREAMING):
+    """async_mode=True 时使用 graph/async_nodes.py 的异步节点（以 ainvoke 运行）；
+    streaming=True 时子图只有一个流水线节点（搜索 / 深读 / 反思重叠进行）"""
+    if async_mode:
+        from graph.async_nodes import (
+            areflect_and_extract as reflect_and_extract, asearch_parallel as search, astream_research as stream,
+        )
+    else:
+        search, reflect_and_extract, stream = _search_parallel, _reflect_and_extract, _stream_research
     workflow = StateGraph(ResearchSubgraphState)
-    workflow.add_node("search", _search_parallel)
-    workflow.add_node("reflect_and_extract", _reflect_and_extract)
+    if streaming:
+        workflow.add_node("stream_research", traced_node("research.stream", stream))
+        workflow.set_entry_point("stream_research")
+        workflow.add_edge("stream_research", END)
+        return workflow.compile()
+
+    workflow.add_node("search", traced_node("research.search", search))
+    workflow.add_node("reflect_and_extract", traced_node("research.reflect_and_extract", reflect_and_extract))
 
     workflow.set_entry_point("search")
     workflow.add_edge("search", "reflect_and_extract")
@@ -42,6 +42,7 @@ class AgentState(TypedDict):
     """主图状态 — 支持 Send API 并行分支"""
     # 输入
     original_question: str
+    deadline_ts: float               # 运行截止时间（time.time() 时间戳，0 为不限），所有 LLM 调用据此收紧超时
 
     # 拆分规划
     sub_questions: List[SubQuestion]
@@ -70,3 +71,4 @@ class AgentState(TypedDict):
     # 输出
     final_answer: str
     formatted_answer: str
+    normalized_answer: str           # 格式化 + 归一化后的最终输出（format_answer 一步完成）
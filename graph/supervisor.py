@@ -4,14 +4,17 @@
 流程：decompose_plan → parallel_research → global_verify → global_summary → format_answer
 
 核心改进（相对于 Send API 版本）：
-- 并行研究分支使用 ThreadPoolExecutor + as_completed 流式返回证据
-- 每收到一条新证据立即执行快速充分性检查（Quick Check）
-- 充分则立即终止剩余分支（动态剪枝 / 思维树剪枝）
-- 高优先级子问题优先调度
+- 并行研究分支在进程级调度器（utils/scheduler.py）的 branch 类别中运行，完成即流式返回证据
+- 新证据到达后在后台执行快速充分性检查（Quick Check），主线程继续收集其他分支；
+  短时间内连续到达的证据合并为一次检查，更新的证据到达时取消过期的检查
+- 任一检查判断充分则立即终止剩余分支（动态剪枝 / 思维树剪枝）
+- 高优先级子问题优先调度（分支内的搜索 / 深读继承该优先级）
 - 消除 Send API 的"等待全部完成"瓶颈
+- 异步模式（compile_async_graph）：节点使用 graph/async_nodes.py 的异步实现，
+  并行分支与 QuickCheck 是同一事件循环中的任务，适合一个进程服务大量并发问题
 
 路由逻辑：
-- decompose_plan → parallel_research（线程池并行 + 流式证据 + 动态剪枝）
+- decompose_plan → parallel_research（调度器并行 + 流式证据 + 动态剪枝）
 - parallel_research → global_verify
 - global_verify → 条件路由：
     - 推理链充分 → global_summary
@@ -19,63 +22,132 @@
     - 推理链不充分 → decompose_plan（奥卡姆剃刀：只为缺口生成新问题）
 - global_summary → format_answer → END
 """
+import asyncio
 import threading
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, wait
 
 from langgraph.graph import END, StateGraph
 
-from config.settings import MAX_LOOPS, MAX_PARALLEL_WORKERS, QUICK_CHECK_MIN_EVIDENCE
+from agents.llm import remaining_time
+from config.settings import (
+    LLM_MIN_CALL_TIME, MAX_LOOPS, MAX_PARALLEL_WORKERS,
+    QUICK_CHECK_MIN_EVIDENCE, QUICK_CHECK_COALESCE_WINDOW,
+)
 from graph.state import AgentState
 from graph.research_subgraph import compile_research_subgraph
+from utils import scheduler, startup, trace
+from utils.trace import traced_node
 from graph.nodes import (
     decompose_plan,
     entity_precheck,
     global_verify, global_summary, format_answer,
     quick_sufficiency_check,
 )
+from graph.async_nodes import (
+    adecompose_plan, aentity_precheck, aformat_answer, aglobal_summary, aglobal_verify,
+    aquick_sufficiency_check,
+)
+
+
+_COMPILED = {}
+_COMPILE_LOCK = threading.Lock()
+
+
+def _compiled(name: str, build):
+    """进程内每张图只编译一次（双检锁）；编译后的图无状态，可在多线程间并发 invoke"""
+    graph = _COMPILED.get(name)
+    if graph is None:
+        with _COMPILE_LOCK:
+            graph = _COMPILED.get(name)
+            if graph is None:
+                with startup.timed(f"compile {name}"):
+                    graph = _COMPILED[name] = build()
+    return graph
+
+
+def research_subgraph():
+    return _compiled("research_subgraph", compile_research_subgraph)
+
+
+def async_research_subgraph():
+    return _compiled("async_research_subgraph", lambda: compile_research_subgraph(async_mode=True))
+
+
+def _branch_ready(sq, deadline_ts) -> bool:
+    """运行剩余时间不足以发起 LLM 调用时跳过分支"""
+    if remaining_time(deadline_ts) < LLM_MIN_CALL_TIME:
+        print(f"\n[ResearchBranch] 运行剩余时间不足，跳过 Q{sq.get('id', '?')}")
+        return False
+    print(f"\n[ResearchBranch] 处理 Q{sq.get('id', '?')}: {sq.get('question', '')}")
+    return True
+
 
+def _branch_input(original_question, sq, evidence_snapshot, deadline_ts, stop_event=None) -> dict:
+    return {
+        "original_question": original_question,
+        "deadline_ts": deadline_ts,
+        "stop_event": stop_event,
+        "evidence_pool": evidence_snapshot,
+        "current_branch_question": sq,
+    }
 
-_RESEARCH_SUBGRAPH = compile_research_subgraph()
 
+def _branch_output(q_id, t0: float, out: dict) -> dict:
+    elapsed = time.time() - t0
+    print(f"[ResearchBranch] Q{q_id} 子图完成，耗时: {elapsed:.1f}s")
 
-def _run_single_branch(original_question, sq, evidence_snapshot, stop_event):
+    return {
+        "evidence": out.get("evidence_pool", []),
+        "question_id": q_id,
+    }
+
+
+def _run_single_branch(original_question, sq, evidence_snapshot, stop_event, deadline_ts=0.0):
     """在线程中执行单个研究分支（子图包装器）。
 
     Args:
         original_question: 原始问题
         sq: 子问题字典
         evidence_snapshot: 证据池快照（只读，不会被其他线程修改）
-        stop_event: 停止信号，set() 后跳过尚未开始的分支
+        stop_event: 停止信号，set() 后尚未开始的分支直接跳过，进行中的分支在子图的下一阶段前退出
+        deadline_ts: 运行截止时间，剩余不足以发起 LLM 调用时跳过分支
 
     Returns:
         dict with 'evidence' and 'question_id', or None if skipped/failed
     """
-    if stop_event.is_set():
+    if stop_event.is_set() or not _branch_ready(sq, deadline_ts):
         return None
 
     q_id = sq.get("id", "?")
-    query = sq.get("question", "")
-    print(f"\n[ResearchBranch] 处理 Q{q_id}: {query}")
-
     t0 = time.time()
     try:
-        out = _RESEARCH_SUBGRAPH.invoke({
-            "original_question": original_question,
-            "evidence_pool": evidence_snapshot,
-            "current_branch_question": sq,
-        })
+        with trace.context(q_id=q_id), trace.span("branch", f"Q{q_id}"):
+            out = research_subgraph().invoke(
+                _branch_input(original_question, sq, evidence_snapshot, deadline_ts, stop_event),
+            )
     except Exception as e:
         print(f"[ResearchBranch] Q{q_id} 异常: {e}")
         return None
+    return _branch_output(q_id, t0, out)
 
-    elapsed = time.time() - t0
-    print(f"[ResearchBranch] Q{q_id} 子图完成，耗时: {elapsed:.1f}s")
 
-    return {
-        "evidence": out.get("evidence_pool", []),
-        "question_id": q_id,
-    }
+async def _arun_single_branch(original_question, sq, evidence_snapshot, deadline_ts=0.0):
+    """_run_single_branch 的异步版本（事件循环中的一个任务；剪枝时直接取消）"""
+    if not _branch_ready(sq, deadline_ts):
+        return None
+
+    q_id = sq.get("id", "?")
+    t0 = time.time()
+    try:
+        with trace.context(q_id=q_id), trace.span("branch", f"Q{q_id}"):
+            out = await async_research_subgraph().ainvoke(
+                _branch_input(original_question, sq, evidence_snapshot, deadline_ts),
+            )
+    except Exception as e:
+        print(f"[ResearchBranch] Q{q_id} 异常: {e}")
+        return None
+    return _branch_output(q_id, t0, out)
 
 
 # ==================== 核心节点：并行研究 + 流式证据 + 动态剪枝 ====================
@@ -84,82 +156,124 @@ def parallel_research(state: AgentState) -> dict:
     """并行研究节点 — 线程池 + 流式证据 + 动态剪枝。
 
     替代 Send API 的"等待全部完成"模式：
-    - 所有子问题通过 ThreadPoolExecutor 并行执行
+    - 所有子问题提交到调度器 branch 类别并行执行（按子问题优先级出队），
+      单个问题同时进行的分支不超过 MAX_PARALLEL_WORKERS，分支完成后补位
     - 每个子问题完成后立即流式返回证据到主线程
-    - 触发快速充分性检查（QuickCheck），充分则剪枝剩余分支
+    - 快速充分性检查（QuickCheck）在后台线程执行，不阻塞收集：
+      合并窗口内到达的证据合并为一次检查，新证据到达时作废进行中的检查；
+      任一检查判断充分即剪枝剩余分支（进行中的分支不再等待）
     - 高优先级子问题优先调度
     """
-    completed_set = set(state.get("completed_question_ids", []))
-    all_sqs = list(state.get("sub_questions", []))
-    pending = [
-        sq for sq in all_sqs
-        if sq["status"] == "pending" and sq["id"] not in completed_set
-    ]
-
+    all_sqs, pending = _pending_branches(state)
     if not pending:
-        print(f"[ParallelResearch] 无 pending 子问题，直接通过")
         return {}
 
-    # 按优先级排序：高 > 中 > 低（影响线程池调度顺序）
-    priority_order = {"高": 0, "中": 1, "低": 2}
-    pending.sort(key=lambda sq: priority_order.get(sq.get("priority", "中"), 1))
-
-    print(f"\n[ParallelResearch] 启动 {len(pending)} 个并行研究分支（流式证据 + 动态剪枝）")
-    for sq in pending:
-        print(f"  → Q{sq['id']} [{sq['priority']}] {sq['question']}")
-
     original_question = state["original_question"]
     evidence_snapshot = list(state.get("evidence_pool", []))
+    deadline_ts = state.get("deadline_ts", 0.0)
 
     stop_event = threading.Event()
     new_evidence = []
     new_completed_ids = []
 
-    workers = min(len(pending), MAX_PARALLEL_WORKERS)
-    executor = ThreadPoolExecutor(max_workers=workers)
-
-    futures = {}
-    for sq in pending:
-        fut = executor.submit(
-            _run_single_branch, original_question, sq, evidence_snapshot, stop_event
+    def launch(sq):
+        return scheduler.submit(
+            "branch", _run_single_branch, original_question, sq, evidence_snapshot, stop_event, deadline_ts,
+            priority=sq.get("priority", "中"),
         )
-        futures[fut] = sq
 
-    pruned_count = 0
+    waiting = list(pending)
+    running = {launch(sq) for sq in waiting[:MAX_PARALLEL_WORKERS]}
+    del waiting[:MAX_PARALLEL_WORKERS]
+    check = None            # (future, cancel_event, 检查时的新增证据数)
+    dirty_since = None      # 有尚未被检查覆盖的新证据时，首条到达的时间
     try:
-        for fut in as_completed(futures):
-            result = fut.result() if fut.done() else None
-            if result is None:
-                continue
+        while running:
+            timeout = None
+            if dirty_since is not None and check is None:
+                timeout = max(0.0, dirty_since + QUICK_CHECK_COALESCE_WINDOW - time.monotonic())
+            done, _ = wait(running | ({check[0]} if check else set()), timeout=timeout,
+                           return_when=FIRST_COMPLETED)
+
+            for fut in done & running:
+                running.discard(fut)
+                if waiting:
+                    running.add(launch(waiting.pop(0)))
+                result = fut.result()
+                if result is None:
+                    continue
+                new_evidence.extend(result["evidence"])
+                new_completed_ids.append(result["question_id"])
+                # 进行中的检查没有看到这条证据 → 作废，合并到下一次检查
+                if check is not None:
+                    check[1].set()
+                    print(f"[QuickCheck] 新证据到达，取消过期检查（基于 {check[2]} 条新增证据）")
+                    trace.record("quick_check", "superseded", evidence=check[2])
+                    check = None
+                if dirty_since is None:
+                    dirty_since = time.monotonic()
+
+            if check is not None and check[0] in done:
+                is_sufficient, quick_answer = check[0].result()
+                check = None
+                if is_sufficient and running:
+                    print(f"[QuickCheck] ✂ 证据已充分！答案: {quick_answer}")
+                    print(f"[QuickCheck] 剪枝 {len(running) + len(waiting)} 个剩余分支")
+                    # 剪枝立即生效：不再等待进行中的分支（其结果丢弃），尚未开始的分支直接跳过
+                    stop_event.set()
+                    break
 
-            new_evidence.extend(result["evidence"])
-            new_completed_ids.append(result["question_id"])
+            # 合并窗口结束、仍有未完成分支时，在后台启动一次检查
+            total_evidence = evidence_snapshot + new_evidence
+            if (dirty_since is not None and check is None
+                    and time.monotonic() - dirty_since >= QUICK_CHECK_COALESCE_WINDOW):
+                dirty_since = None
+                if len(total_evidence) >= QUICK_CHECK_MIN_EVIDENCE and running:
+                    print(f"\n[QuickCheck] 已完成 {len(new_completed_ids)}/{len(pending)} 分支，"
+                          f"证据池: {len(total_evidence)} 条，剩余: {len(running) + len(waiting)}")
+                    cancel = threading.Event()
+                    fut = scheduler.submit(
+                        "llm", quick_sufficiency_check,
+                        original_question, list(total_evidence), deadline_ts, cancel, priority="高",
+                    )
+                    check = (fut, cancel, len(new_evidence))
+
+        # 所有分支已完成：剩余的检查不再影响本轮（global_verify 会做完整判断）
+        if check is not None:
+            check[1].set()
+    finally:
+        # 尚未开始的分支直接出队；进行中的分支在子图下一阶段（搜索 / 深读 / 反思 / 细化）前看到 stop_event 后退出
+        for fut in running:
+            fut.cancel()
 
-            # 如果已发出停止信号，收集已完成的结果但不再做检查
-            if stop_event.is_set():
-                continue
+    pruned_count = len(pending) - len(new_completed_ids) if stop_event.is_set() else 0
+    return _research_result(all_sqs, new_evidence, new_completed_ids, pruned_count)
 
-            # 快速充分性检查：证据数达到阈值且仍有未完成分支时触发
-            total_evidence = evidence_snapshot + new_evidence
-            remaining = len(pending) - len(new_completed_ids)
 
-            if (len(total_evidence) >= QUICK_CHECK_MIN_EVIDENCE
-                    and remaining > 0):
-                print(f"\n[QuickCheck] 已完成 {len(new_completed_ids)}/{len(pending)} 分支，"
-                      f"证据池: {len(total_evidence)} 条，剩余: {remaining}")
+def _pending_branches(state: AgentState) -> tuple:
+    """→ (全部子问题, 按优先级排序的待研究子问题)"""
+    completed_set = set(state.get("completed_question_ids", []))
+    all_sqs = list(state.get("sub_questions", []))
+    pending = [
+        sq for sq in all_sqs
+        if sq["status"] == "pending" and sq["id"] not in completed_set
+    ]
 
-                is_sufficient, quick_answer = quick_sufficiency_check(
-                    original_question, total_evidence
-                )
+    if not pending:
+        print(f"[ParallelResearch] 无 pending 子问题，直接通过")
+        return all_sqs, pending
+
+    # 按优先级排序：高 > 中 > 低（决定启动 / 补位顺序；调度器内同样按优先级出队）
+    priority_order = {"高": 0, "中": 1, "低": 2}
+    pending.sort(key=lambda sq: priority_order.get(sq.get("priority", "中"), 1))
+
+    print(f"\n[ParallelResearch] 启动 {len(pending)} 个并行研究分支（流式证据 + 动态剪枝）")
+    for sq in pending:
+        print(f"  → Q{sq['id']} [{sq['priority']}] {sq['question']}")
+    return all_sqs, pending
 
-                if is_sufficient:
-                    print(f"[QuickCheck] ✂ 证据已充分！答案: {quick_answer}")
-                    print(f"[QuickCheck] 剪枝 {remaining} 个剩余分支")
-                    pruned_count = remaining
-                    stop_event.set()
-    finally:
-        executor.shutdown(wait=False, cancel_futures=True)
 
+def _research_result(all_sqs: list, new_evidence: list, new_completed_ids: list, pruned_count: int) -> dict:
     # 更新子问题状态
     completed_id_set = set(new_completed_ids)
     for sq in all_sqs:
@@ -183,6 +297,89 @@ def parallel_research(state: AgentState) -> dict:
     }
 
 
+async def aparallel_research(state: AgentState) -> dict:
+    """parallel_research 的异步版本 — 分支与 QuickCheck 都是同一事件循环中的任务。
+
+    合并窗口、补位、剪枝规则与同步版本相同；检查作废与剪枝直接取消任务，
+    进行中的 LLM 流与搜索请求随之关闭，不需要停止信号。
+    """
+    all_sqs, pending = _pending_branches(state)
+    if not pending:
+        return {}
+
+    original_question = state["original_question"]
+    evidence_snapshot = list(state.get("evidence_pool", []))
+    deadline_ts = state.get("deadline_ts", 0.0)
+
+    new_evidence = []
+    new_completed_ids = []
+
+    def launch(sq):
+        return asyncio.ensure_future(_arun_single_branch(original_question, sq, evidence_snapshot, deadline_ts))
+
+    waiting = list(pending)
+    running = {launch(sq) for sq in waiting[:MAX_PARALLEL_WORKERS]}
+    del waiting[:MAX_PARALLEL_WORKERS]
+    check = None            # (task, 检查时的新增证据数)
+    dirty_since = None
+    pruned = False
+    try:
+        while running:
+            timeout = None
+            if dirty_since is not None and check is None:
+                timeout = max(0.0, dirty_since + QUICK_CHECK_COALESCE_WINDOW - time.monotonic())
+            done, _ = await asyncio.wait(running | ({check[0]} if check else set()), timeout=timeout,
+                                         return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done & running:
+                running.discard(task)
+                if waiting:
+                    running.add(launch(waiting.pop(0)))
+                result = task.result()
+                if result is None:
+                    continue
+                new_evidence.extend(result["evidence"])
+                new_completed_ids.append(result["question_id"])
+                if check is not None:
+                    check[0].cancel()
+                    print(f"[QuickCheck] 新证据到达，取消过期检查（基于 {check[1]} 条新增证据）")
+                    trace.record("quick_check", "superseded", evidence=check[1])
+                    check = None
+                if dirty_since is None:
+                    dirty_since = time.monotonic()
+
+            if check is not None and check[0] in done:
+                is_sufficient, quick_answer = check[0].result()
+                check = None
+                if is_sufficient and running:
+                    print(f"[QuickCheck] ✂ 证据已充分！答案: {quick_answer}")
+                    print(f"[QuickCheck] 剪枝 {len(running) + len(waiting)} 个剩余分支")
+                    pruned = True
+                    break
+
+            total_evidence = evidence_snapshot + new_evidence
+            if (dirty_since is not None and check is None
+                    and time.monotonic() - dirty_since >= QUICK_CHECK_COALESCE_WINDOW):
+                dirty_since = None
+                if len(total_evidence) >= QUICK_CHECK_MIN_EVIDENCE and running:
+                    print(f"\n[QuickCheck] 已完成 {len(new_completed_ids)}/{len(pending)} 分支，"
+                          f"证据池: {len(total_evidence)} 条，剩余: {len(running) + len(waiting)}")
+                    task = asyncio.ensure_future(
+                        aquick_sufficiency_check(original_question, list(total_evidence), deadline_ts),
+                    )
+                    check = (task, len(new_evidence))
+    finally:
+        # 剪枝 / 异常：取消进行中的分支与检查，等待取消完成（连接随之释放）
+        leftover = running | ({check[0]} if check else set())
+        for task in leftover:
+            task.cancel()
+        if leftover:
+            await asyncio.gather(*leftover, return_exceptions=True)
+
+    pruned_count = len(pending) - len(new_completed_ids) if pruned else 0
+    return _research_result(all_sqs, new_evidence, new_completed_ids, pruned_count)
+
+
 # ==================== 路由函数 ====================
 
 def route_after_precheck(state: AgentState) -> str:
@@ -208,16 +405,29 @@ def route_after_verify(state: AgentState) -> str:
 
 # ==================== 构建主图 ====================
 
-def build_graph() -> StateGraph:
-    """构建流式证据 + 动态剪枝架构主图"""
+def build_graph(async_mode: bool = False) -> StateGraph:
+    """构建流式证据 + 动态剪枝架构主图；async_mode=True 时各节点使用异步实现（以 ainvoke 运行）"""
+    if async_mode:
+        nodes = {
+            "decompose_plan": adecompose_plan,
+            "entity_precheck": aentity_precheck,
+            "parallel_research": aparallel_research,
+            "global_verify": aglobal_verify,
+            "global_summary": aglobal_summary,
+            "format_answer": aformat_answer,
+        }
+    else:
+        nodes = {
+            "decompose_plan": decompose_plan,
+            "entity_precheck": entity_precheck,
+            "parallel_research": parallel_research,
+            "global_verify": global_verify,
+            "global_summary": global_summary,
+            "format_answer": format_answer,
+        }
     workflow = StateGraph(AgentState)
-
-    workflow.add_node("decompose_plan", decompose_plan)
-    workflow.add_node("entity_precheck", entity_precheck)
-    workflow.add_node("parallel_research", parallel_research)
-    workflow.add_node("global_verify", global_verify)
-    workflow.add_node("global_summary", global_summary)
-    workflow.add_node("format_answer", format_answer)
+    for name, fn in nodes.items():
+        workflow.add_node(name, traced_node(name, fn))
 
     workflow.set_entry_point("decompose_plan")
 
@@ -253,6 +463,10 @@ def build_graph() -> StateGraph:
 
 
 def compile_graph():
-    """编译并返回可执行的图"""
-    graph = build_graph()
-    return graph.compile()
+    """返回编译好的主图（进程内缓存，首次调用时编译）"""
+    return _compiled("main_graph", lambda: build_graph().compile())
+
+
+def compile_async_graph():
+    """返回编译好的异步主图（以 ainvoke 运行；进程内缓存，首次调用时编译）"""
+    return _compiled("async_main_graph", lambda: build_graph(async_mode=True).compile())
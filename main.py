@@ -35,15 +35,18 @@ class TeeWriter:
         self._log.close()
 
 
-from config.settings import RECURSION_LIMIT
+# 图与 LLM 客户端（langgraph / langchain / openai）在首次运行时才导入，导入与编译耗时计入启动报告
+from config.settings import RECURSION_LIMIT, RUN_DEADLINE
 from graph.state import AgentState
-from graph.supervisor import compile_graph
-from utils.answer_formatter import normalize_answer
+from utils.startup import lazy_import, startup_report
+from utils.trace import run_trace
+
+_STARTUP_REPORTED = False
 
 
 def run_question(question: str) -> str:
     """
-    运行完整的多智能体推理流程。
+    运行完整的多智能体推理流程（结构化 trace 写入 TRACE_DIR）。
     
     Args:
         question: 需要回答的问题
@@ -51,17 +54,67 @@ def run_question(question: str) -> str:
     Returns:
         最终格式化后的答案
     """
+    return solve_question(question)["normalized_answer"]
+
+
+def solve_question(question: str) -> dict:
+    """运行完整流程并返回结构化结果（批处理用）：
+    answer / normalized_answer / latency / loop_count / evidence_count / is_sufficient / trace"""
+    with run_trace(question) as tr:
+        result = _run_question(question)
+        tr.answer = result["normalized_answer"]
+    return _with_trace(result, tr)
+
+
+async def arun_question(question: str) -> str:
+    """run_question 的异步版本（异步图：节点与并行分支均为事件循环中的任务），供异步服务直接 await"""
+    return (await asolve_question(question))["normalized_answer"]
+
+
+async def asolve_question(question: str) -> dict:
+    """solve_question 的异步版本；同一事件循环中可并发运行多个问题"""
+    with run_trace(question) as tr:
+        start_time = time.time()
+        graph = lazy_import("graph.supervisor").compile_async_graph()
+        final_state = await graph.ainvoke(
+            _initial_state(question, start_time),
+            {"recursion_limit": RECURSION_LIMIT},
+        )
+        result = _report(question, final_state, time.time() - start_time)
+        tr.answer = result["normalized_answer"]
+    return _with_trace(result, tr)
+
+
+def _with_trace(result: dict, tr) -> dict:
+    result["trace"] = tr.path
+    if tr.path:
+        print(f"Trace 已保存到: {tr.path}")
+    return result
+
+
+def _run_question(question: str) -> dict:
+    start_time = time.time()
+
+    # 编译并运行图（进程内只编译一次）
+    graph = lazy_import("graph.supervisor").compile_graph()
+
+    final_state = graph.invoke(
+        _initial_state(question, start_time),
+        {"recursion_limit": RECURSION_LIMIT},
+    )
+    return _report(question, final_state, time.time() - start_time)
+
+
+def _initial_state(question: str, start_time: float) -> AgentState:
     print("\n" + "=" * 70)
     print("多智能体推理系统（证据池架构）启动")
     print("=" * 70)
     print(f"问题: {question}")
     print("=" * 70)
 
-    start_time = time.time()
-
-    # 初始化状态
-    initial_state: AgentState = {
+    return {
         "original_question": question,
+        "deadline_ts": start_time + RUN_DEADLINE if RUN_DEADLINE > 0 else 0.0,
         "sub_questions": [],
         "anchor_analysis": "",
         "evidence_pool": [],
@@ -76,23 +129,17 @@ def run_question(question: str) -> str:
         "precheck_feedback": "",
         "final_answer": "",
         "formatted_answer": "",
+        "normalized_answer": "",
     }
 
-    # 编译并运行图
-    graph = compile_graph()
-
-    final_state = graph.invoke(
-        initial_state,
-        {"recursion_limit": RECURSION_LIMIT},
-    )
-
-    elapsed = time.time() - start_time
 
+def _report(question: str, final_state: dict, elapsed: float) -> dict:
+    """打印运行结果与统计，返回结构化结果"""
     # 获取格式化答案
     raw_answer = final_state.get("formatted_answer", "") or final_state.get("final_answer", "")
 
-    # LLM 归一化
-    normalized = normalize_answer(raw_answer, question)
+    # format_answer 已完成归一化（规则快速路径或融合 LLM 调用）
+    normalized = final_state.get("normalized_answer", "")
 
     # 打印结果
     print("\n" + "=" * 70)
@@ -106,6 +153,30 @@ def run_question(question: str) -> str:
     print(f"证据池大小: {len(final_state.get('evidence_pool', []))}")
     print(f"推理链充分: {'是' if final_state.get('is_sufficient', False) else '否'}")
 
+    # 各节点 prompt token 与服务端前缀缓存命中
+    llm = lazy_import("agents.llm")
+    usage = llm.llm_usage_stats()
+    if usage:
+        print("\nPrompt 前缀缓存（按节点）:")
+        for node, u in sorted(usage.items()):
+            print(f"  {node}: 调用 {u.get('calls', 0)} 次 | prompt {u.get('prompt_tokens', 0)} tokens，"
+                  f"缓存命中 {u.get('cached_tokens', 0)} ({u['cache_ratio']:.0%})"
+                  + (f" | 提前停止 {u['early_stop']} 次（无用量）" if u.get("early_stop") else ""))
+
+    breaker = llm.LLM_BREAKER.stats()
+    if breaker["opened"]:
+        print(f"\nLLM 熔断: 打开 {breaker['opened']} 次，快速失败 {breaker['rejected']} 次")
+
+    # 调度器各类别的线程数与排队情况（进程累计）
+    sched = lazy_import("utils.scheduler").stats()
+    if any(s["submitted"] for s in sched.values()):
+        print("\n调度器（进程累计）:")
+        for name, s in sched.items():
+            if s["submitted"] or s["inline"]:
+                print(f"  {name}: 线程 {s['workers']}/{s['max_workers']} | 任务 {s['submitted']} | "
+                      f"最大排队 {s['max_queued']} | 最长等待 {s['max_wait_s']:.2f}s"
+                      + (f" | 就地执行 {s['inline']}" if s["inline"] else ""))
+
     # 打印证据池
     evidence_pool = final_state.get("evidence_pool", [])
     if evidence_pool:
@@ -113,6 +184,12 @@ def run_question(question: str) -> str:
         for e in evidence_pool:
             print(f"  [E{e['id']}] ({e['reliability']}) {e['statement'][:80]}")
 
+    # 冷启动耗时（每个进程只打印一次）
+    global _STARTUP_REPORTED
+    if not _STARTUP_REPORTED:
+        _STARTUP_REPORTED = True
+        print("\n" + startup_report())
+
     # 打印子问题摘要
     sub_questions = final_state.get("sub_questions", [])
     if sub_questions:
@@ -123,7 +200,14 @@ def run_question(question: str) -> str:
 
     print("=" * 70)
 
-    return normalized
+    return {
+        "answer": raw_answer,
+        "normalized_answer": normalized,
+        "latency": round(elapsed, 2),
+        "loop_count": final_state.get("loop_count", 0),
+        "evidence_count": len(evidence_pool),
+        "is_sufficient": final_state.get("is_sufficient", False),
+    }
 
 
 def main():
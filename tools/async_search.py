@@ -0,0 +1,375 @@
+# -*- coding: utf-8 -*-
+"""
+异步搜索后端 — httpx.AsyncClient + asyncio.gather 扇出
+与 tools/search.py 的同步版本一一对应，共用请求构造、响应解析、缓存与格式化逻辑：
+- _acall_bocha / _acall_serper / _acall_baike_list / _acall_baike_content
+- afetch_url_content / aauto_search
+- 异步 LangChain 工具 abocha_search / aserper_search / abaike_search（工具名与同步版相同）
+- 结构化版本 abocha_hits / aserper_hits / abaike_hits（ASEARCH_HITS_BY_TOOL）与 abaike_search_many，供异步图路径使用
+
+并发控制：每个事件循环一个 AsyncClient（共享连接池），每个 provider 一个 Semaphore
+限制同时在途请求数，单个事件循环即可驱动数百个在途请求而无需对应数量的线程。
+跨线程/跨循环的速率与 429 退避由 tools/ratelimit.py 的进程级限流器统一控制（与同步路径共享）。
+"""
+import asyncio
+import time
+import weakref
+from urllib.parse import urlsplit
+
+import httpx
+from langchain_core.tools import tool
+
+from config.settings import (
+    BOCHA_DEFAULT_COUNT, SERPER_DEFAULT_NUM,
+    SEARCH_CACHE_NEGATIVE_TTL, BAIKE_NEGATIVE_TTL,
+    HTTP_POOL_MAXSIZE, HTTP_MAX_RETRIES, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT,
+    ASYNC_MAX_CONNECTIONS, ASYNC_PROVIDER_CONCURRENCY,
+    AUTO_SEARCH_HEDGE_MODE, FETCH_CHUNK_BYTES, GOVERNOR_MAX_THROTTLE_RETRIES,
+)
+from tools.search import (
+    _SEARCH_CACHE, _SEARCH_CACHE_ACTIVE, _cache_key, _store_result, _entity_key, normalize_entity,
+    _bocha_request, _parse_bocha,
+    _serper_request, _parse_serper,
+    _baike_list_request, _parse_baike_list,
+    _baike_content_request, _parse_baike_content,
+    _format_results, _render_baike, _to_batch,
+    _FETCH_HEADERS, _StreamingPage, _reject_reason, _render_url_content,
+    _auto_search_plan, _hedge_delay, _merge_formatted,
+    bocha_search, serper_search, baike_search,
+)
+from tools.hits import SearchBatch, SearchHit
+from tools.latency import SEARCH_LATENCY
+from tools.http_pool import provider_for_url
+from tools.ratelimit import get_governor, parse_retry_after
+from tools.replay import wrap_async_transport
+from utils import trace
+
+
+# ==================== 事件循环级资源 ====================
+
+# 事件循环 → AsyncClient / {provider: Semaphore}；循环被回收时自动释放
+_CLIENTS = weakref.WeakKeyDictionary()
+_SEMAPHORES = weakref.WeakKeyDictionary()
+
+
+def _get_client() -> httpx.AsyncClient:
+    """返回当前事件循环的共享 AsyncClient"""
+    loop = asyncio.get_running_loop()
+    client = _CLIENTS.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=ASYNC_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_POOL_MAXSIZE,
+            ),
+            timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            transport=wrap_async_transport(httpx.AsyncHTTPTransport(retries=HTTP_MAX_RETRIES)),
+            follow_redirects=True,
+        )
+        _CLIENTS[loop] = client
+    return client
+
+
+def _semaphore(provider: str) -> asyncio.Semaphore:
+    """返回当前事件循环中 provider 的并发信号量"""
+    loop = asyncio.get_running_loop()
+    sems = _SEMAPHORES.setdefault(loop, {})
+    sem = sems.get(provider)
+    if sem is None:
+        sem = sems[provider] = asyncio.Semaphore(ASYNC_PROVIDER_CONCURRENCY.get(provider, 8))
+    return sem
+
+
+async def aclose_client() -> None:
+    """关闭当前事件循环的 AsyncClient（服务退出时调用）"""
+    client = _CLIENTS.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def _arequest(provider: str, method: str, url: str, timeout: float = None, **kwargs) -> httpx.Response:
+    """与 http_pool.request(provider=...) 相同的限流语义：429 反馈限流器并按 Retry-After 重试"""
+    governor = get_governor(provider)
+    with trace.span("http", provider, method=method, url=url) as ev:
+        async with _semaphore(provider):
+            for attempt in range(GOVERNOR_MAX_THROTTLE_RETRIES + 1):
+                async with governor.aslot() as slot:
+                    resp = await _get_client().request(
+                        method, url,
+                        timeout=httpx.Timeout(timeout or HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+                        **kwargs,
+                    )
+                    if resp.status_code != 429:
+                        break
+                    slot.throttle(parse_retry_after(resp.headers.get("Retry-After")))
+                print(f"[RateLimit] {provider} 返回 429（第 {attempt + 1} 次），等待后重试")
+        ev.update(status=resp.status_code, retries=attempt, bytes=len(resp.content))
+        resp.raise_for_status()
+    return resp
+
+
+async def _acached_search(engine: str, key: str, afetch, field: str = "results",
+                         negative_ttl: int = SEARCH_CACHE_NEGATIVE_TTL) -> dict:
+    """_cached_search 的异步版本（SQLite 读写在线程中执行，不阻塞事件循环中的其他任务）"""
+    if not _SEARCH_CACHE_ACTIVE:
+        return await afetch()
+
+    cached = await asyncio.to_thread(_SEARCH_CACHE.get, engine, key)
+    trace.record("search_cache", engine, hit=cached is not None)
+    if cached is not None:
+        return cached
+
+    raw = await afetch()
+    await asyncio.to_thread(_store_result, engine, key, raw, field, negative_ttl)
+    return raw
+
+
+# ==================== 底层 API 调用（异步） ====================
+
+async def _arequest_bocha(query: str, count: int) -> dict:
+    url, headers, payload = _bocha_request(query, count)
+    t0 = time.perf_counter()
+    try:
+        resp = await _arequest("bocha", "POST", url, json=payload, headers=headers, timeout=30)
+    finally:
+        SEARCH_LATENCY.record("bocha", time.perf_counter() - t0)
+    return _parse_bocha(resp.json())
+
+
+async def _arequest_serper(query: str, num: int, gl: str, hl: str) -> dict:
+    url, headers, payload = _serper_request(query, num, gl, hl)
+    t0 = time.perf_counter()
+    try:
+        resp = await _arequest("serper", "POST", url, json=payload, headers=headers, timeout=30)
+    finally:
+        SEARCH_LATENCY.record("serper", time.perf_counter() - t0)
+    return _parse_serper(resp.json())
+
+
+async def _acall_bocha(query: str, count: int = BOCHA_DEFAULT_COUNT) -> dict:
+    """博查搜索（异步，带缓存）"""
+    return await _acached_search(
+        "bocha", _cache_key(query, count, "zh"),
+        lambda: _arequest_bocha(query, count),
+    )
+
+
+async def _acall_serper(query: str, num: int = SERPER_DEFAULT_NUM, gl: str = "us", hl: str = "en") -> dict:
+    """Serper (Google) 搜索（异步，带缓存）"""
+    return await _acached_search(
+        "serper", _cache_key(query, num, f"{gl}-{hl}"),
+        lambda: _arequest_serper(query, num, gl, hl),
+    )
+
+
+async def _acall_baike_list(lemma_title: str, top_k: int = 5) -> dict:
+    """百度百科词条列表查询（异步，按实体缓存）"""
+    return await _acached_search(
+        "baike_list", f"{_entity_key(lemma_title)}|{top_k}",
+        lambda: _arequest_baike_list(lemma_title, top_k),
+        negative_ttl=BAIKE_NEGATIVE_TTL,
+    )
+
+
+async def _arequest_baike_list(lemma_title: str, top_k: int) -> dict:
+    url, headers, params = _baike_list_request(lemma_title, top_k)
+    resp = await _arequest("baike", "GET", url, params=params, headers=headers, timeout=15)
+    return _parse_baike_list(resp.json())
+
+
+async def _acall_baike_content(search_key: str) -> dict:
+    """百度百科词条内容查询（异步，按实体缓存）"""
+    return await _acached_search(
+        "baike_content", _entity_key(search_key),
+        lambda: _arequest_baike_content(search_key),
+        field="content", negative_ttl=BAIKE_NEGATIVE_TTL,
+    )
+
+
+async def _arequest_baike_content(search_key: str) -> dict:
+    url, headers, params = _baike_content_request(search_key)
+    resp = await _arequest("baike", "GET", url, params=params, headers=headers, timeout=15)
+    return _parse_baike_content(resp.json())
+
+
+# ==================== 结构化搜索（异步） ====================
+
+async def abocha_hits(query: str) -> SearchBatch:
+    try:
+        return _to_batch(await _acall_bocha(query), query, "博查")
+    except Exception as e:
+        return SearchBatch("博查", query, error=f"[博查搜索异常] {query}: {e}")
+
+
+async def aserper_hits(query: str) -> SearchBatch:
+    try:
+        return _to_batch(await _acall_serper(query), query, "Google")
+    except Exception as e:
+        return SearchBatch("Google", query, error=f"[Google搜索异常] {query}: {e}")
+
+
+async def abaike_hits(entity: str) -> SearchBatch:
+    try:
+        entity = normalize_entity(entity) or entity
+        # 义项列表与词条内容互不依赖，并发请求
+        list_raw, content_raw = await asyncio.gather(
+            _acall_baike_list(entity, top_k=3),
+            _acall_baike_content(entity),
+        )
+    except Exception as e:
+        return SearchBatch("百度百科", entity, error=f"[百度百科查询异常] {entity}: {e}")
+    hits = [
+        SearchHit(url=item["url"], title=item["title"], snippet=item["desc"],
+                  site="百度百科", date="", engine="baike", rank=i)
+        for i, item in enumerate(list_raw["results"], 1)
+    ]
+    return SearchBatch("百度百科", entity, hits, body=_render_baike(entity, list_raw, content_raw))
+
+
+# 工具名 → 异步结构化搜索函数（与 SEARCH_HITS_BY_TOOL 对应）
+ASEARCH_HITS_BY_TOOL = {
+    "bocha_search": abocha_hits,
+    "serper_search": aserper_hits,
+    "baike_search": abaike_hits,
+}
+
+
+async def abaike_search_many(entities: list) -> dict:
+    """baike_search_many 的异步版本：按归一化名去重后并发查询，返回 {实体: 百科文本}"""
+    groups = {}
+    for entity in entities:
+        groups.setdefault(_entity_key(entity), []).append(entity)
+    outs = await asyncio.gather(*(abaike_hits(names[0]) for names in groups.values()))
+    return {name: out.render() for names, out in zip(groups.values(), outs) for name in names}
+
+
+# ==================== 异步 LangChain Tools ====================
+
+@tool("bocha_search", description=bocha_search.description)
+async def abocha_search(query: str) -> str:
+    return (await abocha_hits(query)).render()
+
+
+@tool("serper_search", description=serper_search.description)
+async def aserper_search(query: str) -> str:
+    return (await aserper_hits(query)).render()
+
+
+@tool("baike_search", description=baike_search.description)
+async def abaike_search(entity: str) -> str:
+    return (await abaike_hits(entity)).render()
+
+
+ALL_ASYNC_SEARCH_TOOLS = [abocha_search, aserper_search, abaike_search]
+
+
+# ==================== URL 内容读取（异步） ====================
+
+async def afetch_url_content(url: str, max_chars: int = 15000) -> str:
+    """fetch_url_content 的异步版本（同样流式读取 + 提前停止）"""
+    with trace.span("fetch", urlsplit(url).hostname or "", url=url) as ev:
+        try:
+            async with _semaphore("fetch"), get_governor(provider_for_url(url)).aslot() as slot:
+                async with _get_client().stream(
+                    "GET", url, headers=_FETCH_HEADERS,
+                    timeout=httpx.Timeout(15, connect=HTTP_CONNECT_TIMEOUT),
+                ) as resp:
+                    ev["status"] = resp.status_code
+                    if resp.status_code == 429:
+                        slot.throttle(parse_retry_after(resp.headers.get("Retry-After")))
+                        ev["error"] = "HTTP 429 限流"
+                        return f"[URL读取失败] {url}: HTTP 429 限流"
+                    reason = _reject_reason(resp.headers)
+                    if reason:
+                        ev["error"] = reason
+                        return f"[URL读取失败] {url}: {reason}"
+                    page = _StreamingPage(resp.headers.get("Content-Type", ""), max_chars)
+                    async for chunk in resp.aiter_bytes(FETCH_CHUNK_BYTES):
+                        if page.feed(chunk):
+                            break
+            ev["bytes"] = page.bytes_read
+            return _render_url_content(url, page.text(), max_chars)
+        except Exception as e:
+            ev["error"] = str(e)[:300]
+            return f"[URL读取失败] {url}: {e}"
+
+
+# ==================== 自动搜索 + 扇出 ====================
+
+_AENGINE_CALLS = {
+    "bocha": lambda query, **kw: _acall_bocha(query, **kw),
+    "serper": lambda query, **kw: _acall_serper(query, **kw),
+}
+
+
+async def aauto_search(query: str) -> str:
+    """auto_search 的异步版本（对冲语义相同，落败的请求任务会被真正取消）"""
+    if AUTO_SEARCH_HEDGE_MODE == "off":
+        return await _aauto_search_sequential(query)
+
+    plan = _auto_search_plan(query)
+    merge = AUTO_SEARCH_HEDGE_MODE == "merge"
+
+    async def run(engine, label, kw):
+        try:
+            raw = await _AENGINE_CALLS[engine](query, **kw)
+            return raw, _format_results(raw, query, label)
+        except Exception as e:
+            return None, f"[搜索全部失败] {query}: {e}"
+
+    def usable(out):
+        raw = out[0]
+        return raw is not None and raw["success"] and bool(raw["results"])
+
+    tasks = [asyncio.ensure_future(run(*plan[0]))]
+    done, _ = await asyncio.wait(tasks, timeout=_hedge_delay(plan[0][0]))
+    if done and usable(tasks[0].result()) and not merge:
+        return tasks[0].result()[1]
+    tasks.append(asyncio.ensure_future(run(*plan[1])))
+
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                if not merge and usable(t.result()):
+                    return t.result()[1]
+    finally:
+        for t in pending:
+            t.cancel()
+
+    ordered = [t.result() for t in tasks]
+    if merge:
+        return _merge_formatted(ordered, query)
+    return ordered[-1][1]
+
+
+async def _aauto_search_sequential(query: str) -> str:
+    """_auto_search_sequential 的异步版本"""
+    (primary, primary_label, primary_kw), (fallback, fallback_label, fallback_kw) = _auto_search_plan(query)
+    try:
+        raw = await _AENGINE_CALLS[primary](query, **primary_kw)
+        if raw["success"] and raw["results"]:
+            return _format_results(raw, query, primary_label)
+    except Exception:
+        pass
+    try:
+        raw = await _AENGINE_CALLS[fallback](query, **fallback_kw)
+        return _format_results(raw, query, fallback_label)
+    except Exception as e:
+        return f"[搜索全部失败] {query}: {e}"
+
+
+async def arun_tool_calls(calls: list) -> list:
+    """并发执行一组异步工具调用 [(tool, args), ...]，按输入顺序返回文本结果。
+    单个调用异常不影响其他调用，异常转为错误文本。"""
+    outs = await asyncio.gather(
+        *(t.ainvoke(args) for t, args in calls), return_exceptions=True,
+    )
+    results = []
+    for (t, args), out in zip(calls, outs):
+        if isinstance(out, BaseException):
+            results.append(f"[搜索失败] {t.name}({args}): {out}")
+        else:
+            results.append(out)
+    return results
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+HTML 正文提取基准 — tools/html_extract 单遍标记正则提取器 vs 原正则管线（_ARTICLE_BODY_PATTERNS + _strip_html）
+
+用法（项目根目录下）：
+    python tools/bench_html_extract.py                      # 对 bench_pages/*.html 计时
+    python tools/bench_html_extract.py --pages DIR          # 指定保存页面的目录
+    python tools/bench_html_extract.py --save URL [URL ...] # 先下载页面保存到目录，再计时
+"""
+import argparse
+import glob
+import html
+import os
+import re
+import sys
+import time
+
+_PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _PROJECT_DIR)
+
+from tools.html_extract import extract_text
+
+DEFAULT_PAGES_DIR = os.path.join(_PROJECT_DIR, "bench_pages")
+
+
+# ==================== 原正则管线（基线，摘自 tools/search.py 旧版） ====================
+
+# 百科类网站的正文容器模式（正则），按优先级排列
+_ARTICLE_BODY_PATTERNS = [
+    # 搜狗百科
+    r'<div[^>]*class="[^"]*lemma[_-]?content[^"]*"[^>]*>(.*?)</div>\s*(?=<div[^>]*class="[^"]*(?:sidebar|related|footer))',
+    # 百度百科
+    r'<div[^>]*class="[^"]*main-content[^"]*"[^>]*>(.*)',
+    r'<div[^>]*class="[^"]*lemmaWgt-lemmaSummary[^"]*"[^>]*>(.*)',
+    # 维基百科
+    r'<div[^>]*class="[^"]*mw-parser-output[^"]*"[^>]*>(.*)',
+    # 通用：<article> 标签
+    r'<article[^>]*>(.*?)</article>',
+    # 通用：id/class 含 content/article/main 的大 div
+    r'<div[^>]*(?:id|class)="[^"]*(?:article|content|main-body|entry)[^"]*"[^>]*>(.*)',
+]
+
+
+def _strip_html(raw_html: str) -> str:
+    """从 HTML 中提取纯文本 — 增强版，移除更多噪声元素"""
+    # 第1步：移除不可见内容标签（含内容一起删除）
+    noise_tags = r'script|style|noscript|nav|header|footer|aside|svg|template|iframe|form'
+    text = re.sub(
+        rf'<({noise_tags})[^>]*>.*?</\1>',
+        '', raw_html, flags=re.DOTALL | re.IGNORECASE,
+    )
+    # 第2步：移除常见噪声 div（class/id 含 sidebar, recommend, comment, ad, breadcrumb 等）
+    noise_div_pat = r'(?:sidebar|recommend|comment|ad-|advert|breadcrumb|related-|share-|copyright|disclaimer)'
+    text = re.sub(
+        rf'<div[^>]*(?:class|id)="[^"]*{noise_div_pat}[^"]*"[^>]*>.*?</div>',
+        '', text, flags=re.DOTALL | re.IGNORECASE,
+    )
+    # 第3步：移除所有 HTML 标签
+    text = re.sub(r'<[^>]+>', ' ', text)
+    # 第4步：解码 HTML 实体
+    text = html.unescape(text)
+    # 第5步：合并连续空白
+    text = re.sub(r'[ \t]+', ' ', text)
+    text = re.sub(r'\n\s*\n', '\n', text)
+    return text.strip()
+
+
+def _extract_article_body(raw_html: str) -> str:
+    """尝试提取页面主体内容区域（百科/wiki类页面优化）。
+    成功则返回主体区域 HTML，失败则返回空字符串（交由 _strip_html 处理全页）。"""
+    for pattern in _ARTICLE_BODY_PATTERNS:
+        m = re.search(pattern, raw_html, flags=re.DOTALL | re.IGNORECASE)
+        if m:
+            body = m.group(1) if m.lastindex else m.group(0)
+            # 确保提取到的内容有足够的实际文本（排除空 div）
+            plain_check = re.sub(r'<[^>]+>', '', body).strip()
+            if len(plain_check) > 200:
+                return body
+    return ""
+
+
+def legacy_extract(raw_html: str) -> str:
+    article_html = _extract_article_body(raw_html)
+    if article_html:
+        return _strip_html(article_html)
+    return _strip_html(raw_html)
+
+
+# ==================== 基准 ====================
+
+def _save_pages(urls, pages_dir):
+    from tools.search import _FETCH_HEADERS
+    from tools.http_pool import http_get
+
+    os.makedirs(pages_dir, exist_ok=True)
+    for i, url in enumerate(urls, 1):
+        resp = http_get(url, headers=_FETCH_HEADERS, timeout=15)
+        resp.encoding = resp.apparent_encoding or "utf-8"
+        name = re.sub(r"[^\w.-]+", "_", url.split("://", 1)[-1])[:80] or f"page{i}"
+        path = os.path.join(pages_dir, f"{name}.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(resp.text)
+        print(f"已保存: {url} → {path} ({len(resp.text) // 1024} KB)")
+
+
+def _time(fn, raw, repeat):
+    best = float("inf")
+    out = ""
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(raw)
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def _overlap(a: str, b: str) -> float:
+    """两份输出的词集合重合度（Jaccard），用于粗略核对提取质量（两者断行方式不同，不按行比较）"""
+    wa, wb = set(a.split()), set(b.split())
+    if not wa and not wb:
+        return 1.0
+    return len(wa & wb) / max(1, len(wa | wb))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTML 正文提取基准")
+    parser.add_argument("--pages", default=DEFAULT_PAGES_DIR, help="保存页面的目录（*.html）")
+    parser.add_argument("--save", nargs="*", default=[], help="先下载这些 URL 到 --pages 目录")
+    parser.add_argument("--repeat", type=int, default=3, help="每页重复次数（取最快）")
+    args = parser.parse_args()
+
+    if args.save:
+        _save_pages(args.save, args.pages)
+
+    paths = sorted(glob.glob(os.path.join(args.pages, "*.html")))
+    if not paths:
+        print(f"未找到页面：{args.pages}/*.html（可用 --save URL 下载）")
+        return
+
+    print(f"{'页面':<48} {'大小KB':>7} {'正则ms':>9} {'单遍ms':>9} {'加速':>6} {'正则字数':>8} {'单遍字数':>8} {'词重合':>6}")
+    total_old = total_new = 0.0
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            raw = f.read()
+        t_old, out_old = _time(legacy_extract, raw, args.repeat)
+        t_new, out_new = _time(extract_text, raw, args.repeat)
+        total_old += t_old
+        total_new += t_new
+        print(f"{os.path.basename(path)[:48]:<48} {len(raw) // 1024:>7} {t_old * 1000:>9.1f} {t_new * 1000:>9.1f} "
+              f"{t_old / max(t_new, 1e-9):>5.1f}x {len(out_old):>8} {len(out_new):>8} {_overlap(out_old, out_new):>6.2f}")
+    print(f"合计: 正则 {total_old * 1000:.1f}ms / 单遍 {total_new * 1000:.1f}ms "
+          f"（{total_old / max(total_new, 1e-9):.1f}x）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+本地磁盘缓存 — SQLite 存储 + TTL 过期 + LRU 淘汰 + 命中统计
+供搜索引擎结果缓存使用（同一查询在不同分支/轮次/运行之间复用）。
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+
+class DiskCache:
+    """线程安全的 SQLite 键值缓存。
+
+    - 每条记录带过期时间（TTL），读取时过期即视为未命中并删除
+    - 超过 max_entries 时按 last_access 淘汰最久未访问的记录（LRU）
+    - 按 namespace（如 bocha / serper）统计 hit / miss / negative_hit
+    """
+
+    def __init__(self, path: str, max_entries: int = 5000):
+        self._path = path
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = None
+        self._stats = defaultdict(lambda: {"hit": 0, "miss": 0, "negative_hit": 0, "store": 0, "evict": 0})
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self._path, check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY,"
+                " namespace TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " negative INTEGER NOT NULL DEFAULT 0,"
+                " expires_at REAL NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_access ON cache(last_access)")
+            self._conn = conn
+        return self._conn
+
+    def get(self, namespace: str, key: str):
+        """读取缓存，未命中或已过期返回 None"""
+        full_key = f"{namespace}:{key}"
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT value, negative, expires_at FROM cache WHERE key = ?", (full_key,)
+                ).fetchone()
+                if row is None:
+                    self._stats[namespace]["miss"] += 1
+                    return None
+                value, negative, expires_at = row
+                if expires_at < now:
+                    conn.execute("DELETE FROM cache WHERE key = ?", (full_key,))
+                    conn.commit()
+                    self._stats[namespace]["miss"] += 1
+                    return None
+                conn.execute("UPDATE cache SET last_access = ? WHERE key = ?", (now, full_key))
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"[Cache] 读取失败 ({namespace}): {e}")
+                self._stats[namespace]["miss"] += 1
+                return None
+            self._stats[namespace]["negative_hit" if negative else "hit"] += 1
+        return json.loads(value)
+
+    def set(self, namespace: str, key: str, value, ttl: float, negative: bool = False) -> None:
+        """写入缓存；ttl<=0 时不写入"""
+        if ttl <= 0:
+            return
+        full_key = f"{namespace}:{key}"
+        now = time.time()
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, namespace, value, negative, expires_at, last_access)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (full_key, namespace, payload, int(negative), now + ttl, now),
+                )
+                self._stats[namespace]["store"] += 1
+                self._evict(conn, namespace)
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"[Cache] 写入失败 ({namespace}): {e}")
+
+    def _evict(self, conn: sqlite3.Connection, namespace: str) -> None:
+        """超出容量时先清理过期记录，再按 LRU 淘汰"""
+        count = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        if count <= self._max_entries:
+            return
+        conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+        count = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        overflow = count - self._max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                " SELECT key FROM cache ORDER BY last_access ASC LIMIT ?)",
+                (overflow,),
+            )
+            self._stats[namespace]["evict"] += overflow
+
+    def clear(self, namespace: str = None) -> None:
+        with self._lock:
+            conn = self._connect()
+            if namespace:
+                conn.execute("DELETE FROM cache WHERE namespace = ?", (namespace,))
+            else:
+                conn.execute("DELETE FROM cache")
+            conn.commit()
+
+    def stats(self) -> dict:
+        """返回各 namespace 的命中统计（副本）"""
+        with self._lock:
+            return {ns: dict(s) for ns, s in self._stats.items()}
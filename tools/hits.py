@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+结构化搜索结果 — 搜索层返回 SearchHit / SearchBatch 对象，
+研究子图直接基于 URL / 站点 / 排名做深读选择、去重与证据溯源，
+只在构造 prompt 时才渲染为文本（render()，格式与原 _format_results 输出一致）。
+"""
+from dataclasses import dataclass, field
+from typing import List
+
+
+@dataclass(slots=True, frozen=True)
+class SearchHit:
+    """单条搜索命中"""
+    url: str
+    title: str
+    snippet: str
+    site: str
+    date: str
+    engine: str      # bocha / serper / baike
+    rank: int        # 在本次查询结果中的名次（从 1 开始）
+
+    def render(self, max_snippet: int = 600) -> str:
+        return f"{self.rank}. {self.title}\n   {self.snippet[:max_snippet]}\n   来源: {self.site} | {self.url}"
+
+
+@dataclass(slots=True)
+class SearchBatch:
+    """一次工具调用的结果：命中列表 + 失败信息；body 非空时（百科）直接作为渲染文本"""
+    label: str                                   # 显示名：博查 / Google / 百度百科
+    query: str
+    hits: List[SearchHit] = field(default_factory=list)
+    error: str = ""                              # 完整的失败文本（如 "[博查搜索异常] ..."）
+    body: str = ""
+
+    def render(self) -> str:
+        if self.error:
+            return self.error
+        if self.body:
+            return self.body
+        if not self.hits:
+            return f"[{self.label}] 查询 '{self.query}' 无结果"
+        lines = [f"[{self.label}] 查询: {self.query} — 共 {len(self.hits)} 条结果\n"]
+        lines.extend(hit.render() for hit in self.hits)
+        return "\n".join(lines)
+
+
+def iter_unique_hits(batches: List[SearchBatch]):
+    """按批次顺序、名次顺序遍历命中，跳过空 URL 与重复 URL"""
+    seen = set()
+    for batch in batches:
+        for hit in batch.hits:
+            if hit.url and hit.url not in seen:
+                seen.add(hit.url)
+                yield hit
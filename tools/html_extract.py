@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""
+单遍 HTML 正文提取器 — 线性时间流式分词（单个标记正则 finditer + 结构栈）
+一次遍历同时完成：
+- 噪声移除：script/style/nav/footer 等标签及 sidebar/recommend/comment 等噪声容器整棵子树
+- 正文定位：搜狗百科 / 百度百科 / 维基百科 / <article> / 通用正文容器，按优先级取第一个有效区域
+- 文本归一化：实体解码、块级元素换行、合并空白、去空行
+
+取代原先 _ARTICLE_BODY_PATTERNS + _strip_html 的多次整页正则（贪婪 (.*) 与 .*?</div> 回溯）。
+不使用 html.parser：其逐标签的 Python 层开销在数百 KB 的页面上比原正则管线还慢。
+每个字符最多被扫描常数次；只有 div/article/噪声标签进入结构栈；支持分块 feed()（供流式下载边下边解析）。
+"""
+import re
+from html import unescape
+
+# 整棵子树丢弃的标签
+_NOISE_TAGS = frozenset({
+    "script", "style", "noscript", "nav", "header", "footer", "aside",
+    "svg", "template", "iframe", "form",
+})
+
+# 内容按原始文本处理（内部的 "<" 不是标签）的标签
+_RAWTEXT_TAGS = frozenset({"script", "style", "textarea", "title", "xmp"})
+
+# 噪声容器：class/id 的任一 token 命中即丢弃整棵子树
+_NOISE_TOKEN_RE = re.compile(
+    r"sidebar|recommend|comment|advert|breadcrumb|copyright|disclaimer"
+    r"|^(?:ad|related|share)[-_]"
+)
+
+# 正文容器，按优先级排列：(名称, 标签, 匹配的属性, 命中正则)
+_CONTAINER_RULES = [
+    ("sogou_baike", "div", ("class",), re.compile(r"lemma[_-]?content")),
+    ("baidu_baike", "div", ("class",), re.compile(r"main-content")),
+    ("baidu_summary", "div", ("class",), re.compile(r"lemmawgt-lemmasummary")),
+    ("wikipedia", "div", ("class",), re.compile(r"mw-parser-output")),
+    ("article", "article", (), None),
+    ("generic", "div", ("id", "class"), re.compile(r"article|content|main-body|entry")),
+]
+
+# 需要解析 class/id 的标签（其余非噪声标签只影响断行，不入结构栈）
+_ATTR_TAGS = frozenset({"div", "article"})
+
+# 块级元素：起止处断行
+_BLOCK_TAGS = frozenset({
+    "p", "div", "br", "li", "ul", "ol", "dl", "dd", "dt", "tr", "table",
+    "section", "article", "blockquote", "pre", "h1", "h2", "h3", "h4", "h5", "h6",
+    "caption", "figcaption", "hr",
+})
+
+# 无闭合标签的空元素，不入栈
+_VOID_TAGS = frozenset({
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+    "meta", "param", "source", "track", "wbr",
+})
+
+# 正文区域的最少有效字符数（与原 _extract_article_body 的阈值一致）
+MIN_BODY_CHARS = 200
+
+# 标记：开/闭标签（group 1-3）、注释起始（group 4）、<!DOCTYPE> / <?xml?> 等声明
+_TOKEN_RE = re.compile(r"<(?:(/?)([a-zA-Z][a-zA-Z0-9:-]*)([^>]*)>|(!--)|[!?][^>]*>)")
+_ATTR_RE = re.compile(r"""\b(class|id)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""", re.IGNORECASE)
+_SPACE_RE = re.compile(r"[ \t\r\f\v\u00a0\u3000]+")
+_RAWTEXT_END_RE = {tag: re.compile(rf"</{tag}\s*>", re.IGNORECASE) for tag in _RAWTEXT_TAGS}
+
+
+def _is_noise(attrs: dict) -> bool:
+    for name in ("class", "id"):
+        for token in attrs.get(name, "").split():
+            if _NOISE_TOKEN_RE.search(token):
+                return True
+    return False
+
+
+def _match_container(tag: str, attrs: dict):
+    """返回命中的正文容器优先级（下标），未命中返回 None"""
+    for idx, (_, rule_tag, attr_names, pattern) in enumerate(_CONTAINER_RULES):
+        if tag != rule_tag:
+            continue
+        if pattern is None:
+            return idx
+        if any(pattern.search(attrs.get(a, "")) for a in attr_names):
+            return idx
+    return None
+
+
+def _parse_attrs(attr_text: str) -> dict:
+    attrs = {}
+    for m in _ATTR_RE.finditer(attr_text):
+        name = m.group(1).lower()
+        if name not in attrs:
+            attrs[name] = (m.group(2) or m.group(3) or m.group(4) or "").lower()
+    return attrs
+
+
+def normalize_text(parts) -> str:
+    """文本片段 → 归一化文本：行内合并空白，去除空行"""
+    text = _SPACE_RE.sub(" ", "".join(parts))
+    return "\n".join(line for line in (l.strip() for l in text.split("\n")) if line)
+
+
+class HtmlTextExtractor:
+    """流式正文提取器：可多次 feed()，最后 close() 并调用 text() 取结果。"""
+
+    def __init__(self):
+        self._buf = ""
+        self._rawtext = None          # 当前所处的原始文本标签（script/style 等）
+        self._comment = False         # 当前处于 <!-- --> 注释中
+        # 结构栈：只跟踪决定噪声/正文归属的标签 (tag, 是否噪声, 捕获的容器优先级或 None)
+        self._stack = []
+        self._noise_depth = 0
+        self._all_parts = []
+        self._all_len = 0
+        # 每个优先级只记录文档中第一个命中的容器；_body_lens 为各区域累计字符数
+        self._bodies = [None] * len(_CONTAINER_RULES)
+        self._body_lens = [0] * len(_CONTAINER_RULES)
+        self._capturing = []
+
+    # ---------- 分词 ----------
+
+    def feed(self, data: str) -> None:
+        self._buf += data
+        self._consume(final=False)
+
+    def close(self) -> None:
+        self._consume(final=True)
+
+    def _consume(self, final: bool) -> None:
+        buf = self._buf
+        pos = 0
+        n = len(buf)
+        while pos < n:
+            if self._comment:
+                end = buf.find("-->", pos)
+                if end < 0:
+                    pos = n if final else max(pos, n - 2)
+                    break
+                self._comment = False
+                pos = end + 3
+                continue
+
+            if self._rawtext is not None:
+                m = _RAWTEXT_END_RE[self._rawtext].search(buf, pos)
+                if m is None:
+                    if final:
+                        pos = n
+                    else:
+                        # 保留可能被截断的结束标签前缀
+                        pos = max(pos, buf.rfind("<", pos))
+                    break
+                self._rawtext = None
+                self._end_tag(m.group(0)[2:].rstrip("> \t\r\n").lower())
+                pos = m.end()
+                continue
+
+            # 只解析到最后一个 ">"：限定 endpos 保证每个 "<" 的匹配尝试都会在其后第一个 ">" 处结束（线性）。
+            # 之后的内容在非最终块中可能是被截断的标签，留待下一块；最终块中没有闭合 ">" 的 "<" 按文本处理
+            endpos = buf.rfind(">", pos) + 1
+            if endpos > pos:
+                pos = self._scan(buf, pos, endpos)
+                if self._comment or self._rawtext is not None:
+                    continue
+            if final and pos < n:
+                self._text(buf[pos:])
+                pos = n
+            break
+        self._buf = buf[pos:]
+
+    def _scan(self, buf: str, pos: int, endpos: int) -> int:
+        """在 [pos, endpos) 内按标记扫描，遇到注释/原始文本标签时返回以便切换状态"""
+        text = self._text
+        for m in _TOKEN_RE.finditer(buf, pos, endpos):
+            start = m.start()
+            if start > pos and not self._noise_depth:
+                text(buf[pos:start])
+            pos = m.end()
+            closing, tag, attr_text, comment = m.groups()
+            if comment:
+                self._comment = True
+                return pos
+            if tag is None:
+                continue                       # <!DOCTYPE>、<?xml?> 等声明
+            tag = tag.lower()
+            if closing:
+                self._end_tag(tag)
+                continue
+            self._start_tag(tag, attr_text)
+            if tag in _RAWTEXT_TAGS:
+                self._rawtext = tag
+                return pos
+        return pos
+
+    # ---------- 结构处理 ----------
+
+    def _start_tag(self, tag: str, attr_text: str) -> None:
+        if tag in _BLOCK_TAGS and not self._noise_depth:
+            self._emit("\n")
+        if tag in _VOID_TAGS or attr_text.endswith("/"):
+            return
+        if tag in _NOISE_TAGS:
+            self._noise_depth += 1
+            self._stack.append((tag, True, None))
+            return
+        if tag not in _ATTR_TAGS:
+            return
+        attrs = _parse_attrs(attr_text)
+        if tag == "div" and _is_noise(attrs):
+            self._noise_depth += 1
+            self._stack.append((tag, True, None))
+            return
+        capture = None
+        if not self._noise_depth:
+            idx = _match_container(tag, attrs)
+            if idx is not None and self._bodies[idx] is None:
+                self._bodies[idx] = []
+                self._capturing.append(idx)
+                capture = idx
+        self._stack.append((tag, False, capture))
+
+    def _end_tag(self, tag: str) -> None:
+        if tag in _NOISE_TAGS or tag in _ATTR_TAGS:
+            # 容错：向下查找匹配的开标签，途中未闭合的元素一并弹出；找不到则忽略该闭合标签
+            stack = self._stack
+            for i in range(len(stack) - 1, -1, -1):
+                if stack[i][0] == tag:
+                    break
+            else:
+                return
+            while len(stack) > i:
+                _, noise, capture = stack.pop()
+                if noise:
+                    self._noise_depth -= 1
+                if capture is not None:
+                    self._capturing.remove(capture)
+        if tag in _BLOCK_TAGS and not self._noise_depth:
+            self._emit("\n")
+
+    def _text(self, data: str) -> None:
+        if self._noise_depth:
+            return
+        if "&" in data:
+            data = unescape(data)
+        self._emit(data)
+
+    def _emit(self, text: str) -> None:
+        self._all_parts.append(text)
+        self._all_len += len(text)
+        if self._capturing:
+            for idx in self._capturing:
+                self._bodies[idx].append(text)
+                self._body_lens[idx] += len(text)
+
+    # ---------- 输出 ----------
+
+    def collected_chars(self) -> int:
+        """当前会被选中区域的已收集字符数（未归一化），供流式读取判断是否已足够"""
+        for size in self._body_lens:
+            if size > MIN_BODY_CHARS:
+                return size
+        return self._all_len
+
+    def body_text(self) -> str:
+        """按优先级返回第一个有效（> MIN_BODY_CHARS）正文区域的文本，没有则返回空串"""
+        for parts in self._bodies:
+            if parts is None:
+                continue
+            text = normalize_text(parts)
+            if len(text) > MIN_BODY_CHARS:
+                return text
+        return ""
+
+    def text(self) -> str:
+        """正文区域优先，否则返回全页文本"""
+        return self.body_text() or normalize_text(self._all_parts)
+
+
+def extract_text(raw_html: str) -> str:
+    """HTML → 纯文本（正文区域优先）"""
+    parser = HtmlTextExtractor()
+    parser.feed(raw_html)
+    parser.close()
+    return parser.text()
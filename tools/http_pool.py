@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+进程级共享 HTTP 连接池 — 所有搜索/百科/URL 读取共用
+- requests.Session + HTTPAdapter：按 host 维护 keep-alive 连接池，复用 TCP/TLS 连接
+- urllib3 Retry：连接错误与 502/503/504 自动退避重试
+- 默认超时：(连接超时, 读取超时)，调用方可覆盖
+- 指定 provider 时经过进程级限流器（tools/ratelimit.py），429 按 Retry-After 等待后重试
+- 每次请求记录到运行 trace（utils/trace.py）：状态码、响应字节数、重试次数
+"""
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config.settings import (
+    HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE,
+    HTTP_MAX_RETRIES, HTTP_BACKOFF_FACTOR,
+    HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT,
+    GOVERNOR_MAX_THROTTLE_RETRIES,
+)
+from tools.ratelimit import get_governor, parse_retry_after
+from tools.replay import ReplayAdapter, replay_enabled
+from utils import trace
+
+
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+
+def _build_session() -> requests.Session:
+    retry = Retry(
+        total=HTTP_MAX_RETRIES,
+        connect=HTTP_MAX_RETRIES,
+        read=HTTP_MAX_RETRIES,
+        status=HTTP_MAX_RETRIES,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        status_forcelist=(502, 503, 504),
+        # 搜索/百科接口均为幂等查询，POST 也允许重试
+        allowed_methods=frozenset({"GET", "HEAD", "POST"}),
+        raise_on_status=False,
+        # 429 不在传输层重试：交给 tools/ratelimit.py 的限流器按 Retry-After 退避并收缩并发
+        respect_retry_after_header=False,
+    )
+    # 录制/回放模式下换用 ReplayAdapter（传输层截获，限流与重试逻辑不变）
+    adapter_cls = ReplayAdapter if replay_enabled() else HTTPAdapter
+    adapter = adapter_cls(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        max_retries=retry,
+        pool_block=False,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """返回进程级共享 Session（首次调用时创建，线程安全）"""
+    global _SESSION
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                _SESSION = _build_session()
+    return _SESSION
+
+
+def provider_for_url(url: str) -> str:
+    """URL 深读按 host 独立限流"""
+    return f"fetch:{urlsplit(url).hostname or ''}"
+
+
+def request(method: str, url: str, timeout=None, provider: str = None, **kwargs) -> requests.Response:
+    """通过共享连接池发送请求；timeout 缺省为 (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)，
+    传入单个数字时作为读取超时。
+
+    指定 provider 时：先从该 provider 的限流器获取名额；响应 429 时反馈限流
+    （并发上限减半 + 按 Retry-After 暂停），最多重试 GOVERNOR_MAX_THROTTLE_RETRIES 次，
+    仍被限流则返回最后一次 429 响应交由调用方 raise_for_status。"""
+    if timeout is None:
+        timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    elif isinstance(timeout, (int, float)):
+        timeout = (HTTP_CONNECT_TIMEOUT, timeout)
+    session = get_session()
+    name = provider or urlsplit(url).hostname or ""
+    with trace.span("http", name, method=method, url=url) as ev:
+        if provider is None:
+            resp = session.request(method, url, timeout=timeout, **kwargs)
+            _trace_response(ev, resp, kwargs.get("stream", False))
+            return resp
+
+        governor = get_governor(provider)
+        for attempt in range(GOVERNOR_MAX_THROTTLE_RETRIES + 1):
+            with governor.slot() as slot:
+                resp = session.request(method, url, timeout=timeout, **kwargs)
+                if resp.status_code != 429:
+                    break
+                slot.throttle(parse_retry_after(resp.headers.get("Retry-After")))
+            print(f"[RateLimit] {provider} 返回 429（第 {attempt + 1} 次），等待后重试")
+            if attempt < GOVERNOR_MAX_THROTTLE_RETRIES:
+                resp.close()
+        _trace_response(ev, resp, kwargs.get("stream", False), throttled=attempt)
+        return resp
+
+
+def _trace_response(ev: dict, resp: requests.Response, stream: bool, throttled: int = 0) -> None:
+    """补充 trace 字段；流式响应的 body 尚未下载，只记 Content-Length（实际下载量由调用方的 fetch 事件记录）"""
+    history = getattr(getattr(resp.raw, "retries", None), "history", None) or ()
+    ev["status"] = resp.status_code
+    ev["retries"] = len(history) + throttled
+    if stream:
+        ev["content_length"] = int(resp.headers.get("Content-Length") or 0)
+    else:
+        ev["bytes"] = len(resp.content)
+
+
+def http_get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def http_post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
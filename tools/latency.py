@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+搜索引擎延迟统计 — 滑动窗口记录各引擎真实请求耗时，供 auto_search 对冲延迟取 p95
+"""
+import threading
+from collections import defaultdict, deque
+
+from config.settings import (
+    LATENCY_WINDOW, HEDGE_MIN_SAMPLES,
+    HEDGE_DEFAULT_DELAY, HEDGE_DELAY_MIN, HEDGE_DELAY_MAX,
+)
+
+
+class LatencyTracker:
+    """线程安全的按引擎延迟滑动窗口"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+
+    def record(self, engine: str, seconds: float) -> None:
+        with self._lock:
+            self._samples[engine].append(seconds)
+
+    def percentile(self, engine: str, pct: float):
+        """返回引擎延迟的 pct 分位数（0-100），样本不足 HEDGE_MIN_SAMPLES 时返回 None"""
+        with self._lock:
+            samples = sorted(self._samples[engine])
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        idx = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+        return samples[idx]
+
+    def hedge_delay(self, engine: str) -> float:
+        """对冲延迟：主引擎 p95（限制在 [HEDGE_DELAY_MIN, HEDGE_DELAY_MAX]），样本不足时用默认值"""
+        p95 = self.percentile(engine, 95)
+        if p95 is None:
+            return HEDGE_DEFAULT_DELAY
+        return max(HEDGE_DELAY_MIN, min(HEDGE_DELAY_MAX, p95))
+
+    def snapshot(self) -> dict:
+        """{engine: {count, p50, p95}}"""
+        with self._lock:
+            engines = list(self._samples)
+        return {
+            e: {
+                "count": len(self._samples[e]),
+                "p50": self.percentile(e, 50),
+                "p95": self.percentile(e, 95),
+            }
+            for e in engines
+        }
+
+
+SEARCH_LATENCY = LatencyTracker()
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+进程级 provider 限流器 — 令牌桶 + 在途并发上限（AIMD 自适应）+ Retry-After
+所有线程 / 事件循环共享同一份状态：
+- 令牌桶：平滑请求速率（rate 个/秒，突发上限 burst）
+- 在途上限：成功时加性增长（每个窗口 +1），被限流（429）时乘性减半
+- Retry-After：被限流后在指定时间内暂停放行新请求
+- 排队指标：获取次数、累计/最大排队等待、限流次数
+"""
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+
+from langchain_core.rate_limiters import BaseRateLimiter
+
+from config.settings import (
+    PROVIDER_LIMITS, GOVERNOR_DEFAULT_RETRY_AFTER, GOVERNOR_MAX_RETRY_AFTER,
+)
+
+
+class ProviderGovernor:
+    """单个 provider 的令牌桶 + AIMD 在途并发控制（线程安全，同步/异步均可获取）"""
+
+    def __init__(self, name: str, rate: float, burst: float, max_in_flight: int, min_in_flight: int = 1):
+        self.name = name
+        self._rate = rate
+        self._burst = burst
+        self._tokens = burst
+        self._last_refill = time.monotonic()
+        self._max_limit = max_in_flight
+        self._min_limit = min_in_flight
+        self._limit = float(max_in_flight)
+        self._in_flight = 0
+        self._blocked_until = 0.0
+        self._cond = threading.Condition()
+        self._stats = {"acquired": 0, "wait_total": 0.0, "wait_max": 0.0, "throttled": 0}
+
+    # ---------- 获取 / 释放 ----------
+
+    def _try_acquire(self, hold_slot: bool) -> float:
+        """尝试获取，成功返回 0；否则返回建议等待秒数。调用方须持有 _cond。"""
+        now = time.monotonic()
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        if hold_slot and self._in_flight >= int(self._limit):
+            return 0.05
+        self._tokens = min(self._burst, self._tokens + (now - self._last_refill) * self._rate)
+        self._last_refill = now
+        if self._tokens < 1:
+            return (1 - self._tokens) / self._rate
+        self._tokens -= 1
+        if hold_slot:
+            self._in_flight += 1
+        return 0.0
+
+    def _record_wait(self, waited: float) -> None:
+        self._stats["acquired"] += 1
+        self._stats["wait_total"] += waited
+        self._stats["wait_max"] = max(self._stats["wait_max"], waited)
+
+    def acquire(self, hold_slot: bool = True) -> None:
+        """阻塞直到获得令牌（hold_slot=True 时同时占用一个在途名额，须配对 release）"""
+        t0 = time.monotonic()
+        with self._cond:
+            while True:
+                wait = self._try_acquire(hold_slot)
+                if wait <= 0:
+                    break
+                self._cond.wait(timeout=wait)
+            self._record_wait(time.monotonic() - t0)
+
+    async def aacquire(self, hold_slot: bool = True) -> None:
+        """acquire 的异步版本：不阻塞事件循环，按建议等待时间 sleep 后重试"""
+        t0 = time.monotonic()
+        while True:
+            with self._cond:
+                wait = self._try_acquire(hold_slot)
+                if wait <= 0:
+                    self._record_wait(time.monotonic() - t0)
+                    return
+            await asyncio.sleep(min(wait, 0.5))
+
+    def release(self, throttled: bool = False, retry_after: float = None) -> None:
+        """释放在途名额并反馈结果：成功 → 加性增长；限流 → 乘性减半 + 暂停放行"""
+        with self._cond:
+            self._in_flight = max(0, self._in_flight - 1)
+            if throttled:
+                self.on_throttled(retry_after)
+            else:
+                self._limit = min(self._max_limit, self._limit + 1.0 / max(self._limit, 1.0))
+            self._cond.notify_all()
+
+    def on_throttled(self, retry_after: float = None) -> None:
+        """记录一次限流（429）：并发上限减半，并在 retry_after 秒内暂停放行"""
+        with self._cond:
+            self._stats["throttled"] += 1
+            self._limit = max(self._min_limit, self._limit / 2)
+            delay = min(GOVERNOR_MAX_RETRY_AFTER, retry_after or GOVERNOR_DEFAULT_RETRY_AFTER)
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self):
+        """同步上下文：占用一个在途名额；块内调用 ctx.throttle(retry_after) 反馈限流"""
+        self.acquire()
+        ctx = _SlotContext()
+        try:
+            yield ctx
+        finally:
+            self.release(ctx.throttled, ctx.retry_after)
+
+    @asynccontextmanager
+    async def aslot(self):
+        await self.aacquire()
+        ctx = _SlotContext()
+        try:
+            yield ctx
+        finally:
+            self.release(ctx.throttled, ctx.retry_after)
+
+    def stats(self) -> dict:
+        with self._cond:
+            s = dict(self._stats)
+            s["wait_avg"] = s["wait_total"] / s["acquired"] if s["acquired"] else 0.0
+            s["limit"] = round(self._limit, 2)
+            s["in_flight"] = self._in_flight
+            return s
+
+
+class _SlotContext:
+    __slots__ = ("throttled", "retry_after")
+
+    def __init__(self):
+        self.throttled = False
+        self.retry_after = None
+
+    def throttle(self, retry_after: float = None) -> None:
+        self.throttled = True
+        self.retry_after = retry_after
+
+
+# ==================== 进程级注册表 ====================
+
+_GOVERNORS = {}
+_GOVERNORS_LOCK = threading.Lock()
+
+
+def get_governor(provider: str) -> ProviderGovernor:
+    """按 provider 名返回共享限流器；"fetch:host" 形式按 host 独立限流，参数取 "fetch" 的配置"""
+    gov = _GOVERNORS.get(provider)
+    if gov is None:
+        with _GOVERNORS_LOCK:
+            gov = _GOVERNORS.get(provider)
+            if gov is None:
+                conf = PROVIDER_LIMITS.get(provider.split(":", 1)[0], PROVIDER_LIMITS["default"])
+                gov = _GOVERNORS[provider] = ProviderGovernor(provider, **conf)
+    return gov
+
+
+def governor_stats() -> dict:
+    """{provider: {acquired, wait_total, wait_avg, wait_max, throttled, limit, in_flight}}"""
+    with _GOVERNORS_LOCK:
+        items = list(_GOVERNORS.items())
+    return {name: gov.stats() for name, gov in items}
+
+
+def parse_retry_after(value) -> float:
+    """解析 Retry-After 头（秒数或 HTTP 日期），无法解析返回 None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class GovernorRateLimiter(BaseRateLimiter):
+    """LangChain 限流器适配：ChatOpenAI(rate_limiter=...) 每次调用前从 provider 令牌桶取令牌。
+    BaseRateLimiter 没有调用结束回调，因此这里只做速率与 Retry-After 暂停，不占在途名额。"""
+
+    def __init__(self, provider: str):
+        self._governor = get_governor(provider)
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        if not blocking:
+            with self._governor._cond:
+                return self._governor._try_acquire(hold_slot=False) <= 0
+        self._governor.acquire(hold_slot=False)
+        return True
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        if not blocking:
+            return self.acquire(blocking=False)
+        await self._governor.aacquire(hold_slot=False)
+        return True
+
+
+# 所有 ChatOpenAI 实例共享的 LLM 限流器
+LLM_RATE_LIMITER = GovernorRateLimiter("llm")
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+录制 / 回放 — 在传输层截获所有 provider 请求（博查 / Serper / 百科 / URL 深读 / LLM），
+使整条流水线可以在无网络的机器上确定性地复现，用于延迟基准与回归测试。
+
+- REPLAY_MODE=record：真实请求，响应（状态码、头、解码后的 body、耗时）写入 SQLite 归档
+- REPLAY_MODE=replay：按请求指纹从归档返回，可按录制耗时 × REPLAY_LATENCY_SCALE 模拟延迟；
+  归档中没有的请求抛出 ReplayMissError（由各工具的异常处理转为错误文本）
+- 请求指纹 = method + url + 规范化 body（JSON 按键排序），不含鉴权头；
+  同一指纹多次出现时按出现顺序编号（seq），回放超出录制次数时重复最后一条
+
+挂载点：requests 会话的 ReplayAdapter（tools/http_pool.py）、
+httpx 的 ReplayTransport / ReplayAsyncTransport（agents/llm.py 的 LLM 客户端与 tools/async_search.py）。
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from config.settings import (
+    REPLAY_MODE, REPLAY_ARCHIVE, REPLAY_LATENCY_SCALE, REPLAY_MAX_BODY_BYTES,
+)
+
+# body 已解码保存，回放时这些头会让客户端重复解码或校验长度
+_DROP_HEADERS = frozenset({"content-encoding", "content-length", "transfer-encoding", "connection"})
+
+
+class ReplayMissError(RuntimeError):
+    """回放模式下归档中没有对应请求"""
+
+
+def replay_enabled() -> bool:
+    return REPLAY_MODE in ("record", "replay")
+
+
+# ==================== 归档 ====================
+
+class ReplayArchive:
+    """线程安全的 SQLite 录制归档：(key, seq) → 响应"""
+
+    def __init__(self, path: str):
+        self._path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._seq = defaultdict(int)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self._path, check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS exchanges ("
+                " key TEXT NOT NULL,"
+                " seq INTEGER NOT NULL,"
+                " method TEXT NOT NULL,"
+                " url TEXT NOT NULL,"
+                " status INTEGER NOT NULL,"
+                " headers TEXT NOT NULL,"
+                " body BLOB NOT NULL,"
+                " latency REAL NOT NULL,"
+                " recorded_at REAL NOT NULL,"
+                " PRIMARY KEY (key, seq))"
+            )
+            self._conn = conn
+        return self._conn
+
+    def next_seq(self, key: str) -> int:
+        with self._lock:
+            seq = self._seq[key]
+            self._seq[key] = seq + 1
+            return seq
+
+    def put(self, key: str, seq: int, method: str, url: str,
+            status: int, headers: dict, body: bytes, latency: float) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO exchanges VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, seq, method, url, status, json.dumps(headers, ensure_ascii=False),
+                 body, latency, time.time()),
+            )
+            conn.commit()
+
+    def get(self, key: str, seq: int):
+        """返回 (status, headers, body, latency)；seq 超出录制次数时返回最后一条，没有则 None"""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT status, headers, body, latency FROM exchanges"
+                " WHERE key = ? AND seq <= ? ORDER BY seq DESC LIMIT 1",
+                (key, seq),
+            ).fetchone()
+        if row is None:
+            return None
+        status, headers, body, latency = row
+        return status, json.loads(headers), bytes(body), latency
+
+
+_ARCHIVE = ReplayArchive(REPLAY_ARCHIVE)
+
+
+def request_key(method: str, url: str, body) -> str:
+    """请求指纹：method + url + 规范化 body"""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    body = body or b""
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, ensure_ascii=False).encode("utf-8")
+    except (ValueError, UnicodeDecodeError):
+        pass
+    digest = hashlib.sha256()
+    digest.update(f"{method.upper()} {url}\n".encode("utf-8"))
+    digest.update(body)
+    return digest.hexdigest()
+
+
+def _clean_headers(headers) -> dict:
+    return {k: v for k, v in headers.items() if k.lower() not in _DROP_HEADERS}
+
+
+def _lookup(method: str, url: str, key: str):
+    entry = _ARCHIVE.get(key, _ARCHIVE.next_seq(key))
+    if entry is None:
+        raise ReplayMissError(f"回放归档中无此请求: {method} {url}")
+    return entry
+
+
+def _replay_delay(latency: float) -> float:
+    return max(0.0, latency * REPLAY_LATENCY_SCALE)
+
+
+# ==================== requests（同步搜索 / 百科 / URL 深读） ====================
+
+class ReplayAdapter(HTTPAdapter):
+    """requests 传输适配器：record 时录制，replay 时直接从归档构造响应"""
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        key = request_key(request.method, request.url, request.body)
+        if REPLAY_MODE == "replay":
+            status, headers, body, latency = _lookup(request.method, request.url, key)
+            time.sleep(_replay_delay(latency))
+            return self._replayed_response(request, status, headers, body)
+
+        seq = _ARCHIVE.next_seq(key)
+        t0 = time.perf_counter()
+        resp = super().send(request, stream=True, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+        try:
+            body = bytearray()
+            for chunk in resp.iter_content(chunk_size=64 * 1024):
+                body += chunk
+                if len(body) >= REPLAY_MAX_BODY_BYTES:
+                    break
+        finally:
+            resp.close()
+        headers = _clean_headers(resp.headers)
+        _ARCHIVE.put(key, seq, request.method, request.url, resp.status_code, headers,
+                     bytes(body), time.perf_counter() - t0)
+        return self._replayed_response(request, resp.status_code, headers, bytes(body))
+
+    @staticmethod
+    def _replayed_response(request, status: int, headers: dict, body: bytes) -> requests.Response:
+        resp = requests.Response()
+        resp.status_code = status
+        resp.headers = CaseInsensitiveDict(headers)
+        resp.encoding = get_encoding_from_headers(resp.headers)
+        resp.url = request.url
+        resp.request = request
+        resp.reason = ""
+        resp._content = body
+        resp._content_consumed = True
+        return resp
+
+
+# ==================== httpx（异步搜索 / LLM） ====================
+
+class ReplayTransport(httpx.BaseTransport):
+    """httpx 同步传输包装"""
+
+    def __init__(self, inner: httpx.BaseTransport):
+        self._inner = inner
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        body = request.read()
+        key = request_key(request.method, str(request.url), body)
+        if REPLAY_MODE == "replay":
+            status, headers, content, latency = _lookup(request.method, request.url, key)
+            time.sleep(_replay_delay(latency))
+            return httpx.Response(status, headers=headers, content=content, request=request)
+
+        seq = _ARCHIVE.next_seq(key)
+        t0 = time.perf_counter()
+        resp = self._inner.handle_request(request)
+        try:
+            content = bytearray()
+            for chunk in resp.iter_bytes():
+                content += chunk
+                if len(content) >= REPLAY_MAX_BODY_BYTES:
+                    break
+        finally:
+            resp.close()
+        headers = _clean_headers(resp.headers)
+        _ARCHIVE.put(key, seq, request.method, str(request.url), resp.status_code, headers,
+                     bytes(content), time.perf_counter() - t0)
+        return httpx.Response(resp.status_code, headers=headers, content=bytes(content), request=request)
+
+    def close(self) -> None:
+        self._inner.close()
+
+
+class ReplayAsyncTransport(httpx.AsyncBaseTransport):
+    """httpx 异步传输包装（逻辑同 ReplayTransport）"""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport):
+        self._inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        key = request_key(request.method, str(request.url), body)
+        if REPLAY_MODE == "replay":
+            status, headers, content, latency = _lookup(request.method, request.url, key)
+            await asyncio.sleep(_replay_delay(latency))
+            return httpx.Response(status, headers=headers, content=content, request=request)
+
+        seq = _ARCHIVE.next_seq(key)
+        t0 = time.perf_counter()
+        resp = await self._inner.handle_async_request(request)
+        try:
+            content = bytearray()
+            async for chunk in resp.aiter_bytes():
+                content += chunk
+                if len(content) >= REPLAY_MAX_BODY_BYTES:
+                    break
+        finally:
+            await resp.aclose()
+        headers = _clean_headers(resp.headers)
+        _ARCHIVE.put(key, seq, request.method, str(request.url), resp.status_code, headers,
+                     bytes(content), time.perf_counter() - t0)
+        return httpx.Response(resp.status_code, headers=headers, content=bytes(content), request=request)
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+
+def wrap_transport(transport: httpx.BaseTransport) -> httpx.BaseTransport:
+    """录制/回放开启时包装同步传输（LLM 客户端），否则原样返回"""
+    return ReplayTransport(transport) if replay_enabled() else transport
+
+
+def wrap_async_transport(transport: httpx.AsyncBaseTransport) -> httpx.AsyncBaseTransport:
+    """录制/回放开启时包装异步传输，否则原样返回"""
+    return ReplayAsyncTransport(transport) if replay_enabled() else transport
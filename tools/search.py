@@ -3,22 +3,128 @@
 搜索引擎工具封装 — 支持博查（中文）和 Serper/Google（国际）
 所有工具均为 LangChain @tool 装饰器格式，支持 function calling。
 """
+import codecs
 import re
-import html
-import requests
+import time
+import unicodedata
+from concurrent.futures import FIRST_COMPLETED, wait
+from urllib.parse import urlsplit
+
+from charset_normalizer import from_bytes
 from langchain_core.tools import tool
 
 from config.settings import (
     BOCHA_API_KEY, BOCHA_BASE_URL, BOCHA_DEFAULT_COUNT,
     SERPER_API_KEY, SERPER_BASE_URL, SERPER_DEFAULT_NUM,
     BAIKE_API_KEY, BAIKE_LIST_URL, BAIKE_CONTENT_URL,
+    SEARCH_CACHE_ENABLED, SEARCH_CACHE_PATH, SEARCH_CACHE_MAX_ENTRIES,
+    SEARCH_CACHE_TTL, SEARCH_CACHE_NEGATIVE_TTL, BAIKE_NEGATIVE_TTL,
+    AUTO_SEARCH_HEDGE_MODE, AUTO_SEARCH_HEDGE_DELAY,
+    FETCH_MAX_BYTES, FETCH_CHUNK_BYTES, FETCH_SNIFF_BYTES, FETCH_TEXT_MARGIN,
 )
+from tools.cache import DiskCache
+from tools.hits import SearchBatch, SearchHit
+from tools.html_extract import HtmlTextExtractor, extract_text
+from tools.http_pool import http_get, http_post, provider_for_url
+from tools.latency import SEARCH_LATENCY
+from tools.replay import replay_enabled
+from utils import scheduler, trace
+
+try:  # 可选依赖：繁→简转换，未安装时跳过
+    from opencc import OpenCC
+    _T2S = OpenCC("t2s").convert
+except Exception:
+    _T2S = None
+
+
+# ==================== 搜索结果缓存 ====================
+
+_SEARCH_CACHE = DiskCache(SEARCH_CACHE_PATH, max_entries=SEARCH_CACHE_MAX_ENTRIES)
+# 录制/回放时旁路缓存，保证每个 provider 请求都经过归档
+_SEARCH_CACHE_ACTIVE = SEARCH_CACHE_ENABLED and not replay_enabled()
+
+
+def _normalize_query(query: str) -> str:
+    """缓存键归一化：去首尾空白、合并连续空白、英文小写"""
+    return re.sub(r"\s+", " ", (query or "").strip()).lower()
+
+
+def _cache_key(query: str, count: int, locale: str) -> str:
+    return f"{_normalize_query(query)}|{count}|{locale}"
+
+
+def _cached_search(engine: str, key: str, fetch, field: str = "results",
+                   negative_ttl: int = SEARCH_CACHE_NEGATIVE_TTL) -> dict:
+    """带缓存的搜索调用：命中直接返回；未命中调用 fetch() 并按结果写入缓存。
+    成功且 raw[field] 非空 → 正常 TTL；成功但为空 → 负缓存 TTL；失败 → 不缓存。"""
+    if not _SEARCH_CACHE_ACTIVE:
+        return fetch()
+
+    cached = _SEARCH_CACHE.get(engine, key)
+    trace.record("search_cache", engine, hit=cached is not None)
+    if cached is not None:
+        return cached
+
+    raw = fetch()
+    _store_result(engine, key, raw, field, negative_ttl)
+    return raw
+
+
+def _store_result(engine: str, key: str, raw: dict, field: str, negative_ttl: int) -> None:
+    """按结果写入缓存（同步/异步共用）"""
+    if raw.get("success"):
+        if raw.get(field):
+            _SEARCH_CACHE.set(engine, key, raw, ttl=SEARCH_CACHE_TTL.get(engine, 0))
+        else:
+            _SEARCH_CACHE.set(engine, key, raw, ttl=negative_ttl, negative=True)
+
+
+_ENTITY_QUOTES = "\"'“”‘’《》「」『』"
+_CJK_GAP_RE = re.compile(r"(?<=[\u4e00-\u9fff]) (?=[\u4e00-\u9fff])")
+
+
+def normalize_entity(entity: str) -> str:
+    """百科实体名归一化（查询与缓存共用）：NFKC 统一全/半角，去引号/书名号，
+    合并空白并去掉汉字之间的空白，繁体转简体（安装 opencc 时）"""
+    text = unicodedata.normalize("NFKC", entity or "").strip().strip(_ENTITY_QUOTES).strip()
+    text = _CJK_GAP_RE.sub("", re.sub(r"\s+", " ", text))
+    if _T2S is not None:
+        text = _T2S(text)
+    return text
+
+
+def _entity_key(entity: str) -> str:
+    """百科缓存键：归一化实体名 + casefold（英文实体大小写不敏感）"""
+    return normalize_entity(entity).casefold()
+
+
+def search_cache_stats() -> dict:
+    """返回搜索缓存命中统计：{engine: {hit, miss, negative_hit, store, evict}}"""
+    return _SEARCH_CACHE.stats()
 
 
 # ==================== 底层 API 调用 ====================
 
 def _call_bocha(query: str, count: int = BOCHA_DEFAULT_COUNT) -> dict:
-    """博查搜索底层调用"""
+    """博查搜索（带缓存）"""
+    return _cached_search(
+        "bocha", _cache_key(query, count, "zh"),
+        lambda: _request_bocha(query, count),
+    )
+
+
+def _call_serper(query: str, num: int = SERPER_DEFAULT_NUM, gl: str = "us", hl: str = "en") -> dict:
+    """Serper (Google) 搜索（带缓存）"""
+    return _cached_search(
+        "serper", _cache_key(query, num, f"{gl}-{hl}"),
+        lambda: _request_serper(query, num, gl, hl),
+    )
+
+
+# 请求构造与响应解析与传输层无关，同步（requests）与异步（httpx）后端共用
+
+def _bocha_request(query: str, count: int) -> tuple:
+    """构造博查请求 → (url, headers, payload)"""
     headers = {
         "Authorization": f"Bearer {BOCHA_API_KEY}",
         "Content-Type": "application/json",
@@ -29,10 +135,23 @@ def _call_bocha(query: str, count: int = BOCHA_DEFAULT_COUNT) -> dict:
         "freshness": "noLimit",
         "count": count,
     }
-    resp = requests.post(BOCHA_BASE_URL, json=payload, headers=headers, timeout=30)
+    return BOCHA_BASE_URL, headers, payload
+
+
+def _request_bocha(query: str, count: int = BOCHA_DEFAULT_COUNT) -> dict:
+    """博查搜索底层调用"""
+    url, headers, payload = _bocha_request(query, count)
+    t0 = time.perf_counter()
+    try:
+        resp = http_post(url, json=payload, headers=headers, timeout=30, provider="bocha")
+    finally:
+        SEARCH_LATENCY.record("bocha", time.perf_counter() - t0)
     resp.raise_for_status()
-    data = resp.json()
+    return _parse_bocha(resp.json())
 
+
+def _parse_bocha(data: dict) -> dict:
+    """解析博查响应"""
     if data.get("code") != 200:
         return {"success": False, "results": [],
                 "error": f"Bocha API code {data.get('code')}: {data.get('msg')}"}
@@ -51,8 +170,8 @@ def _call_bocha(query: str, count: int = BOCHA_DEFAULT_COUNT) -> dict:
     return {"success": True, "results": results, "error": None}
 
 
-def _call_serper(query: str, num: int = SERPER_DEFAULT_NUM, gl: str = "us", hl: str = "en") -> dict:
-    """Serper (Google) 搜索底层调用"""
+def _serper_request(query: str, num: int, gl: str, hl: str) -> tuple:
+    """构造 Serper 请求 → (url, headers, payload)"""
     headers = {
         "X-API-KEY": SERPER_API_KEY,
         "Content-Type": "application/json",
@@ -63,10 +182,23 @@ def _call_serper(query: str, num: int = SERPER_DEFAULT_NUM, gl: str = "us", hl:
         "gl": gl,
         "hl": hl,
     }
-    resp = requests.post(SERPER_BASE_URL, json=payload, headers=headers, timeout=30)
+    return SERPER_BASE_URL, headers, payload
+
+
+def _request_serper(query: str, num: int = SERPER_DEFAULT_NUM, gl: str = "us", hl: str = "en") -> dict:
+    """Serper (Google) 搜索底层调用"""
+    url, headers, payload = _serper_request(query, num, gl, hl)
+    t0 = time.perf_counter()
+    try:
+        resp = http_post(url, json=payload, headers=headers, timeout=30, provider="serper")
+    finally:
+        SEARCH_LATENCY.record("serper", time.perf_counter() - t0)
     resp.raise_for_status()
-    data = resp.json()
+    return _parse_serper(resp.json())
+
 
+def _parse_serper(data: dict) -> dict:
+    """解析 Serper 响应"""
     results = []
     # organic 结果
     for item in data.get("organic", []):
@@ -95,19 +227,45 @@ def _call_serper(query: str, num: int = SERPER_DEFAULT_NUM, gl: str = "us", hl:
     return {"success": True, "results": results, "error": None}
 
 
+_LABEL_ENGINES = {"博查": "bocha", "Google": "serper"}
+
+
+def _to_batch(raw: dict, query: str, label: str) -> SearchBatch:
+    """解析后的搜索结果 → SearchBatch"""
+    if not raw["success"]:
+        return SearchBatch(label, query, error=f"[{label}搜索失败] 查询: {query}, 错误: {raw.get('error', '未知')}")
+    engine = _LABEL_ENGINES.get(label, label)
+    hits = [
+        SearchHit(
+            url=r["url"], title=r["title"],
+            snippet=r.get("summary") or r.get("snippet") or "",
+            site=r["site_name"], date=r.get("date", ""),
+            engine=engine, rank=i,
+        )
+        for i, r in enumerate(raw["results"], 1)
+    ]
+    return SearchBatch(label, query, hits)
+
+
 def _format_results(raw: dict, query: str, engine: str) -> str:
     """将搜索结果格式化为可读文本"""
-    if not raw["success"]:
-        return f"[{engine}搜索失败] 查询: {query}, 错误: {raw.get('error', '未知')}"
+    return _to_batch(raw, query, engine).render()
 
-    if not raw["results"]:
-        return f"[{engine}] 查询 '{query}' 无结果"
 
-    lines = [f"[{engine}] 查询: {query} — 共 {len(raw['results'])} 条结果\n"]
-    for i, r in enumerate(raw["results"], 1):
-        text = r.get("summary") or r.get("snippet") or ""
-        lines.append(f"{i}. {r['title']}\n   {text[:600]}\n   来源: {r['site_name']} | {r['url']}")
-    return "\n".join(lines)
+# ==================== 结构化搜索（研究子图直接使用，不经文本往返） ====================
+
+def bocha_hits(query: str) -> SearchBatch:
+    try:
+        return _to_batch(_call_bocha(query), query, "博查")
+    except Exception as e:
+        return SearchBatch("博查", query, error=f"[博查搜索异常] {query}: {e}")
+
+
+def serper_hits(query: str) -> SearchBatch:
+    try:
+        return _to_batch(_call_serper(query), query, "Google")
+    except Exception as e:
+        return SearchBatch("Google", query, error=f"[Google搜索异常] {query}: {e}")
 
 
 # ==================== LangChain Tools (function calling) ====================
@@ -116,40 +274,61 @@ def _format_results(raw: dict, query: str, engine: str) -> str:
 def bocha_search(query: str) -> str:
     """搜索中文互联网内容。适用于：中文问题、中国相关话题、中文百科/论坛/新闻。
     输入应为精准的中文关键词组合（如"火影忍者 第七班 成员"），而非完整自然语言句子。关键词之间用空格分隔。"""
-    try:
-        raw = _call_bocha(query)
-        return _format_results(raw, query, "博查")
-    except Exception as e:
-        return f"[博查搜索异常] {query}: {e}"
+    return bocha_hits(query).render()
 
 
 @tool
 def serper_search(query: str) -> str:
     """搜索国际互联网内容（Google）。适用于：英文关键词、国际学术/技术话题、维基百科、GitHub等。
     输入搜索查询字符串，返回搜索结果摘要。"""
-    try:
-        raw = _call_serper(query)
-        return _format_results(raw, query, "Google")
-    except Exception as e:
-        return f"[Google搜索异常] {query}: {e}"
+    return serper_hits(query).render()
 
 
 # ==================== 百度百科精确查询 ====================
 
-def _call_baike_list(lemma_title: str, top_k: int = 5) -> dict:
-    """百度百科词条列表查询 — 根据词条名获取义项列表"""
-    headers = {
+def _baike_headers() -> dict:
+    return {
         "Authorization": f"Bearer {BAIKE_API_KEY}",
         "Content-Type": "application/json",
     }
+
+
+def _baike_list_request(lemma_title: str, top_k: int) -> tuple:
+    """构造百科义项列表请求 → (url, headers, params)"""
     params = {
         "lemma_title": lemma_title,
         "top_k": top_k,
     }
-    resp = requests.get(BAIKE_LIST_URL, params=params, headers=headers, timeout=15)
+    return BAIKE_LIST_URL, _baike_headers(), params
+
+
+def _baike_content_request(search_key: str) -> tuple:
+    """构造百科词条内容请求 → (url, headers, params)"""
+    params = {
+        "search_type": "lemmaTitle",
+        "search_key": search_key,
+    }
+    return BAIKE_CONTENT_URL, _baike_headers(), params
+
+
+def _call_baike_list(lemma_title: str, top_k: int = 5) -> dict:
+    """百度百科词条列表查询 — 根据词条名获取义项列表（按实体缓存，含 "未找到" 负缓存）"""
+    return _cached_search(
+        "baike_list", f"{_entity_key(lemma_title)}|{top_k}",
+        lambda: _request_baike_list(lemma_title, top_k),
+        negative_ttl=BAIKE_NEGATIVE_TTL,
+    )
+
+
+def _request_baike_list(lemma_title: str, top_k: int) -> dict:
+    url, headers, params = _baike_list_request(lemma_title, top_k)
+    resp = http_get(url, params=params, headers=headers, timeout=15, provider="baike")
     resp.raise_for_status()
-    data = resp.json()
+    return _parse_baike_list(resp.json())
 
+
+def _parse_baike_list(data: dict) -> dict:
+    """解析百科义项列表响应"""
     if data.get("code") and str(data["code"]) != "0":
         return {"success": False, "results": [],
                 "error": f"Baike list API: {data.get('message', '未知错误')}"}
@@ -170,19 +349,23 @@ def _call_baike_list(lemma_title: str, top_k: int = 5) -> dict:
 
 
 def _call_baike_content(search_key: str) -> dict:
-    """百度百科词条内容查询 — 根据词条名获取完整内容"""
-    headers = {
-        "Authorization": f"Bearer {BAIKE_API_KEY}",
-        "Content-Type": "application/json",
-    }
-    params = {
-        "search_type": "lemmaTitle",
-        "search_key": search_key,
-    }
-    resp = requests.get(BAIKE_CONTENT_URL, params=params, headers=headers, timeout=15)
+    """百度百科词条内容查询 — 根据词条名获取完整内容（按实体缓存，含 "未找到" 负缓存）"""
+    return _cached_search(
+        "baike_content", _entity_key(search_key),
+        lambda: _request_baike_content(search_key),
+        field="content", negative_ttl=BAIKE_NEGATIVE_TTL,
+    )
+
+
+def _request_baike_content(search_key: str) -> dict:
+    url, headers, params = _baike_content_request(search_key)
+    resp = http_get(url, params=params, headers=headers, timeout=15, provider="baike")
     resp.raise_for_status()
-    data = resp.json()
+    return _parse_baike_content(resp.json())
 
+
+def _parse_baike_content(data: dict) -> dict:
+    """解析百科词条内容响应"""
     if data.get("code") and str(data["code"]) != "0":
         return {"success": False, "content": "",
                 "error": f"Baike content API: {data.get('message', '未知错误')}"}
@@ -223,156 +406,302 @@ def _format_baike_content(raw: dict) -> str:
 def baike_search(entity: str) -> str:
     """精确查询百度百科词条内容。适用于：查询特定实体（人名、作品名、公司名等）的详细信息。
     输入应为准确的实体名称（如"猫眼三姐妹"、"刘德华"），返回百科词条的完整内容。"""
-    try:
-        # 第一步：获取义项列表
-        list_raw = _call_baike_list(entity, top_k=3)
+    return baike_hits(entity).render()
 
-        lines = [f"[百度百科] 查询: {entity}\n"]
 
-        if list_raw["success"] and list_raw["results"]:
-            lines.append(f"找到 {len(list_raw['results'])} 个义项：")
-            for i, item in enumerate(list_raw["results"], 1):
-                lines.append(f"  {i}. {item['title']} — {item['desc']}")
-                lines.append(f"     URL: {item['url']}")
-            lines.append("")
-
-        # 第二步：获取词条内容
+def baike_hits(entity: str) -> SearchBatch:
+    """百科查询的结构化版本：义项作为命中（供深读/溯源），渲染文本即 baike_search 的输出"""
+    try:
+        entity = normalize_entity(entity) or entity
+        # 义项列表与词条内容互不依赖：列表放到后台线程，内容在当前线程，并发请求
+        list_future = scheduler.submit("fetch", _call_baike_list, entity, 3)
         content_raw = _call_baike_content(entity)
-        if content_raw["success"] and content_raw["content"]:
-            formatted = _format_baike_content(content_raw)
-            if formatted:
-                lines.append("--- 词条内容 ---")
-                lines.append(formatted)
-            else:
-                lines.append("（词条内容为空）")
-        elif not list_raw.get("results"):
-            lines.append(f"未找到 '{entity}' 的百科词条")
-
-        return "\n".join(lines)
+        list_raw = list_future.result()
     except Exception as e:
-        return f"[百度百科查询异常] {entity}: {e}"
+        return SearchBatch("百度百科", entity, error=f"[百度百科查询异常] {entity}: {e}")
+    hits = [
+        SearchHit(url=item["url"], title=item["title"], snippet=item["desc"],
+                  site="百度百科", date="", engine="baike", rank=i)
+        for i, item in enumerate(list_raw["results"], 1)
+    ]
+    return SearchBatch("百度百科", entity, hits, body=_render_baike(entity, list_raw, content_raw))
+
+
+def baike_search_many(entities: list) -> dict:
+    """并发查询多个实体（按归一化名去重，同名别名只查一次），返回 {实体: baike_search 输出}"""
+    groups = {}
+    for entity in entities:
+        groups.setdefault(_entity_key(entity), []).append(entity)
+    if not groups:
+        return {}
+    # search 类别：baike_search 内部的义项请求在更低层的 fetch 类别中运行，不会互相等待
+    futures = {
+        key: scheduler.submit("search", baike_search.invoke, {"entity": names[0]})
+        for key, names in groups.items()
+    }
+    results = {}
+    for key, names in groups.items():
+        for name in names:
+            results[name] = futures[key].result()
+    return results
+
+
+def _render_baike(entity: str, list_raw: dict, content_raw: dict) -> str:
+    """将义项列表 + 词条内容渲染为工具输出文本"""
+    lines = [f"[百度百科] 查询: {entity}\n"]
+
+    if list_raw["success"] and list_raw["results"]:
+        lines.append(f"找到 {len(list_raw['results'])} 个义项：")
+        for i, item in enumerate(list_raw["results"], 1):
+            lines.append(f"  {i}. {item['title']} — {item['desc']}")
+            lines.append(f"     URL: {item['url']}")
+        lines.append("")
+
+    if content_raw["success"] and content_raw["content"]:
+        formatted = _format_baike_content(content_raw)
+        if formatted:
+            lines.append("--- 词条内容 ---")
+            lines.append(formatted)
+        else:
+            lines.append("（词条内容为空）")
+    elif not list_raw.get("results"):
+        lines.append(f"未找到 '{entity}' 的百科词条")
+
+    return "\n".join(lines)
 
 
 # ==================== URL 内容读取 ====================
 
-# 百科类网站的正文容器模式（正则），按优先级排列
-_ARTICLE_BODY_PATTERNS = [
-    # 搜狗百科
-    r'<div[^>]*class="[^"]*lemma[_-]?content[^"]*"[^>]*>(.*?)</div>\s*(?=<div[^>]*class="[^"]*(?:sidebar|related|footer))',
-    # 百度百科
-    r'<div[^>]*class="[^"]*main-content[^"]*"[^>]*>(.*)',
-    r'<div[^>]*class="[^"]*lemmaWgt-lemmaSummary[^"]*"[^>]*>(.*)',
-    # 维基百科
-    r'<div[^>]*class="[^"]*mw-parser-output[^"]*"[^>]*>(.*)',
-    # 通用：<article> 标签
-    r'<article[^>]*>(.*?)</article>',
-    # 通用：id/class 含 content/article/main 的大 div
-    r'<div[^>]*(?:id|class)="[^"]*(?:article|content|main-body|entry)[^"]*"[^>]*>(.*)',
-]
-
-
-def _strip_html(raw_html: str) -> str:
-    """从 HTML 中提取纯文本 — 增强版，移除更多噪声元素"""
-    # 第1步：移除不可见内容标签（含内容一起删除）
-    noise_tags = r'script|style|noscript|nav|header|footer|aside|svg|template|iframe|form'
-    text = re.sub(
-        rf'<({noise_tags})[^>]*>.*?</\1>',
-        '', raw_html, flags=re.DOTALL | re.IGNORECASE,
-    )
-    # 第2步：移除常见噪声 div（class/id 含 sidebar, recommend, comment, ad, breadcrumb 等）
-    noise_div_pat = r'(?:sidebar|recommend|comment|ad-|advert|breadcrumb|related-|share-|copyright|disclaimer)'
-    text = re.sub(
-        rf'<div[^>]*(?:class|id)="[^"]*{noise_div_pat}[^"]*"[^>]*>.*?</div>',
-        '', text, flags=re.DOTALL | re.IGNORECASE,
-    )
-    # 第3步：移除所有 HTML 标签
-    text = re.sub(r'<[^>]+>', ' ', text)
-    # 第4步：解码 HTML 实体
-    text = html.unescape(text)
-    # 第5步：合并连续空白
-    text = re.sub(r'[ \t]+', ' ', text)
-    text = re.sub(r'\n\s*\n', '\n', text)
-    return text.strip()
-
-
-def _extract_article_body(raw_html: str) -> str:
-    """尝试提取页面主体内容区域（百科/wiki类页面优化）。
-    成功则返回主体区域 HTML，失败则返回空字符串（交由 _strip_html 处理全页）。"""
-    for pattern in _ARTICLE_BODY_PATTERNS:
-        m = re.search(pattern, raw_html, flags=re.DOTALL | re.IGNORECASE)
-        if m:
-            body = m.group(1) if m.lastindex else m.group(0)
-            # 确保提取到的内容有足够的实际文本（排除空 div）
-            plain_check = re.sub(r'<[^>]+>', '', body).strip()
-            if len(plain_check) > 200:
-                return body
+_FETCH_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
+}
+
+
+def _html_to_text(raw: str) -> str:
+    """页面 HTML → 纯文本：单遍提取，正文区域优先，失败则取全页（见 tools/html_extract.py）"""
+    return extract_text(raw)
+
+
+def _render_url_content(url: str, text: str, max_chars: int) -> str:
+    if len(text) > max_chars:
+        text = text[:max_chars] + "\n...[内容截断]"
+    return f"[URL内容] {url}\n{text}" if text else f"[URL内容] {url}: 页面内容为空"
+
+
+_HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain", "text/xml", "application/xml")
+_META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([a-zA-Z0-9_-]+)""", re.IGNORECASE)
+_HEADER_CHARSET_RE = re.compile(r"charset\s*=\s*[\"']?([a-zA-Z0-9_-]+)", re.IGNORECASE)
+
+
+def _reject_reason(headers) -> str:
+    """根据响应头提前拒绝非 HTML 或超大响应，返回拒绝原因；可读取时返回空串"""
+    content_type = (headers.get("Content-Type") or "").split(";")[0].strip().lower()
+    if content_type and not content_type.startswith(_HTML_CONTENT_TYPES):
+        return f"非HTML内容 ({content_type})"
+    length = headers.get("Content-Length")
+    if length and length.isdigit() and int(length) > FETCH_MAX_BYTES:
+        return f"响应过大 ({int(length) // 1024} KB > {FETCH_MAX_BYTES // 1024} KB)"
     return ""
 
 
-def fetch_url_content(url: str, max_chars: int = 15000) -> str:
-    """读取指定 URL 的页面内容，返回纯文本（截断到 max_chars）。
-    对百科/wiki 类页面会先尝试提取正文区域，减少导航噪声。"""
-    try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-            "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
-        }
-        resp = requests.get(url, headers=headers, timeout=15, allow_redirects=True)
-        resp.encoding = resp.apparent_encoding or "utf-8"
-        raw = resp.text
-
-        # 优先尝试提取主体内容区域
-        article_html = _extract_article_body(raw)
-        if article_html:
-            text = _strip_html(article_html)
+def _sniff_encoding(content_type: str, prefix: bytes) -> str:
+    """字符集：响应头 charset → <meta charset> → 对前缀做检测 → utf-8"""
+    m = _HEADER_CHARSET_RE.search(content_type or "")
+    if not m:
+        m = _META_CHARSET_RE.search(prefix)
+    if m:
+        name = m.group(1)
+        name = name.decode("ascii", "ignore") if isinstance(name, bytes) else name
+        try:
+            return codecs.lookup(name).name
+        except LookupError:
+            pass
+    best = from_bytes(prefix).best()
+    return best.encoding if best else "utf-8"
+
+
+class _StreamingPage:
+    """流式页面解码 + 增量提取：按块 feed 字节，字节数超过 FETCH_MAX_BYTES
+    或已收集到足够正文（max_chars × FETCH_TEXT_MARGIN）时 feed 返回 True，调用方停止读取。"""
+
+    def __init__(self, content_type: str, max_chars: int):
+        self._content_type = content_type
+        self._target_chars = int(max_chars * FETCH_TEXT_MARGIN)
+        self._prefix = b""
+        self._decoder = None
+        self._bytes = 0
+        self._extractor = HtmlTextExtractor()
+
+    def feed(self, chunk: bytes) -> bool:
+        if not chunk:
+            return False
+        self._bytes += len(chunk)
+        if self._decoder is None:
+            # 先攒够嗅探前缀再确定字符集
+            self._prefix += chunk
+            if len(self._prefix) < FETCH_SNIFF_BYTES:
+                return False
+            self._start_decoding()
         else:
-            text = _strip_html(raw)
+            self._extractor.feed(self._decoder.decode(chunk))
+        return self._bytes >= FETCH_MAX_BYTES or self._extractor.collected_chars() >= self._target_chars
 
-        if len(text) > max_chars:
-            text = text[:max_chars] + "\n...[内容截断]"
+    @property
+    def bytes_read(self) -> int:
+        return self._bytes
 
-        return f"[URL内容] {url}\n{text}" if text else f"[URL内容] {url}: 页面内容为空"
-    except Exception as e:
-        return f"[URL读取失败] {url}: {e}"
+    def _start_decoding(self) -> None:
+        encoding = _sniff_encoding(self._content_type, self._prefix[:FETCH_SNIFF_BYTES])
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self._extractor.feed(self._decoder.decode(self._prefix))
+        self._prefix = b""
+
+    def text(self) -> str:
+        if self._decoder is None:
+            self._start_decoding()
+        self._extractor.feed(self._decoder.decode(b"", final=True))
+        self._extractor.close()
+        return self._extractor.text()
+
+
+def fetch_url_content(url: str, max_chars: int = 15000) -> str:
+    """读取指定 URL 的页面内容，返回纯文本（截断到 max_chars）。
+    流式下载：非 HTML / 超大响应按响应头提前拒绝；边下载边提取，正文足够或达到字节上限即停止。
+    对百科/wiki 类页面优先提取正文区域，减少导航噪声。"""
+    with trace.span("fetch", urlsplit(url).hostname or "", url=url) as ev:
+        try:
+            with http_get(url, headers=_FETCH_HEADERS, timeout=15, allow_redirects=True, stream=True,
+                          provider=provider_for_url(url)) as resp:
+                ev["status"] = resp.status_code
+                if resp.status_code == 429:
+                    ev["error"] = "HTTP 429 限流"
+                    return f"[URL读取失败] {url}: HTTP 429 限流"
+                reason = _reject_reason(resp.headers)
+                if reason:
+                    ev["error"] = reason
+                    return f"[URL读取失败] {url}: {reason}"
+                page = _StreamingPage(resp.headers.get("Content-Type", ""), max_chars)
+                for chunk in resp.iter_content(chunk_size=FETCH_CHUNK_BYTES):
+                    if page.feed(chunk):
+                        break
+            ev["bytes"] = page.bytes_read
+            return _render_url_content(url, page.text(), max_chars)
+        except Exception as e:
+            ev["error"] = str(e)[:300]
+            return f"[URL读取失败] {url}: {e}"
 
 
 # ==================== 工具列表（供 LLM bind_tools 使用） ====================
 
 ALL_SEARCH_TOOLS = [bocha_search, serper_search, baike_search]
 
+# 工具名 → 结构化搜索函数（参数与工具相同），LLM 选择工具后直接取结构化结果
+SEARCH_HITS_BY_TOOL = {
+    "bocha_search": bocha_hits,
+    "serper_search": serper_hits,
+    "baike_search": baike_hits,
+}
+
 
 def _has_chinese(text: str) -> bool:
     """判断文本是否包含中文字符"""
     return bool(re.search(r'[\u4e00-\u9fff]', text))
 
 
-def auto_search(query: str) -> str:
-    """根据查询语言自动选择搜索引擎，返回格式化结果文本。
+def _auto_search_plan(query: str) -> list:
+    """auto_search 的引擎顺序 → [(engine, 显示名, 额外参数), ...]（首个为主引擎）。
     中文查询 → 博查优先; 英文查询 → Serper 优先。"""
     if _has_chinese(query):
+        return [("bocha", "博查", {}), ("serper", "Google", {"hl": "zh-CN", "gl": "cn"})]
+    return [("serper", "Google", {}), ("bocha", "博查", {})]
+
+
+_ENGINE_CALLS = {
+    "bocha": lambda query, **kw: _call_bocha(query, **kw),
+    "serper": lambda query, **kw: _call_serper(query, **kw),
+}
+
+
+def _hedge_delay(primary: str) -> float:
+    if AUTO_SEARCH_HEDGE_DELAY is not None:
+        return AUTO_SEARCH_HEDGE_DELAY
+    return SEARCH_LATENCY.hedge_delay(primary)
+
+
+def _merge_formatted(parts: list, query: str) -> str:
+    """合并多个引擎的格式化结果；全部失败时返回最后一条错误"""
+    ok = [text for raw, text in parts if raw is not None and raw["success"] and raw["results"]]
+    if ok:
+        return "\n\n".join(ok)
+    return parts[-1][1] if parts else f"[搜索全部失败] {query}"
+
+
+def auto_search(query: str) -> str:
+    """根据查询语言自动选择搜索引擎，返回格式化结果文本。
+
+    AUTO_SEARCH_HEDGE_MODE：
+    - off：主引擎失败或无结果后才请求备用引擎（串行降级）
+    - hedge：主引擎在对冲延迟内未返回非空结果即并发请求备用引擎，取先到的非空结果
+    - merge：同上并发，但等待两个引擎并合并非空结果
+    对冲延迟默认取主引擎观测 p95（见 tools/latency.py）。
+    """
+    if AUTO_SEARCH_HEDGE_MODE == "off":
+        return _auto_search_sequential(query)
+
+    plan = _auto_search_plan(query)
+    merge = AUTO_SEARCH_HEDGE_MODE == "merge"
+
+    def run(engine, label, kw):
         try:
-            raw = _call_bocha(query)
-            if raw["success"] and raw["results"]:
-                return _format_results(raw, query, "博查")
-        except Exception:
-            pass
-        # 博查失败则降级到 Serper
-        try:
-            raw = _call_serper(query, hl="zh-CN", gl="cn")
-            return _format_results(raw, query, "Google")
-        except Exception as e:
-            return f"[搜索全部失败] {query}: {e}"
-    else:
-        try:
-            raw = _call_serper(query)
-            if raw["success"] and raw["results"]:
-                return _format_results(raw, query, "Google")
-        except Exception:
-            pass
-        # Serper 失败则降级到博查
-        try:
-            raw = _call_bocha(query)
-            return _format_results(raw, query, "博查")
+            raw = _ENGINE_CALLS[engine](query, **kw)
+            return raw, _format_results(raw, query, label)
         except Exception as e:
-            return f"[搜索全部失败] {query}: {e}"
+            # 失败结果只会在两个引擎都不可用时作为最终输出
+            return None, f"[搜索全部失败] {query}: {e}"
+
+    def usable(out):
+        raw = out[0]
+        return raw is not None and raw["success"] and bool(raw["results"])
+
+    futures = [scheduler.submit("fetch", run, *plan[0])]
+    done, _ = wait(futures, timeout=_hedge_delay(plan[0][0]))
+    if done and usable(futures[0].result()) and not merge:
+        return futures[0].result()[1]
+    futures.append(scheduler.submit("fetch", run, *plan[1]))
+
+    finished = []
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for fut in done:
+            finished.append(fut)
+            if not merge and usable(fut.result()):
+                # 取先到的非空结果，放弃另一个（仍在运行的请求结果会写入缓存供后续复用）
+                for other in pending:
+                    other.cancel()
+                return fut.result()[1]
+
+    # 按计划顺序（主 → 备）整理结果
+    ordered = [fut.result() for fut in futures if fut in finished]
+    if merge:
+        return _merge_formatted(ordered, query)
+    return ordered[-1][1]
+
+
+def _auto_search_sequential(query: str) -> str:
+    """串行降级：主引擎失败或无结果时降级到备用引擎。"""
+    (primary, primary_label, primary_kw), (fallback, fallback_label, fallback_kw) = _auto_search_plan(query)
+    try:
+        raw = _ENGINE_CALLS[primary](query, **primary_kw)
+        if raw["success"] and raw["results"]:
+            return _format_results(raw, query, primary_label)
+    except Exception:
+        pass
+    # 主引擎失败则降级到备用引擎
+    try:
+        raw = _ENGINE_CALLS[fallback](query, **fallback_kw)
+        return _format_results(raw, query, fallback_label)
+    except Exception as e:
+        return f"[搜索全部失败] {query}: {e}"
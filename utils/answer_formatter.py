@@ -1,12 +1,18 @@
 # -*- coding: utf-8 -*-
 """
-答案后处理工具 — 使用 LLM 进行格式归一化
-避免死板的正则，让大模型来理解格式要求
+答案后处理工具 — 规则快速路径 + LLM 格式归一化
+- rule_normalize：识别题目中的格式约束（英文名 / 数值 / 多实体列表 / 指定分隔符），
+  对已经是规整短答案的情况在本地完成 NORMALIZE_PROMPT 的通用规则；拿不准时返回 None
+- 规则无法确定时才交给大模型理解格式要求（format_answer 节点的融合 prompt / normalize_answer）；
+  小数、数词、带单位的数值一律交给大模型
+- python -m utils.answer_formatter：快速路径回归检查
 """
-from langchain_openai import ChatOpenAI
+import re
+from dataclasses import dataclass
+
 from langchain_core.messages import HumanMessage
 
-from config.settings import LLM_API_KEY, LLM_BASE_URL, LLM_MODEL_NAME
+from agents.llm import LLMUnavailable, get_llm, invoke_llm
 
 
 NORMALIZE_PROMPT = """你是一个答案标准化与格式对齐工具。你的目标是：优先遵循题目中明确给出的输出格式；如果题目没有明确格式要求，再按通用标准化规则处理。最终只输出处理后的答案本身，不要输出任何分析过程。
@@ -40,9 +46,164 @@ NORMALIZE_PROMPT = """你是一个答案标准化与格式对齐工具。你的
 """
 
 
+# ==================== 规则快速路径 ====================
+
+@dataclass(slots=True, frozen=True)
+class FormatSpec:
+    """从题目中识别出的格式约束"""
+    english: bool        # 明确要求英文作答
+    numeric: bool        # 数值题
+    multiple: bool       # 期望多个实体
+    proper_noun: bool    # 问的是人名 / 地名 / 机构名等专有名词（保留大小写）
+    separator: str       # 多实体分隔符（题目指定或默认 ", "）
+    explicit: bool       # 存在规则处理不了的强格式约束（模板、小数位、单位、大小写……）
+
+
+# 规则处理不了、必须交给 LLM 的格式描述
+_EXPLICIT_RE = re.compile(
+    r"格式|形如|写成|写作|模板|例如|示例|保留.{0,4}位|小数|以.{0,10}(?:开头|结尾)|JSON|json|表格"
+    r"|大写|小写|首字母|全称|缩写|简称|单位|引号|括号|书名号|顺序|依次|排列|排序"
+)
+_SEPARATOR_RE = re.compile(
+    r"用(英文逗号|中文逗号|逗号|顿号|分号|空格|斜杠|[、,，;；/])(?:隔开|分隔|分开|连接)"
+)
+_SEPARATORS = {
+    "英文逗号": ", ", "逗号": ", ", ",": ", ",
+    "中文逗号": "，", "，": "，",
+    "顿号": "、", "、": "、",
+    "分号": "; ", ";": "; ", "；": "；",
+    "空格": " ", "斜杠": "/", "/": "/",
+}
+_ENGLISH_RE = re.compile(r"英文|英语|English|english")
+_NUMERIC_RE = re.compile(
+    r"多少|几[个位次年名届种人项本部座条家天岁颗次]|哪一?年|何年|数量|数目|年份|数字|数值"
+    r"|多[长高远重大久深宽]"
+    r"|\bhow (?:many|much|long|tall|far|high|old|big|heavy|deep|wide)\b|\b(?:what|which) year\b|\bnumber of\b",
+    re.IGNORECASE,
+)
+_MULTIPLE_RE = re.compile(r"哪些|哪几|分别|列出|列举|都有|各是|各为")
+_PROPER_RE = re.compile(r"谁|人名|姓名|名字|叫什么|地名|城市|国家|地区|公司|机构|组织|品牌|球队|乐队|作品|书名|电影")
+
+_CJK_RE = re.compile(r"[\u4e00-\u9fff]")
+_ANSWER_PREFIX_RE = re.compile(r"^(?:最终答案|答案|Answer|answer)\s*(?:是|为|[:：])\s*")
+_WRAPPERS = {"“": "”", "‘": "’", '"': '"', "'": "'", "「": "」", "『": "』", "《": "》", "【": "】", "[": "]"}
+_TRAILING_PUNCT = "。．.！!；;，,"
+# 推理 / 不确定表述，或包含需要语义取舍的括号注释
+_UNSURE_RE = re.compile(r"[（()）？?！!：:。]|因为|所以|可能|或者|也许|大约|约为|左右|以上|以下|不确定|无法|未知")
+_LIST_SPLIT_RE = re.compile(r"\s*[、，,；;]\s*")
+# 小数、数词、带单位的数值：不论题目是否被识别为数值题，都交给 LLM（取整 / 换算 / 去单位需要按题意判断）
+_DECIMAL_RE = re.compile(r"\d[.．]\d")
+_NUMBER_WORD_RE = re.compile(
+    r"\b(?:zero|one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve|thirteen|fourteen|fifteen"
+    r"|sixteen|seventeen|eighteen|nineteen|twenty|thirty|forty|fifty|sixty|seventy|eighty|ninety"
+    r"|hundred|thousand|million|billion|dozen)\b"
+    r"|^[零〇一二两三四五六七八九十百千万亿]+[个位次年名届种人项本部座条家天岁颗倍]?$",
+    re.IGNORECASE,
+)
+_NUMBER_UNIT_RE = re.compile(
+    r"\d\s*(?:[%‰°万亿千百米克吨里斤岁年月日天时分秒倍个位次名届种人项本部座条家颗元]"
+    r"|(?:km|cm|mm|kg|mg|m|g|t|lbs?|mi|miles?|ft|feet|inch(?:es)?|meters?|metres?|kilometers?|kilometres?"
+    r"|kilograms?|grams?|tons?|years?|days?|hours?|minutes?|seconds?)\b)",
+    re.IGNORECASE,
+)
+_NUMBER_RE = re.compile(r"(-?\d{1,3}(?:,\d{3})+|-?\d+)(\.\d+)?\s*([^\d\s]{0,4})")
+_MAX_FAST_ANSWER_LEN = 60
+
+
+def detect_format_spec(question: str) -> FormatSpec:
+    """识别题目中的显式格式约束"""
+    question = question or ""
+    separator = ", "
+    m = _SEPARATOR_RE.search(question)
+    if m:
+        separator = _SEPARATORS[m.group(1)]
+        # 分隔符描述里的"英文逗号"不代表要求英文作答
+        question = question[:m.start()] + question[m.end():]
+    return FormatSpec(
+        english=bool(_ENGLISH_RE.search(question)),
+        numeric=bool(_NUMERIC_RE.search(question)),
+        multiple=bool(m or _MULTIPLE_RE.search(question)),
+        proper_noun=bool(_PROPER_RE.search(question)),
+        separator=separator,
+        explicit=bool(_EXPLICIT_RE.search(question)),
+    )
+
+
+def _strip_decoration(text: str) -> str:
+    """去除 Markdown 标记、"答案："前缀、整体包裹的引号/书名号与句末标点"""
+    text = re.sub(r"\*\*|__|`", "", text).strip().lstrip("#").strip()
+    text = _ANSWER_PREFIX_RE.sub("", text)
+    while len(text) >= 2 and _WRAPPERS.get(text[0]) == text[-1]:
+        text = text[1:-1].strip()
+    return text.rstrip(_TRAILING_PUNCT).strip()
+
+
+def _normalize_number(text: str):
+    """纯整数（可含千分位逗号）直接规整；带小数或单位 / 量级后缀的数值交给 LLM 按题意处理"""
+    m = _NUMBER_RE.fullmatch(text)
+    if not m or m.group(2) or m.group(3):
+        return None
+    return str(int(m.group(1).replace(",", "")))
+
+
+def _normalize_entity(text: str, spec: FormatSpec, chinese_question: bool):
+    if not text:
+        return None
+    has_cjk = bool(_CJK_RE.search(text))
+    has_latin = bool(re.search(r"[A-Za-z]", text))
+    if spec.english and has_cjk:
+        return None
+    if not has_latin:
+        return text
+    # 中文题目给出英文答案：是否需要译成中文要靠语义判断
+    if chinese_question and not spec.english and not has_cjk:
+        return None
+    if text == text.lower():
+        return text
+    # 全大写缩写原样保留
+    if text.isupper() and " " not in text and len(text) <= 8:
+        return text
+    # 专有名词（每个词首字母大写）保留大小写；其余大小写取舍交给 LLM
+    words = re.findall(r"[A-Za-z][A-Za-z'.-]*", text)
+    if spec.proper_noun and words and all(w[0].isupper() for w in words):
+        return text
+    return None
+
+
+def rule_normalize(raw_answer: str, question: str = ""):
+    """规则归一化：答案已是规整的短答案、题目格式约束规则可处理时返回归一化结果，
+    否则返回 None（交给 LLM）。"""
+    if not raw_answer or not raw_answer.strip():
+        return None
+    spec = detect_format_spec(question)
+    if spec.explicit:
+        return None
+    text = _strip_decoration(raw_answer.strip())
+    if not text or "\n" in text or len(text) > _MAX_FAST_ANSWER_LEN or _UNSURE_RE.search(text):
+        return None
+    if _DECIMAL_RE.search(text) or _NUMBER_WORD_RE.search(text) or _NUMBER_UNIT_RE.search(text):
+        return None
+
+    if spec.numeric and not spec.multiple:
+        return _normalize_number(text)
+
+    parts = _LIST_SPLIT_RE.split(text)
+    if len(parts) > 1 and not spec.multiple:
+        return None
+    chinese_question = bool(_CJK_RE.search(question or ""))
+    normalized = []
+    for part in parts:
+        part = _strip_decoration(part)
+        value = _normalize_number(part) if spec.numeric else _normalize_entity(part, spec, chinese_question)
+        if value is None:
+            return None
+        normalized.append(value)
+    return spec.separator.join(normalized)
+
+
 def normalize_answer(raw_answer: str, question: str = "") -> str:
     """
-    使用 LLM 对答案进行格式归一化。
+    对答案进行格式归一化：规则可确定时直接返回，否则调用 LLM。
     
     Args:
         raw_answer: 原始答案文本
@@ -54,12 +215,11 @@ def normalize_answer(raw_answer: str, question: str = "") -> str:
     if not raw_answer or not raw_answer.strip():
         return ""
 
-    llm = ChatOpenAI(
-        model=LLM_MODEL_NAME,
-        api_key=LLM_API_KEY,
-        base_url=LLM_BASE_URL,
-        temperature=0.0,
-    )
+    fast = rule_normalize(raw_answer, question)
+    if fast is not None:
+        return fast
+
+    llm = get_llm(temperature=0.0, node="normalize_answer")
 
     prompt = NORMALIZE_PROMPT.format(
         raw_answer=raw_answer,
@@ -67,9 +227,32 @@ def normalize_answer(raw_answer: str, question: str = "") -> str:
     )
 
     try:
-        response = llm.invoke([HumanMessage(content=prompt)])
-        result = response.content.strip()
-        return result
-    except Exception as e:
+        return invoke_llm(llm, [HumanMessage(content=prompt)], node="normalize_answer").content.strip()
+    except LLMUnavailable as e:
         print(f"[Normalize] LLM 归一化失败: {e}，使用基础处理")
         return raw_answer.strip()
+
+
+# (原始答案, 题目, 期望的规则结果；None 表示交给 LLM)
+_SELF_CHECK_CASES = [
+    ("two", "How many moons does Mars have?", None),
+    ("3.7", "How many kilometers long is the bridge?", None),
+    ("3.7", "What is the length in km?", None),
+    ("12.5", "这座桥有多长？", None),
+    ("0.5", "多少米", None),
+    ("12 km", "多少", None),
+    ("12万", "多少", None),
+    ("三", "有几个卫星？", None),
+    ("1990年", "哪一年成立？", None),
+    ("1,234", "多少人", "1234"),
+    ("2", "How many moons does Mars have?", "2"),
+    ("42", "哪一年", "42"),
+    ("**radio**", "可以通过哪种设备探测？请回答设备英文名。", "radio"),
+]
+
+
+if __name__ == "__main__":
+    for raw, question, expected in _SELF_CHECK_CASES:
+        got = rule_normalize(raw, question)
+        assert got == expected, f"rule_normalize({raw!r}, {question!r}) = {got!r}，期望 {expected!r}"
+    print(f"[Normalize] 规则快速路径检查通过（{len(_SELF_CHECK_CASES)} 例）")
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+进程级任务调度器 — 取代各处按调用创建 / 销毁的嵌套线程池
+- 按资源类别划分固定上限的工作线程（SCHEDULER_WORKERS）：
+  branch（研究分支）/ llm（独立 LLM 调用，如 QuickCheck）/ search（搜索工具调用）/ fetch（单个 HTTP 请求：深读、百科义项、对冲）
+- 每个类别内按优先级（高 / 中 / 低）出队，同优先级先进先出；子任务默认继承提交者的优先级
+- 类别按层级排列（branch → llm → search → fetch），任务只能等待更低层的任务；
+  在工作线程内向同层或更高层提交时直接在当前线程执行，避免线程被占满后互相等待
+- submit 复制当前上下文（trace 归属、优先级），返回标准 Future，可 cancel 尚未开始的任务
+- stats()：各类别的工作线程数、运行中 / 排队数、最大排队深度、排队等待时间
+- python -m utils.scheduler：突发提交回归检查（已有空闲线程时同时提交多个任务，应按需启动新线程并发执行）
+"""
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+
+from config.settings import SCHEDULER_WORKERS
+from utils import trace
+
+PRIORITIES = ("高", "中", "低")
+_RANK = {p: i for i, p in enumerate(PRIORITIES)}
+_LAYERS = ("branch", "llm", "search", "fetch")
+
+_PRIORITY = contextvars.ContextVar("sched_priority", default="中")
+_WORKER = threading.local()         # 当前工作线程所属类别
+
+
+class _Lane:
+    """一个资源类别：优先级队列 + 按需启动、常驻的工作线程"""
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self._heap = []
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._workers = 0
+        self._idle = 0
+        self._stats = {"submitted": 0, "completed": 0, "inline": 0, "running": 0,
+                       "max_queued": 0, "wait_total_s": 0.0, "max_wait_s": 0.0}
+
+    def put(self, priority: str, item) -> None:
+        with self._cond:
+            heapq.heappush(self._heap, (_RANK.get(priority, 1), next(self._seq), time.monotonic(), item))
+            self._stats["submitted"] += 1
+            self._stats["max_queued"] = max(self._stats["max_queued"], len(self._heap))
+            # 已被 notify 但尚未醒来的线程仍计入 _idle：排队任务多于空闲线程时才说明需要新线程
+            if len(self._heap) > self._idle and self._workers < self.max_workers:
+                self._workers += 1
+                threading.Thread(target=self._work, name=f"{self.name}_{self._workers}", daemon=True).start()
+            else:
+                self._cond.notify()
+
+    def _work(self) -> None:
+        _WORKER.layer = self.name
+        while True:
+            with self._cond:
+                self._idle += 1
+                while not self._heap:
+                    self._cond.wait()
+                self._idle -= 1
+                _, _, queued_at, (fut, ctx, fn, args, kwargs) = heapq.heappop(self._heap)
+                if not fut.set_running_or_notify_cancel():
+                    continue            # 排队期间已被取消
+                waited = time.monotonic() - queued_at
+                self._stats["running"] += 1
+                self._stats["wait_total_s"] += waited
+                self._stats["max_wait_s"] = max(self._stats["max_wait_s"], waited)
+            try:
+                ctx.run(trace.record, "queue", self.name, wait=round(waited, 4), priority=ctx.run(_PRIORITY.get))
+                fut.set_result(ctx.run(fn, *args, **kwargs))
+            except BaseException as e:
+                fut.set_exception(e)
+            finally:
+                with self._cond:
+                    self._stats["running"] -= 1
+                    self._stats["completed"] += 1
+
+    def note_inline(self) -> None:
+        with self._cond:
+            self._stats["inline"] += 1
+
+    def stats(self) -> dict:
+        with self._cond:
+            s = dict(self._stats, workers=self._workers, max_workers=self.max_workers, queued=len(self._heap))
+        s["wait_total_s"] = round(s["wait_total_s"], 3)
+        s["max_wait_s"] = round(s["max_wait_s"], 3)
+        return s
+
+
+_LANES = {name: _Lane(name, SCHEDULER_WORKERS.get(name, 4)) for name in _LAYERS}
+
+
+def submit(resource: str, fn, *args, priority: str = None, **kwargs) -> Future:
+    """向资源类别 resource 提交任务；priority 缺省时继承当前上下文的优先级"""
+    lane = _LANES[resource]
+    ctx = contextvars.copy_context()
+    if priority in _RANK:
+        ctx.run(_PRIORITY.set, priority)
+    fut = Future()
+    current = getattr(_WORKER, "layer", None)
+    if current is not None and _LAYERS.index(resource) <= _LAYERS.index(current):
+        # 同层 / 更高层任务不能在本类别排队等待（可能占满线程后互相等待），就地执行
+        lane.note_inline()
+        fut.set_running_or_notify_cancel()
+        try:
+            fut.set_result(ctx.run(fn, *args, **kwargs))
+        except BaseException as e:
+            fut.set_exception(e)
+        return fut
+    lane.put(ctx.run(_PRIORITY.get), (fut, ctx, fn, args, kwargs))
+    return fut
+
+
+def stats() -> dict:
+    """{类别: {workers, max_workers, running, queued, max_queued, submitted, completed, inline, wait_total_s, max_wait_s}}"""
+    return {name: lane.stats() for name, lane in _LANES.items()}
+
+
+def _burst_check(n: int = 4, seconds: float = 0.2) -> float:
+    """回归检查：一个已预热的空闲线程 + 同时提交 n 个任务，应并发执行（耗时约 seconds 而非 n × seconds）"""
+    lane = _Lane("burst_check", n)
+    warm = Future()
+    lane.put("中", (warm, contextvars.copy_context(), time.sleep, (0,), {}))
+    warm.result()
+    time.sleep(0.05)                    # 等预热线程回到空闲
+    futs = [Future() for _ in range(n)]
+    start = time.monotonic()
+    for fut in futs:
+        lane.put("中", (fut, contextvars.copy_context(), time.sleep, (seconds,), {}))
+    for fut in futs:
+        fut.result()
+    return time.monotonic() - start
+
+
+if __name__ == "__main__":
+    elapsed = _burst_check()
+    print(f"[Scheduler] 突发提交 4 个 0.2s 任务耗时 {elapsed:.2f}s")
+    assert elapsed < 0.4, "突发任务没有并发执行（新线程未启动）"
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+启动耗时统计 — 控制冷启动时间（批处理 / 短生命周期 worker）
+- timed(name)：记录一段启动步骤（模块导入、图编译）的耗时
+- lazy_import(module)：首次使用时才导入重依赖（openai / langchain_openai），并记录导入耗时
+- startup_report()：按步骤列出耗时，总耗时超过 STARTUP_BUDGET 时给出提示
+"""
+import importlib
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from config.settings import STARTUP_BUDGET
+
+_TIMINGS = {}
+_LOCK = threading.Lock()
+
+
+@contextmanager
+def timed(name: str):
+    """记录一段启动步骤的耗时（同名步骤累加）"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with _LOCK:
+            _TIMINGS[name] = _TIMINGS.get(name, 0.0) + elapsed
+
+
+def lazy_import(module: str):
+    """导入并返回模块；首次导入计入启动耗时（import <module>）"""
+    mod = sys.modules.get(module)
+    if mod is not None:
+        return mod
+    with timed(f"import {module}"):
+        return importlib.import_module(module)
+
+
+def startup_timings() -> dict:
+    """{步骤: 秒}，按记录顺序"""
+    with _LOCK:
+        return dict(_TIMINGS)
+
+
+def startup_report(budget: float = STARTUP_BUDGET) -> str:
+    timings = startup_timings()
+    total = sum(timings.values())
+    lines = [f"[Startup] 启动耗时 {total:.2f}s（预算 {budget:.1f}s）"
+             + ("" if total <= budget else " ⚠ 超出预算")]
+    for name, seconds in sorted(timings.items(), key=lambda kv: kv[1], reverse=True):
+        lines.append(f"  {name}: {seconds * 1000:.0f} ms")
+    return "\n".join(lines)
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Prompt token 预算 — 取代散落各处的字符截断（[:12000] / [:6000] ...）
+- estimate_tokens：优先用 tiktoken（可选依赖，编码文件不可用时自动降级），否则按字符类别估算
+- 每个 prompt 模板的各段预算集中配置在 config/settings.PROMPT_TOKEN_BUDGETS
+- 装箱策略：证据按可靠性 + 与问题的相关度挑选，搜索命中按相关度 + 名次挑选，
+  长文本（百科 / 深读页面）按段落边界截断并在多个文本间均分预算；
+  内容本身不超预算时原样输出
+"""
+import re
+import threading
+from typing import Callable, List, Sequence, Tuple
+
+from config.settings import TOKEN_ENCODING, PROMPT_TOKEN_BUDGETS
+
+_CJK_RE = re.compile(r"[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]")
+_RELIABILITY_SCORE = {"high": 2.0, "medium": 1.0, "low": 0.0}
+_EMPTY_EVIDENCE_MARK = "未获得有效信息"
+
+_ENCODER = None
+_ENCODER_LOCK = threading.Lock()
+_ENCODER_FAILED = False
+
+
+def _encoder():
+    """懒加载 tiktoken 编码；未安装或编码文件下载失败时返回 None（只尝试一次）"""
+    global _ENCODER, _ENCODER_FAILED
+    if _ENCODER is not None or _ENCODER_FAILED or not TOKEN_ENCODING:
+        return _ENCODER
+    with _ENCODER_LOCK:
+        if _ENCODER is None and not _ENCODER_FAILED:
+            try:
+                import tiktoken
+                _ENCODER = tiktoken.get_encoding(TOKEN_ENCODING)
+            except Exception as e:
+                _ENCODER_FAILED = True
+                print(f"[TokenBudget] tiktoken 不可用（{type(e).__name__}），改用字符估算")
+    return _ENCODER
+
+
+def estimate_tokens(text: str) -> int:
+    """估算 token 数：中日韩字符约 1 token/字，其余约 4 字符/token"""
+    if not text:
+        return 0
+    enc = _encoder()
+    if enc is not None:
+        return len(enc.encode(text, disallowed_special=()))
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def budget_for(template: str, section: str) -> int:
+    """PROMPT_TOKEN_BUDGETS[模板名][段名]"""
+    return PROMPT_TOKEN_BUDGETS[template][section]
+
+
+# ==================== 截断 ====================
+
+def truncate_to_tokens(text: str, budget: int, keep: str = "head") -> str:
+    """截断到 budget 以内，尽量在换行处断开。
+    keep="head" 保留开头；keep="ends" 保留首尾、省略中间（推理链的结论通常在末尾）。"""
+    if not text or budget <= 0:
+        return ""
+    total = estimate_tokens(text)
+    if total <= budget:
+        return text
+    cut = _head_cut(text, budget // 2 if keep == "ends" else budget, total)
+    if keep == "ends":
+        head = text[:cut].rstrip()
+        tail = _truncate_tail(text[cut:], budget - estimate_tokens(head) - 8)
+        return f"{head}\n……（中间省略）……\n{tail}"
+    return text[:cut].rstrip() + "……"
+
+
+def _head_cut(text: str, budget: int, total: int) -> int:
+    """开头部分不超过 budget 的切分位置：按字符比例缩放后逐步收缩（避免逐字符编码），再对齐到换行"""
+    cut = max(1, int(len(text) * budget / total))
+    while cut > 1 and estimate_tokens(text[:cut]) > budget:
+        cut = int(cut * 0.9)
+    nl = text.rfind("\n", 0, cut)
+    return nl if nl > cut * 0.7 else cut
+
+
+def _truncate_tail(text: str, budget: int) -> str:
+    if budget <= 0:
+        return ""
+    total = estimate_tokens(text)
+    if total <= budget:
+        return text
+    start = len(text) - max(1, int(len(text) * budget / total))
+    while start < len(text) - 1 and estimate_tokens(text[start:]) > budget:
+        start += max(1, (len(text) - start) // 10)
+    nl = text.find("\n", start)
+    if nl != -1 and nl - start < (len(text) - start) * 0.3:
+        start = nl + 1
+    return text[start:].lstrip()
+
+
+def share_budget(texts: Sequence[str], budget: int) -> List[str]:
+    """多个长文本共享预算：短文本完整保留，剩余预算在长文本间均分（注水式分配）"""
+    sizes = [estimate_tokens(t) for t in texts]
+    if sum(sizes) <= budget:
+        return list(texts)
+    limits = [0] * len(texts)
+    remaining, pending = budget, sorted(range(len(texts)), key=lambda i: sizes[i])
+    while pending:
+        share = remaining // len(pending)
+        i = pending[0]
+        if sizes[i] > share:
+            for j in pending:
+                limits[j] = share
+            break
+        limits[i] = sizes[i]
+        remaining -= sizes[i]
+        pending.pop(0)
+    return [truncate_to_tokens(t, n) for t, n in zip(texts, limits)]
+
+
+# ==================== 相关度与装箱 ====================
+
+def _bigrams(text: str) -> set:
+    text = re.sub(r"\s+", "", (text or "").lower())
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def relevance(query: str, text: str) -> float:
+    """query 的字符二元组在 text 中出现的比例（0~1），中英文通用、无需分词"""
+    q = _bigrams(query)
+    if not q:
+        return 0.0
+    return len(q & _bigrams(text)) / len(q)
+
+
+def pack_items(items: Sequence, budget: int, score: Callable, render: Callable) -> Tuple[list, int]:
+    """按 score 从高到低挑选能放进预算的条目，返回 (保持原顺序的入选条目, 落选数量)"""
+    sizes = [estimate_tokens(render(item)) + 1 for item in items]
+    if sum(sizes) <= budget:
+        return list(items), 0
+    order = sorted(range(len(items)), key=lambda i: score(items[i]), reverse=True)
+    chosen, used = set(), 0
+    for i in order:
+        if used + sizes[i] <= budget:
+            chosen.add(i)
+            used += sizes[i]
+    return [items[i] for i in sorted(chosen)], len(items) - len(chosen)
+
+
+def select_evidence(evidence_pool: list, budget: int, question: str, render: Callable) -> Tuple[list, int]:
+    """证据装箱：可靠性优先，其次与问题的相关度；"未获得有效信息"的占位证据最先舍弃"""
+    def score(e):
+        if _EMPTY_EVIDENCE_MARK in e["statement"]:
+            return -1.0
+        return _RELIABILITY_SCORE.get(e.get("reliability"), 0.0) + relevance(question, e["statement"])
+    return pack_items(evidence_pool, budget, score, render)
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+单次运行的结构化 trace — 回答"150 秒花在了哪里"
+- run_trace(question)：开启一次运行的 trace，结束时写入 TRACE_DIR/<run_id>.json
+- context(node=..., q_id=...)：设置当前上下文（节点名、子问题编号），之后记录的事件自动带上
+- span(kind, name, **attrs)：记录一段耗时操作（开始/结束时间、耗时、异常），可在 with 块内补充字段
+- record(kind, name, **attrs)：记录瞬时事件（缓存命中、LLM 重试等）
+- submit(executor, fn, ...)：向线程池提交任务时复制当前上下文，使分支线程内的事件归属正确
+
+事件类型：node（图节点）/ llm（每次模型调用）/ http（provider 请求）/ fetch（URL 深读）/
+search_cache / llm_retry / llm_giveup（重试耗尽、熔断或 deadline 不足）/
+queue（调度器任务开始执行，附排队等待时间）。没有进行中的 trace 时以上函数均为空操作。
+"""
+import contextvars
+import inspect
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+from config.settings import TRACE_ENABLED, TRACE_DIR
+
+_RUN = contextvars.ContextVar("trace_run", default=None)
+_CTX = contextvars.ContextVar("trace_ctx", default=None)
+
+
+class RunTrace:
+    """一次运行的事件集合（线程安全）"""
+
+    def __init__(self, question: str):
+        self.run_id = time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+        self.question = question
+        self.started_at = time.time()
+        self.answer = ""
+        self.path = ""
+        self._events = []
+        self._lock = threading.Lock()
+
+    def add(self, event: dict) -> None:
+        with self._lock:
+            self._events.append(event)
+
+    def events(self) -> list:
+        with self._lock:
+            return sorted(self._events, key=lambda e: e["start"])
+
+    def summary(self) -> dict:
+        """按图节点 / LLM 节点 / provider / 搜索缓存 / 调度队列 / 流水线子图事件聚合"""
+        nodes = defaultdict(lambda: defaultdict(float))
+        llm = defaultdict(lambda: defaultdict(float))
+        providers = defaultdict(lambda: defaultdict(float))
+        cache = defaultdict(lambda: defaultdict(int))
+        queues = defaultdict(lambda: defaultdict(float))
+        stream = defaultdict(lambda: defaultdict(float))
+        for e in self.events():
+            kind, name = e["kind"], e["name"]
+            if kind == "node":
+                nodes[name]["count"] += 1
+                nodes[name]["total_s"] += e["duration"]
+            elif kind == "llm":
+                s = llm[name]
+                s["calls"] += 1
+                s["total_s"] += e["duration"]
+                for k in ("prompt_tokens", "cached_tokens", "completion_tokens"):
+                    s[k] += e.get(k) or 0
+                s["local_cache_hits"] += e.get("cache") == "local"
+                s["early_stop"] += bool(e.get("early_stop"))
+            elif kind == "llm_retry":
+                llm[name]["retries"] += 1
+            elif kind == "llm_giveup":
+                llm[name]["giveups"] += 1
+            elif kind in ("http", "fetch"):
+                s = providers[f"{kind}:{name}"]
+                s["calls"] += 1
+                s["total_s"] += e["duration"]
+                s["bytes"] += e.get("bytes") or 0
+                s["retries"] += e.get("retries") or 0
+                s["errors"] += bool(e.get("error"))
+            elif kind == "search_cache":
+                cache[name]["hit" if e.get("hit") else "miss"] += 1
+            elif kind == "queue":
+                s = queues[name]
+                s["tasks"] += 1
+                s["wait_s"] += e.get("wait") or 0.0
+                s["max_wait_s"] = max(s["max_wait_s"], e.get("wait") or 0.0)
+            elif kind == "stream":
+                s = stream[name]
+                s["count"] += 1
+                if name == "provisional":
+                    s["wait_s"] += e.get("wait") or 0.0
+                elif name == "abandoned":
+                    s["results"] += e.get("count") or 0
+
+        def _plain(groups):
+            return {k: {f: round(v, 3) if f.endswith("_s") else int(v) for f, v in g.items()}
+                    for k, g in sorted(groups.items())}
+        return {"nodes": _plain(nodes), "llm": _plain(llm), "providers": _plain(providers),
+                "search_cache": _plain(cache), "queues": _plain(queues),
+                "stream": _plain(stream)}
+
+    def to_dict(self) -> dict:
+        return {
+            "run_id": self.run_id,
+            "question": self.question,
+            "answer": self.answer,
+            "started_at": self.started_at,
+            "elapsed": round(time.time() - self.started_at, 3),
+            "summary": self.summary(),
+            "events": self.events(),
+        }
+
+    def dump(self, directory: str = TRACE_DIR) -> str:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.run_id}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=1, default=str)
+        return path
+
+
+def current_run():
+    return _RUN.get()
+
+
+@contextmanager
+def run_trace(question: str):
+    """开启一次运行的 trace；退出时（TRACE_ENABLED 时）写入文件，路径存于 trace.path"""
+    trace = RunTrace(question)
+    token = _RUN.set(trace)
+    ctx_token = _CTX.set({})
+    try:
+        yield trace
+    finally:
+        _CTX.reset(ctx_token)
+        _RUN.reset(token)
+        if TRACE_ENABLED:
+            try:
+                trace.path = trace.dump()
+            except OSError as e:
+                print(f"[Trace] 写入失败: {e}")
+
+
+@contextmanager
+def context(**fields):
+    """在当前上下文上叠加字段（node / q_id 等）"""
+    token = _CTX.set({**(_CTX.get() or {}), **fields})
+    try:
+        yield
+    finally:
+        _CTX.reset(token)
+
+
+def _base_event(trace: RunTrace, kind: str, name: str, start: float) -> dict:
+    event = {"kind": kind, "name": name, "start": round(start - trace.started_at, 4),
+             "thread": threading.current_thread().name}
+    event.update(_CTX.get() or {})
+    return event
+
+
+@contextmanager
+def span(kind: str, name: str, **attrs):
+    """记录一段耗时操作；yield 的 dict 可在块内追加字段（状态码、字节数、重试次数……）"""
+    trace = _RUN.get()
+    if trace is None:
+        yield attrs
+        return
+    start = time.time()
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs.setdefault("error", f"{type(e).__name__}: {e}"[:300])
+        raise
+    finally:
+        end = time.time()
+        event = _base_event(trace, kind, name, start)
+        event.update(end=round(end - trace.started_at, 4), duration=round(end - start, 4))
+        event.update(attrs)
+        trace.add(event)
+
+
+def record(kind: str, name: str, **attrs) -> None:
+    """记录瞬时事件"""
+    trace = _RUN.get()
+    if trace is None:
+        return
+    event = _base_event(trace, kind, name, time.time())
+    event.update(end=event["start"], duration=0.0)
+    event.update(attrs)
+    trace.add(event)
+
+
+def record_span(kind: str, name: str, start: float, end: float, **attrs) -> None:
+    """记录已知起止时间的事件（回调式接口，如 LLM 回调）"""
+    trace = _RUN.get()
+    if trace is None:
+        return
+    event = _base_event(trace, kind, name, start)
+    event.update(end=round(end - trace.started_at, 4), duration=round(end - start, 4))
+    event.update(attrs)
+    trace.add(event)
+
+
+def submit(executor, fn, *args, **kwargs):
+    """executor.submit 的上下文传播版本：任务在提交时上下文的副本中运行"""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def traced_node(name: str, fn):
+    """包装图节点：设置上下文 node=name 并记录节点耗时（同步 / 异步节点均可）"""
+    if inspect.iscoroutinefunction(fn):
+        async def wrapper(state):
+            with context(node=name), span("node", name):
+                return await fn(state)
+    else:
+        def wrapper(state):
+            with context(node=name), span("node", name):
+                return fn(state)
+    wrapper.__name__ = getattr(fn, "__name__", name)
+    wrapper.__doc__ = fn.__doc__
+    return wrapper